@@ -0,0 +1,5 @@
+# Make sure the Celery app (and its signal handlers) is loaded whenever
+# Django starts, so that shared_task and .delay() use this configuration.
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -0,0 +1,181 @@
+"""
+OpenAPI schema and documentation pages.
+
+drf_spectacular builds the schema by introspecting every view, and its
+generator, renderers and UI views are slow to import. Instead of
+SpectacularAPIView, ``/api/schema/`` serves a static document:
+
+* ``schema.yaml`` / ``schema.json`` in OPENAPI_SCHEMA_DIR, written at build
+  time by ``python manage.py build_schema``, or
+* when those files are missing, a schema generated on the first request.
+
+Each worker reads or generates a format once and keeps the bytes and their
+ETag in memory. drf_spectacular's generator and the Swagger/Redoc views are
+only imported when they are first needed, not when the URLconf loads.
+
+The same goes for drf_spectacular's AutoSchema, which pulls in most of the
+package: views are annotated with this module's ``extend_schema``, which
+only records the arguments, and DEFAULT_SCHEMA_CLASS is ``AutoSchema``
+below, which DRF instantiates for every @api_view at import time but which
+only resolves to drf_spectacular's class when a view's schema is read.
+"""
+import functools
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_http_methods
+from rest_framework.schemas.inspectors import DefaultSchema, ViewInspector
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json'),
+}
+
+_documents = {}
+_lock = threading.Lock()
+_annotations = []  # (view, extend_schema kwargs) not applied yet
+_annotations_lock = threading.Lock()
+
+
+def extend_schema(**kwargs):
+    """
+    drf_spectacular's extend_schema, applied when the schema is first
+    generated instead of when the view is defined
+    """
+    def decorator(view):
+        with _annotations_lock:
+            _annotations.append((view, kwargs))
+        return view
+    return decorator
+
+
+def spectacular_schema_class():
+    """
+    drf_spectacular's AutoSchema, after applying the pending ``extend_schema``
+    annotations
+    """
+    from drf_spectacular.openapi import AutoSchema as SpectacularAutoSchema
+    from drf_spectacular.utils import extend_schema as apply_extend_schema
+
+    with _annotations_lock:
+        if _annotations:
+            # extend_schema subclasses DEFAULT_SCHEMA_CLASS for plain and
+            # @api_view functions, so it must be the real class meanwhile.
+            deferred = api_settings.DEFAULT_SCHEMA_CLASS
+            api_settings.DEFAULT_SCHEMA_CLASS = SpectacularAutoSchema
+            try:
+                for view, kwargs in _annotations:
+                    apply_extend_schema(**kwargs)(view)
+                _annotations.clear()
+            finally:
+                api_settings.DEFAULT_SCHEMA_CLASS = deferred
+    return SpectacularAutoSchema
+
+
+class AutoSchema(DefaultSchema):
+    """
+    DEFAULT_SCHEMA_CLASS that stands in for drf_spectacular's AutoSchema
+    until a view's schema is read
+    """
+
+    def __get__(self, instance, owner):
+        result = ViewInspector.__get__(self, instance, owner)
+        if result is not self:
+            return result  # set on the view by the schema generator
+        inspector = spectacular_schema_class()()
+        inspector.view = instance
+        return inspector
+
+
+def schema_path(fmt):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / FORMATS[fmt][0]
+
+
+def render_schema(fmt):
+    """
+    Generate the schema with drf_spectacular, rendered as ``fmt`` (bytes)
+    """
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    from alx_travel_app import schema_extensions  # noqa: F401 (registers them)
+
+    spectacular_schema_class()
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    renderer = OpenApiJsonRenderer() if fmt == 'json' else OpenApiYamlRenderer()
+    return renderer.render(schema, renderer_context={})
+
+
+def document(fmt):
+    """
+    (body, etag) of the schema in ``fmt``, loaded once per process
+    """
+    entry = _documents.get(fmt)
+    if entry is None:
+        with _lock:
+            entry = _documents.get(fmt)
+            if entry is None:
+                path = schema_path(fmt)
+                try:
+                    body = path.read_bytes()
+                except FileNotFoundError:
+                    logger.info('No prebuilt schema at %s, generating it', path)
+                    body = render_schema(fmt)
+                etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+                entry = _documents[fmt] = (body, etag)
+    return entry
+
+
+def clear():
+    """
+    Forget the loaded documents, e.g. after rebuilding the files
+    """
+    with _lock:
+        _documents.clear()
+
+
+def requested_format(request):
+    fmt = request.GET.get('format', '')
+    if fmt in ('json', 'openapi-json'):
+        return 'json'
+    if fmt in ('yaml', 'openapi'):
+        return 'yaml'
+    return 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=lambda request: document(requested_format(request))[1])
+def schema(request):
+    """
+    The OpenAPI schema as YAML (default) or JSON (?format=json or an
+    Accept header asking for JSON)
+    """
+    fmt = requested_format(request)
+    body, _ = document(fmt)
+    response = HttpResponse(body, content_type=FORMATS[fmt][1])
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@functools.cache
+def _docs_view(name):
+    from drf_spectacular import views
+    return getattr(views, name).as_view(url_name='schema')
+
+
+def swagger_ui(request, *args, **kwargs):
+    return _docs_view('SpectacularSwaggerView')(request, *args, **kwargs)
+
+
+def redoc(request, *args, **kwargs):
+    return _docs_view('SpectacularRedocView')(request, *args, **kwargs)
@@ -0,0 +1,177 @@
+"""
+Authentication without per-request session and user queries.
+
+Django's default setup costs every ``login_required`` request a session
+read and a ``User`` fetch. Two things remove them from the hot path:
+
+* ``CachedModelBackend`` (AUTHENTICATION_BACKENDS) serves users from the
+  default cache for AUTH_USER_CACHE_TTL seconds. Saving or deleting a user
+  drops its entry, so password changes and deactivations apply at once.
+  Together with the ``cached_db`` session engine a logged-in request needs
+  no query at all once both caches are warm.
+* API clients can send ``Authorization: Token <token>`` instead of a
+  session cookie. Tokens come from ``POST /api/auth/token/`` and are signed
+  with SECRET_KEY, so checking one needs no database; the user is then
+  loaded through the same cache. A token stops working after
+  AUTH_TOKEN_MAX_AGE seconds or when the user's password changes.
+  ``TokenAuthenticationMiddleware`` accepts tokens on plain Django views,
+  ``TokenAuthentication`` on DRF views.
+
+Both caches must be shared between processes (REDIS_URL): a per-process
+cache would keep serving a user that another process changed, or a session
+it logged out. settings.py only enables them by default when Redis is set.
+"""
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import authentication, exceptions
+
+from alx_travel_app import fastjson
+from alx_travel_app.ratelimit import rate_limit
+
+USER_KEY_PREFIX = 'auth:user'
+TOKEN_SALT = 'alx_travel_app.auth.token'
+TOKEN_SCHEME = 'token'
+
+User = get_user_model()
+
+
+def _user_key(user_id):
+    return f'{USER_KEY_PREFIX}:{user_id}'
+
+
+def cached_user(user_id):
+    """
+    The user with primary key ``user_id`` or None, from the cache when
+    AUTH_USER_CACHE_TTL is set
+    """
+    ttl = settings.AUTH_USER_CACHE_TTL
+    user = cache.get(_user_key(user_id)) if ttl else None
+    if user is None:
+        try:
+            user = User._default_manager.get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        if ttl:
+            cache.set(_user_key(user_id), user, ttl)
+    return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _forget_user(sender, instance, **kwargs):
+    # Deleted again once the change commits: a request that loads the user
+    # before then would otherwise cache the old row for AUTH_USER_CACHE_TTL.
+    key = _user_key(instance.pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session's user through ``cached_user``
+    """
+
+    def get_user(self, user_id):
+        user = cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+def _password_tag(user):
+    # Changes with the password, like the session auth hash, without
+    # putting that hash in a token the client can decode.
+    return salted_hmac(TOKEN_SALT, user.get_session_auth_hash()).hexdigest()[:16]
+
+
+def issue_token(user):
+    return signing.dumps({'id': user.pk, 'pw': _password_tag(user)}, salt=TOKEN_SALT)
+
+
+def user_from_token(token):
+    """
+    The active user ``token`` was issued to, or None if it is invalid,
+    expired or its user's password has changed since
+    """
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_MAX_AGE)
+        user = cached_user(claims['id'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    if user is None or not user.is_active or not constant_time_compare(claims.get('pw', ''), _password_tag(user)):
+        return None
+    return user
+
+
+def token_from_request(request):
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != TOKEN_SCHEME:
+        return None
+    return token.strip()
+
+
+class TokenAuthenticationMiddleware:
+    """
+    Authenticate requests that carry a token instead of a session; goes
+    after AuthenticationMiddleware
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = token_from_request(request)
+        if token is not None:
+            request.user = SimpleLazyObject(lambda: user_from_token(token) or AnonymousUser())
+        return self.get_response(request)
+
+
+class TokenAuthentication(authentication.BaseAuthentication):
+    """
+    DRF counterpart of TokenAuthenticationMiddleware. Listed before
+    SessionAuthentication, so token requests are not held to its CSRF check.
+    """
+
+    def authenticate(self, request):
+        token = token_from_request(request)
+        if token is None:
+            return None
+        user = user_from_token(token)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return user, token
+
+    def authenticate_header(self, request):
+        return 'Token'
+
+
+@csrf_exempt
+@rate_limit('obtain_token')
+@require_POST
+def obtain_token(request):
+    """
+    Exchange a username and password for an API token
+    """
+    try:
+        data = fastjson.loads(request.body)
+    except fastjson.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON data'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'message': 'Invalid JSON data'}, status=400)
+    user = authenticate(request, username=data.get('username'), password=data.get('password'))
+    if user is None:
+        return JsonResponse({'success': False, 'message': 'Invalid credentials'}, status=401)
+    return JsonResponse({
+        'success': True,
+        'data': {'token': issue_token(user), 'expires_in': settings.AUTH_TOKEN_MAX_AGE},
+    })
@@ -1,10 +1,18 @@
 import os
 from celery import Celery
+from celery.utils.log import get_task_logger
+from dotenv import load_dotenv
+from kombu import Exchange, Queue
+
+# The worker profile below is read from the environment when this module is
+# imported, before Django loads settings.py (which loads .env as well).
+load_dotenv()
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
 
 app = Celery('alx_travel_app')
+logger = get_task_logger(__name__)
 
 # Using a string here means the worker doesn't have to serialize
 # the configuration object to child processes.
@@ -25,6 +33,119 @@ app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
 )
 
+# Task routing
+#
+# Payment emails are customer-facing and time sensitive, so they get their
+# own queue instead of waiting behind bulk booking notifications. Periodic
+# housekeeping runs on a separate low-priority queue.
+QUEUE_PAYMENTS = 'payments'
+QUEUE_NOTIFICATIONS = 'notifications'
+QUEUE_MAINTENANCE = 'maintenance'
+
+task_exchange = Exchange('tasks', type='direct')
+
+app.conf.update(
+    task_queues=(
+        Queue(QUEUE_PAYMENTS, task_exchange, routing_key=QUEUE_PAYMENTS),
+        Queue(QUEUE_NOTIFICATIONS, task_exchange, routing_key=QUEUE_NOTIFICATIONS),
+        Queue(QUEUE_MAINTENANCE, task_exchange, routing_key=QUEUE_MAINTENANCE),
+    ),
+    task_default_queue=QUEUE_NOTIFICATIONS,
+    task_default_exchange=task_exchange.name,
+    task_default_routing_key=QUEUE_NOTIFICATIONS,
+    task_routes={
+        'listings.tasks.send_payment_confirmation_email': {'queue': QUEUE_PAYMENTS},
+        'listings.tasks.send_payment_failure_email': {'queue': QUEUE_PAYMENTS},
+        'listings.tasks.send_booking_confirmation_email': {'queue': QUEUE_NOTIFICATIONS},
+        'listings.tasks.purge_outbox': {'queue': QUEUE_MAINTENANCE},
+        'alx_travel_app.celery.debug_task': {'queue': QUEUE_MAINTENANCE},
+    },
+    beat_schedule={
+        'purge-outbox': {
+            'task': 'listings.tasks.purge_outbox',
+            'schedule': 60 * 60,  # hourly
+        },
+    },
+)
+
+# Worker profiles
+#
+# Prefetch and acknowledgement are worker-wide settings in Celery, so each
+# queue is consumed by its own worker started with CELERY_WORKER_PROFILE:
+#
+#   CELERY_WORKER_PROFILE=payments celery -A alx_travel_app worker
+#
+# The profile restricts the worker to its queue and applies the pool,
+# concurrency, prefetch and ack settings below. Email delivery is IO bound,
+# so those queues use a thread pool (or gevent, if installed) rather than
+# one process per in-flight SMTP connection. CELERY_WORKER_POOL and
+# CELERY_WORKER_CONCURRENCY override the profile defaults.
+WORKER_PROFILES = {
+    QUEUE_PAYMENTS: {
+        'pool': 'threads',
+        'concurrency': 8,
+        # Take one message at a time and acknowledge only after the email is
+        # sent, so a crashed worker hands the payment email to another one.
+        'prefetch_multiplier': 1,
+        'acks_late': True,
+    },
+    QUEUE_NOTIFICATIONS: {
+        'pool': 'threads',
+        'concurrency': 32,
+        'prefetch_multiplier': 4,
+        'acks_late': False,
+    },
+    QUEUE_MAINTENANCE: {
+        'pool': 'prefork',
+        'concurrency': 1,
+        'prefetch_multiplier': 1,
+        'acks_late': True,
+    },
+}
+
+
+def worker_profile_settings(name):
+    """
+    Celery settings for a dedicated worker of the ``name`` queue; empty
+    CELERY_WORKER_POOL / CELERY_WORKER_CONCURRENCY keep the profile's values
+    """
+    try:
+        profile = WORKER_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f'Unknown CELERY_WORKER_PROFILE {name!r}, '
+            f'expected one of: {", ".join(WORKER_PROFILES)}'
+        )
+    return {
+        'task_queues': [q for q in app.conf.task_queues if q.name == name],
+        'worker_pool': os.getenv('CELERY_WORKER_POOL') or profile['pool'],
+        'worker_concurrency': int(os.getenv('CELERY_WORKER_CONCURRENCY') or profile['concurrency']),
+        'worker_prefetch_multiplier': profile['prefetch_multiplier'],
+        'task_acks_late': profile['acks_late'],
+        'task_reject_on_worker_lost': profile['acks_late'],
+    }
+
+
+def apply_worker_profile(name):
+    """
+    Configure this process as a dedicated worker for the ``name`` queue
+    """
+    app.conf.update(worker_profile_settings(name))
+
+
+if os.getenv('CELERY_WORKER_PROFILE'):
+    apply_worker_profile(os.getenv('CELERY_WORKER_PROFILE'))
+
+# Record queue wait, runtime and outcome of every task (see task_metrics.py).
+from . import task_metrics  # noqa: E402,F401
+
+# Continue request traces in tasks (see tracing.py).
+from . import tracing  # noqa: E402,F401
+
+# Log tasks under the id of the request that queued them (see logs.py).
+from . import logs  # noqa: E402,F401
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
+    logger.info('Request: %r', self.request)
@@ -0,0 +1,201 @@
+"""
+Negotiated response compression (zstd, brotli, gzip).
+
+CompressionMiddleware compresses API responses whose content type is in
+COMPRESSION_CONTENT_TYPES, using the best encoding that both the client
+(Accept-Encoding, q-values respected) and the server (COMPRESSION_ENCODINGS,
+in order of preference) support:
+
+* regular responses are compressed when they are at least
+  COMPRESSION_MIN_SIZE bytes and only kept if the result is smaller,
+* streaming responses (sync and async) are compressed incrementally, chunk
+  by chunk, whatever their size.
+
+gzip is always available; brotli and zstd need the ``brotli`` and
+``zstandard`` packages and are skipped when those are not installed.
+Levels are set with COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY and
+COMPRESSION_ZSTD_LEVEL.
+
+HTML is not compressed by default: pages that embed a CSRF token next to
+reflected input are open to BREACH-style attacks when compressed.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+
+class GzipCodec:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def compressor(self):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
+
+
+class BrotliCodec:
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compressor(self):
+        compressor = brotli.Compressor(quality=self.quality)
+        return compressor.process, compressor.finish
+
+
+class ZstdCodec:
+    encoding = 'zstd'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def compressor(self):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return compressor.compress, compressor.flush
+
+
+def available_codecs():
+    """
+    Codecs for the encodings in COMPRESSION_ENCODINGS that can be used here,
+    in order of preference
+    """
+    factories = {'gzip': lambda: GzipCodec(settings.COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        factories['br'] = lambda: BrotliCodec(settings.COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        factories['zstd'] = lambda: ZstdCodec(settings.COMPRESSION_ZSTD_LEVEL)
+    return [factories[name]() for name in settings.COMPRESSION_ENCODINGS if name in factories]
+
+
+def parse_accept_encoding(header):
+    """
+    {coding: q} from an Accept-Encoding header
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, codecs):
+    """
+    The codec with the highest q-value in ``header``; ties go to the
+    server's preference order. None if the client accepts none of them.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = accepted.get(codec.encoding, wildcard)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def compress_stream(codec, chunks):
+    compress, finish = codec.compressor()
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_stream(codec, chunks):
+    compress, finish = codec.compressor()
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def _compressible(response):
+    content_type = response.get('Content-Type', '').split(';', 1)[0].strip().lower()
+    return any(
+        content_type == allowed or (allowed.endswith('/') and content_type.startswith(allowed))
+        or (allowed.startswith('+') and content_type.endswith(allowed))
+        for allowed in settings.COMPRESSION_CONTENT_TYPES
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.codecs = available_codecs()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not settings.COMPRESSION_ENABLED or not self.codecs:
+            return response
+        if response.has_header('Content-Encoding') or not _compressible(response):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codec = negotiate(request.headers.get('Accept-Encoding', ''), self.codecs)
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(codec, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(codec, response.streaming_content)
+            # The compressed length is only known once the stream is sent.
+            del response.headers['Content-Length']
+        else:
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag would claim byte-for-byte equality with the
+        # uncompressed representation (RFC 9110 8.8.1); weaken it.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.encoding
+        return response
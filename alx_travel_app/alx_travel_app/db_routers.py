@@ -0,0 +1,191 @@
+"""
+Read-replica routing.
+
+Only views wrapped with ``replica_reads`` read from a replica; everything
+else, and every write, uses the primary (``default``). A replica is skipped
+and reads fall back to the primary when:
+
+* the current request's client wrote to the primary within the last
+  DATABASE_REPLICA_STICKY_SECONDS (read-your-writes),
+* the read happens inside a transaction on the primary,
+* the replica is unreachable or lags more than DATABASE_REPLICA_MAX_LAG
+  seconds behind (checked at most every DATABASE_REPLICA_LAG_CHECK_INTERVAL
+  seconds per process).
+
+Stickiness markers are stored in the default cache, so they must be shared
+between workers (REDIS_URL) to follow a client across processes. Anonymous
+clients are told apart by address, taken from X-Forwarded-For behind
+RATELIMIT_PROXY_COUNT proxies; without it every client behind a proxy would
+share one marker and one write would pin them all to the primary.
+"""
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from alx_travel_app.ratelimit import client_ip
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY_PREFIX = 'db_routing:sticky'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+_lag_lock = threading.Lock()
+_lag_checks = {}  # alias -> (checked_at, lag_seconds or None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def _measure_lag(alias):
+    """
+    Replication delay of ``alias`` in seconds; 0 for backends that do not
+    report it
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        connection.ensure_connection()
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN pg_is_in_recovery() '
+            'THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) '
+            'ELSE 0 END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_lag(alias):
+    """
+    Last measured lag of ``alias`` in seconds, or None if the replica could
+    not be reached. Re-measured when the previous result is older than
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL.
+    """
+    interval = getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_INTERVAL', 10)
+    now = time.monotonic()
+    with _lag_lock:
+        checked_at, lag = _lag_checks.get(alias, (None, None))
+        if checked_at is not None and now - checked_at < interval:
+            return lag
+        # Record the attempt first so concurrent threads don't all probe.
+        _lag_checks[alias] = (now, lag)
+    try:
+        lag = _measure_lag(alias)
+    except Exception as e:
+        logger.warning('Replica %s is unavailable: %s', alias, e)
+        lag = None
+    with _lag_lock:
+        _lag_checks[alias] = (time.monotonic(), lag)
+    return lag
+
+
+def replica_status():
+    """
+    Lag and availability of every configured replica
+    """
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+    status = {}
+    for alias in replica_aliases():
+        lag = replica_lag(alias)
+        status[alias] = {'lag_seconds': lag, 'healthy': lag is not None and lag <= max_lag}
+    return status
+
+
+def _healthy_replicas():
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+    healthy = []
+    for alias in replica_aliases():
+        lag = replica_lag(alias)
+        if lag is not None and lag <= max_lag:
+            healthy.append(alias)
+        elif lag is not None:
+            logger.warning('Replica %s lags %.1fs behind, reading from primary', alias, lag)
+    return healthy
+
+
+def _client_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'{STICKY_KEY_PREFIX}:user:{user.pk}'
+    return f'{STICKY_KEY_PREFIX}:ip:{client_ip(request)}'
+
+
+def replica_reads(view):
+    """
+    Let ``view`` read from a replica unless its client has just written
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_aliases() or cache.get(_client_key(request)):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Remember clients that wrote to the primary, so that their reads in the
+    following DATABASE_REPLICA_STICKY_SECONDS are not served by a replica
+    that has not caught up yet
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state['wrote'] and replica_aliases():
+            cache.set(
+                _client_key(request), 1,
+                getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5),
+            )
+        return response
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads inside ``replica_reads`` views to a healthy replica and all
+    other traffic to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = _healthy_replicas()
+        if not healthy:
+            return DEFAULT_DB_ALIAS
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db == DEFAULT_DB_ALIAS
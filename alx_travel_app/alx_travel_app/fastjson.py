@@ -0,0 +1,94 @@
+"""
+orjson-based JSON encoding and decoding.
+
+Used wherever the output format allows it:
+
+* ``loads`` replaces json.loads(request.body),
+* ``ORJSONRenderer`` / ``ORJSONParser`` replace DRF's JSONRenderer and
+  JSONParser (REST_FRAMEWORK settings).
+
+orjson serializes str, int, float, bool, None, dict, list and UUID itself.
+datetime, date and time values are passed through to the same ``default``
+methods the stdlib encoders use (DjangoJSONEncoder for ``dumps``, DRF's
+JSONEncoder for DRF), as are Decimal and lazy translation strings, so the
+values are rendered exactly as before, e.g. datetimes to milliseconds with
+``Z`` for UTC. DRF's output was already
+compact and UTF-8, so the renderer's bytes are unchanged.
+
+Plain views keep django.http.JsonResponse. Its ``", "`` / ``": "``
+separators and ``\\u`` escapes are not something orjson can produce, and
+re-spacing orjson's output costs far more than the stdlib encoder does.
+"""
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_header_parameters
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+JSONDecodeError = orjson.JSONDecodeError  # a subclass of json.JSONDecodeError
+
+_django_default = DjangoJSONEncoder().default
+_drf_default = DRFJSONEncoder().default
+
+
+def dumps(data, default=_django_default, option=0):
+    """
+    ``data`` as UTF-8 encoded JSON (bytes)
+    """
+    return orjson.dumps(data, default=default, option=OPTIONS | option)
+
+
+def loads(data):
+    """
+    Parse JSON from bytes or str; raises JSONDecodeError
+    """
+    return orjson.loads(data)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for rest_framework.renderers.JSONRenderer
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = 0
+        if self._indent(accepted_media_type, renderer_context or {}):
+            option = orjson.OPT_INDENT_2  # the only indent orjson supports
+        ret = dumps(data, default=_drf_default, option=option)
+        # Like JSONRenderer: U+2028/2029 are valid JSON but not valid
+        # JavaScript, so escape them.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+    def _indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            _, params = parse_header_parameters(accepted_media_type)
+            try:
+                return max(min(int(params['indent']), 8), 0)
+            except (KeyError, ValueError, TypeError):
+                pass
+        return renderer_context.get('indent')
+
+
+class ORJSONParser(BaseParser):
+    """
+    Drop-in replacement for rest_framework.parsers.JSONParser
+    """
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read())
+        except JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
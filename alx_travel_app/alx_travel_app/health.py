@@ -0,0 +1,171 @@
+"""
+Liveness and readiness probes.
+
+* ``/healthz`` answers 200 as long as the process can serve a request. It
+  does no I/O.
+* ``/readyz`` answers 200 when the checks in READINESS_CHECKS pass
+  (``database``, ``cache``, ``broker``) and 503 otherwise, with the outcome
+  and duration of each check. The checks run concurrently and each gets
+  READINESS_TIMEOUT seconds. The result is kept for READINESS_CACHE_SECONDS
+  per process, so probes arriving more often than that cost nothing. Once
+  it is stale one probe runs the checks again while the others keep
+  getting the previous result, so a slow check never queues up probes.
+
+HealthCheckMiddleware answers both paths before any other middleware runs:
+probes skip host validation (load balancers often probe by IP), the HTTPS
+redirect, sessions, tracing and metrics.
+
+Error details are reduced to the exception class, since the endpoints are
+public.
+"""
+import threading
+import time
+from concurrent import futures
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.http import JsonResponse
+
+
+HEALTH_PATH = '/healthz'
+READY_PATH = '/readyz'
+
+_executor = futures.ThreadPoolExecutor(max_workers=3, thread_name_prefix='readyz')
+_lock = threading.Lock()
+_result = None  # (checked_at, ready, checks)
+_refreshing = False
+
+
+def check_database():
+    # Runs in an executor thread, with its own connection. Connecting is
+    # bounded by DB_CONNECT_TIMEOUT; on PostgreSQL the query also gets
+    # READINESS_TIMEOUT, so a stuck database does not hold the thread.
+    close_old_connections()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # SET LOCAL ends with the transaction, so a pooled connection
+            # goes back without it.
+            with transaction.atomic():
+                cursor.execute(f'SET LOCAL statement_timeout = {int(settings.READINESS_TIMEOUT * 1000)}')
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        else:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+
+def check_cache():
+    key = f'readyz:{threading.get_ident()}'
+    value = str(time.time())
+    cache.set(key, value, 10)
+    if cache.get(key) != value:
+        raise RuntimeError('cache did not return the value just written')
+
+
+def check_broker():
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        return 'skipped'  # tasks run in process, there is no broker
+    from alx_travel_app.celery import app
+
+    with app.connection_for_write(connect_timeout=settings.READINESS_TIMEOUT) as conn:
+        conn.ensure_connection(max_retries=0)
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'broker': check_broker,
+}
+
+
+def _timed(check):
+    began = time.perf_counter()
+    status = check() or 'ok'
+    return status, (time.perf_counter() - began) * 1000
+
+
+def run_checks():
+    """
+    (ready, {name: {'status': ..., 'ms': ...}}) for READINESS_CHECKS
+    """
+    pending = {name: _executor.submit(_timed, CHECKS[name]) for name in settings.READINESS_CHECKS}
+    deadline = time.monotonic() + settings.READINESS_TIMEOUT
+    checks, ready = {}, True
+    for name, future in pending.items():
+        try:
+            status, ms = future.result(timeout=max(0, deadline - time.monotonic()))
+            checks[name] = {'status': status, 'ms': round(ms, 2)}
+        except futures.TimeoutError:
+            checks[name] = {'status': 'timeout'}
+            ready = False
+        except Exception as e:
+            checks[name] = {'status': 'error', 'error': type(e).__name__}
+            ready = False
+    return ready, checks
+
+
+def readiness():
+    """
+    Cached (ready, checks). When it is stale one thread per process runs
+    the checks; the others return the previous result meanwhile, and only
+    run the checks themselves if there is none yet.
+    """
+    global _result, _refreshing
+    with _lock:
+        result = _result
+        refresh = not _refreshing and (
+            result is None or time.monotonic() - result[0] >= settings.READINESS_CACHE_SECONDS
+        )
+        if refresh:
+            _refreshing = True
+    if not refresh and result is not None:
+        return result[1], result[2]
+    try:
+        result = (time.monotonic(), *run_checks())
+    finally:
+        if refresh:
+            with _lock:
+                _refreshing = False
+    with _lock:
+        _result = result
+    return result[1], result[2]
+
+
+def clear():
+    global _result
+    with _lock:
+        _result = None
+
+
+def _no_store(response):
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def healthz(request):
+    return _no_store(JsonResponse({'status': 'ok'}))
+
+
+def readyz(request):
+    ready, checks = readiness()
+    return _no_store(JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    ))
+
+
+class HealthCheckMiddleware:
+    """
+    Answer the probe paths ahead of the rest of the middleware; goes first
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = {HEALTH_PATH: healthz, READY_PATH: readyz}
+
+    def __call__(self, request):
+        view = self.views.get(request.path_info.rstrip('/'))
+        if view is not None and request.method in ('GET', 'HEAD'):
+            return view(request)
+        return self.get_response(request)
@@ -0,0 +1,278 @@
+"""
+Structured, non-blocking logging.
+
+Every record from the web processes, Celery workers and gunicorn itself goes
+through ``QueueHandler`` (LOGGING in settings.py, logconfig_dict in
+gunicorn.conf.py):
+
+* in the thread that logs, ``SamplingFilter`` drops a share of the INFO and
+  DEBUG records of high-volume loggers (LOG_SAMPLE_RATES), ``ContextFilter``
+  attaches the request id, trace id and Celery task, and the record is put
+  on a bounded in-memory queue. Nothing blocks: when the queue is full the
+  record is dropped and counted,
+* a listener thread per process takes records off the queue, formats them
+  (one JSON object per line with ``JSONFormatter``, or plain text) and
+  writes them to stdout.
+
+Request ids come from the ``X-Request-ID`` request header when it holds a
+sane value, otherwise ``RequestIdMiddleware`` makes one up; either way it is
+returned in the response's ``X-Request-ID``. Tasks published while handling
+the request, directly or through the outbox, carry the id in a
+``request_id`` message header, and the worker logs the task under the same
+id.
+
+Fields passed with ``extra=`` become top-level JSON keys. This module does
+not import Django, so gunicorn's master can use it before Django is set up.
+"""
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+import orjson
+from celery import signals
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+TASK_HEADER = 'request_id'
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+_STANDARD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_task = contextvars.ContextVar('log_task', default=None)  # (task id, task name)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def _count_dropped(reason):
+    try:
+        from alx_travel_app import web_metrics
+        web_metrics.LOG_RECORDS_DROPPED.labels(reason).inc()
+    except Exception:
+        pass
+
+
+class ContextFilter(logging.Filter):
+    """
+    Add ``request_id`` and, when set, ``trace_id``, ``task_id`` and
+    ``task_name`` to each record
+    """
+
+    def filter(self, record):
+        record.request_id = _request_id.get() or '-'
+        task = _task.get()
+        if task is not None:
+            record.task_id, record.task_name = task
+        # Only once the app has loaded tracing; gunicorn's master logs
+        # before Django is set up.
+        tracing = sys.modules.get('alx_travel_app.tracing')
+        span = tracing.current_span() if tracing is not None else None
+        if span is not None:
+            record.trace_id = span.trace_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of the INFO and DEBUG records of some loggers (and
+    their children), given as ``logger=rate,logger=rate``. The decision
+    follows the request id, so a request is either logged completely or not
+    at all.
+    """
+
+    def __init__(self, rates=''):
+        super().__init__()
+        # Most specific logger name first.
+        self.rates = sorted(parse_sample_rates(rates).items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                break
+        else:
+            return True
+        request_id = _request_id.get()
+        sample = zlib.crc32(request_id.encode()) % 10000 / 10000 if request_id else random.random()
+        if sample < rate:
+            return True
+        _count_dropped('sampled')
+        return False
+
+
+def parse_sample_rates(value):
+    """
+    {logger: rate} from ``logger=rate,logger=rate``
+    """
+    rates = {}
+    for item in value.split(','):
+        name, _, rate = item.strip().partition('=')
+        if name:
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record
+    """
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class _Listener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        # Wait for room rather than lose the records queued before it.
+        self.queue.put(self._sentinel)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a listener thread that formats and writes them to
+    ``stream`` (stdout). The listener is started by the first record logged
+    in each process, so forked gunicorn and Celery workers get their own.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(None)
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.queue_size = queue_size
+        self.listener = None
+        self._pid = None
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def _start(self):
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = _Listener(self.queue, self.target)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Only what must happen in the logging thread: merge the arguments
+        # (they may change after this call) and render the traceback (it
+        # holds the frames alive). Formatting is left to the listener.
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count_dropped('queue_full')
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+class RequestIdMiddleware:
+    """
+    Give each request an id for its log records and tasks
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        request.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        token = _request_id.set(request.request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+
+# Celery
+
+_task_tokens = {}
+_task_tokens_lock = threading.Lock()
+
+
+def inject(headers):
+    """
+    Add the current request id to task message ``headers`` (a dict)
+    """
+    request_id = _request_id.get()
+    if request_id:
+        headers.setdefault(TASK_HEADER, request_id)
+    return headers
+
+
+@signals.before_task_publish.connect(dispatch_uid='logs_before_publish')
+def _before_publish(headers=None, **kwargs):
+    # Messages relayed from the outbox already carry the id stored with them.
+    if headers is not None:
+        inject(headers)
+
+
+@signals.task_prerun.connect(dispatch_uid='logs_task_prerun')
+def _task_prerun(task_id=None, task=None, **kwargs):
+    request = task.request
+    request_id = getattr(request, TASK_HEADER, None)
+    if request_id is None and isinstance(getattr(request, 'headers', None), dict):
+        request_id = request.headers.get(TASK_HEADER)
+    tokens = (
+        _request_id.set(request_id or _request_id.get()),  # eager tasks keep the caller's
+        _task.set((task_id, task.name)),
+    )
+    with _task_tokens_lock:
+        _task_tokens[task_id] = tokens
+
+
+@signals.task_postrun.connect(dispatch_uid='logs_task_postrun')
+def _task_postrun(task_id=None, **kwargs):
+    with _task_tokens_lock:
+        tokens = _task_tokens.pop(task_id, None)
+    if tokens is None:
+        return
+    request_token, task_token = tokens
+    try:
+        _task.reset(task_token)
+        _request_id.reset(request_token)
+    except ValueError:
+        # Reset from a different context than prerun; just clear them.
+        _task.set(None)
+        _request_id.set(None)
@@ -0,0 +1,276 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware profiles a request when:
+
+* it carries ``X-Profile: <PROFILING_TOKEN>`` (default METRICS_TOKEN; with
+  no token set only when DEBUG is on). The response then names the stored
+  profile in ``X-Profile-Id``.
+* it is picked by PROFILING_SAMPLE_RATE, the share of all requests to
+  profile (default 0).
+
+Two kinds of profile are available, chosen with ``X-Profile-Mode`` or
+PROFILING_MODE:
+
+* ``cprofile`` - every function call, with call counts and times (pstats
+  format, for ``python -m pstats`` or snakeviz). Exact, but slows the
+  request down noticeably.
+* ``sample``   - a thread records the request thread's stack every
+  PROFILING_SAMPLE_INTERVAL seconds, written as collapsed stacks for
+  flamegraph.pl or speedscope. Costs little, so it suits sampling in
+  production.
+
+Each profile is written to PROFILING_DIR together with a small JSON file
+holding the route, request id, method, path, status and duration. Only the
+newest PROFILING_MAX_PROFILES are kept. They are listed at
+``/api/profiles/`` and served at ``/api/profiles/<id>/``.
+
+A request that is not profiled costs one header lookup, plus a random
+number when PROFILING_SAMPLE_RATE is set.
+"""
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from alx_travel_app import fastjson, web_metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MODE_HEADER = 'HTTP_X_PROFILE_MODE'
+MODES = ('cprofile', 'sample')
+EXTENSIONS = {'cprofile': '.prof', 'sample': '.folded'}
+
+_VALID_ID = re.compile(r'^[0-9]+-[A-Za-z0-9._-]+$')
+
+
+class StackSampler:
+    """
+    Count the stacks of one thread, sampled from a background thread
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class CallProfiler:
+    """
+    cProfile of the code run between start() and stop()
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+def _profiler(mode):
+    if mode == 'sample':
+        return StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+    return CallProfiler()
+
+
+def authorized(value):
+    token = settings.PROFILING_TOKEN
+    if not token:
+        return settings.DEBUG
+    return hmac.compare_digest(value.encode(), token.encode())
+
+
+# Store
+
+
+def _path(profile_id, suffix):
+    return os.path.join(settings.PROFILING_DIR, profile_id + suffix)
+
+
+def save(profiler, mode, meta):
+    """
+    Write the profile and its metadata to PROFILING_DIR and return its id
+    """
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    request_id = re.sub(r'[^A-Za-z0-9._-]', '_', meta['request_id'] or 'none')
+    profile_id = f'{int(time.time() * 1000)}-{request_id}'
+    meta = {'id': profile_id, 'mode': mode, **meta}
+    data_path = _path(profile_id, EXTENSIONS[mode])
+    profiler.dump(data_path + '.tmp')
+    os.replace(data_path + '.tmp', data_path)
+    # The metadata goes last, so a listed profile always has its data.
+    with open(_path(profile_id, '.json.tmp'), 'wb') as f:
+        f.write(fastjson.dumps(meta))
+    os.replace(_path(profile_id, '.json.tmp'), _path(profile_id, '.json'))
+    prune(settings.PROFILING_MAX_PROFILES)
+    return profile_id
+
+
+def prune(keep):
+    """
+    Delete all but the newest ``keep`` profiles
+    """
+    for profile_id in _ids()[keep:]:
+        for suffix in ('.json', *EXTENSIONS.values()):
+            try:
+                os.remove(_path(profile_id, suffix))
+            except FileNotFoundError:
+                pass  # another process pruned it first
+
+
+def _ids():
+    # Newest first; ids start with the time in milliseconds.
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    ids = [name[:-5] for name in names if name.endswith('.json') and _VALID_ID.match(name[:-5])]
+    return sorted(ids, key=lambda profile_id: int(profile_id.split('-', 1)[0]), reverse=True)
+
+
+def load_meta(profile_id):
+    """
+    Metadata of a stored profile, or None
+    """
+    if not _VALID_ID.match(profile_id):
+        return None
+    try:
+        with open(_path(profile_id, '.json'), 'rb') as f:
+            return fastjson.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def listing(route=None):
+    """
+    Metadata of the stored profiles, newest first, optionally for one route
+    """
+    profiles = []
+    for profile_id in _ids():
+        meta = load_meta(profile_id)
+        if meta is not None and (route is None or meta.get('route') == route):
+            profiles.append(meta)
+    return profiles
+
+
+def data_path(meta):
+    return _path(meta['id'], EXTENSIONS[meta['mode']])
+
+
+def report(meta, sort='cumulative', limit=50):
+    """
+    Text summary of a stored profile: the ``limit`` top functions by
+    ``sort`` for cProfile, the heaviest stacks for samples
+    """
+    path = data_path(meta)
+    if meta['mode'] == 'sample':
+        with open(path) as f:
+            return ''.join(f.readlines()[:limit])
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# Middleware
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests asked for with ``X-Profile`` or picked by
+    PROFILING_SAMPLE_RATE; goes after RequestIdMiddleware
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _mode(self, request):
+        # (mode, asked for with the header); mode is None when the request
+        # is not to be profiled.
+        token = request.META.get(PROFILE_HEADER)
+        if token is not None and authorized(token):
+            mode = request.META.get(MODE_HEADER, settings.PROFILING_MODE)
+            return (mode if mode in MODES else settings.PROFILING_MODE), True
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return settings.PROFILING_MODE, False
+        return None, False
+
+    def __call__(self, request):
+        mode, requested = self._mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profiler = _profiler(mode)
+        try:
+            profiler.start()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time per process.
+            web_metrics.PROFILES.labels(mode, 'busy').inc()
+            return self.get_response(request)
+        began = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - began
+            profiler.stop()
+
+        try:
+            profile_id = save(profiler, mode, {
+                'request_id': getattr(request, 'request_id', None),
+                'method': request.method,
+                'path': request.path,
+                'route': web_metrics.route_of(request),
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'created_at': time.time(),
+            })
+        except OSError:
+            web_metrics.PROFILES.labels(mode, 'error').inc()
+            logger.warning('Could not store the profile of %s', request.path, exc_info=True)
+            return response
+        web_metrics.PROFILES.labels(mode, 'stored').inc()
+        if requested:
+            response['X-Profile-Id'] = profile_id
+        return response
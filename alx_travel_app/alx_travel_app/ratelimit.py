@@ -0,0 +1,274 @@
+"""
+Token-bucket rate limiting for the expensive, unauthenticated endpoints.
+
+Views wrapped with ``rate_limit(scope)`` check three buckets per request,
+each configured in RATELIMITS[scope] with a rate like ``5/m``:
+
+* ``user``     - the authenticated user (session or token), so one account
+  cannot be hammered from many addresses. Anonymous requests skip this
+  bucket: a ``user_id`` in the body is only a claim, and keying on it
+  would let anyone empty someone else's bucket.
+* ``ip``       - the client address (see RATELIMIT_PROXY_COUNT),
+* ``endpoint`` - every client together, a ceiling on what the endpoint
+  may cost us (e.g. the Chapa quota).
+
+A request is let through only if every bucket has a token; it then takes
+one from each. Otherwise the view is not called and a 429 is returned with
+``Retry-After`` set to the seconds until all buckets could serve it.
+
+With RATELIMIT_REDIS_URL (default REDIS_URL) set, the buckets live in Redis
+and are checked and updated by one Lua script, so a check is a single
+round trip (EVALSHA) and limits hold across every web process and node.
+The script uses Redis' clock, so clock skew between nodes does not matter.
+Without Redis each process keeps its own buckets, which is only suitable
+for development. When Redis cannot be reached requests are let through
+(RATELIMIT_FAIL_OPEN) rather than failing the endpoint.
+"""
+import functools
+import logging
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from alx_travel_app import web_metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\w*\s*(?::\s*(\d+))?\s*$')
+
+Rate = namedtuple('Rate', 'capacity per_second')
+Decision = namedtuple('Decision', 'allowed retry_after remaining limited_by')
+
+# KEYS: one hash per bucket. ARGV: cost, then capacity, refill rate (tokens
+# per millisecond) and reserve for each key. A bucket serves the request if
+# it holds at least cost + reserve tokens; only if all of them do is cost
+# taken from each. Returns {allowed, wait ms, remaining tokens, index of the
+# bucket that limited the request (1-based)}.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local tokens = {}
+local wait, limited_by = 0, 0
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local needed = cost + tonumber(ARGV[i * 3 + 1])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local level = tonumber(state[1]) or capacity
+  local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+  level = math.min(capacity, level + elapsed * rate)
+  tokens[i] = level
+  if level < needed then
+    local bucket_wait = math.ceil((needed - level) / rate)
+    if bucket_wait > wait then
+      wait, limited_by = bucket_wait, i
+    end
+  end
+end
+if wait > 0 then
+  return {0, wait, 0, limited_by}
+end
+local remaining = -1
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local level = tokens[i] - cost
+  redis.call('HSET', key, 'tokens', level, 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil((capacity - level) / rate) + 1000)
+  if remaining < 0 or level < remaining then
+    remaining, limited_by = level, i
+  end
+end
+return {1, 0, math.floor(remaining), limited_by}
+"""
+
+
+def parse_rate(value):
+    """
+    Rate from ``N/period[:burst]``: N tokens per period (``s``, ``m``, ``h``
+    or ``d``, optionally with a multiplier as in ``10/5m``), holding up to
+    ``burst`` tokens (default N). None for an empty value (no limit).
+    """
+    if not value:
+        return None
+    match = RATE_RE.match(value)
+    if not match:
+        raise ValueError(f'Invalid rate {value!r}, expected e.g. "5/m" or "5/m:10"')
+    count, multiplier, unit, burst = match.groups()
+    seconds = int(multiplier or 1) * PERIODS[unit]
+    capacity = int(burst) if burst else int(count)
+    if int(count) <= 0 or capacity <= 0:
+        raise ValueError(f'Invalid rate {value!r}, counts must be positive')
+    return Rate(capacity, int(count) / seconds)
+
+
+class RedisBuckets:
+    """
+    Buckets stored in Redis, checked with TOKEN_BUCKET_SCRIPT
+    """
+
+    def __init__(self, url, timeout):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def hit(self, buckets, cost=1):
+        args = [cost]
+        for _, rate, reserve in buckets:
+            args += [rate.capacity, rate.per_second / 1000, reserve]
+        # EVALSHA; the script is loaded (one extra round trip) only the
+        # first time a Redis server sees it.
+        allowed, wait_ms, remaining, index = self.script(keys=[key for key, _, _ in buckets], args=args)
+        return Decision(bool(allowed), wait_ms / 1000, remaining, buckets[index - 1][0] if index else None)
+
+
+class LocalBuckets:
+    """
+    Per-process buckets with the same semantics as RedisBuckets
+    """
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at, capacity, rate)
+
+    def hit(self, buckets, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            levels, wait, limited_by = [], 0.0, None
+            for key, rate, reserve in buckets:
+                tokens, updated_at = self._buckets.get(key, (rate.capacity, now))[:2]
+                level = min(rate.capacity, tokens + (now - updated_at) * rate.per_second)
+                levels.append(level)
+                needed = cost + reserve
+                if level < needed and (needed - level) / rate.per_second > wait:
+                    wait, limited_by = (needed - level) / rate.per_second, key
+            if wait > 0:
+                return Decision(False, wait, 0, limited_by)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+            remaining = None
+            for (key, rate, _), level in zip(buckets, levels):
+                self._buckets[key] = (level - cost, now, rate.capacity, rate.per_second)
+                if remaining is None or level - cost < remaining:
+                    remaining, limited_by = level - cost, key
+            return Decision(True, 0.0, int(remaining), limited_by)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely are the same as absent ones.
+        for key, (tokens, updated_at, capacity, per_second) in list(self._buckets.items()):
+            if tokens + (now - updated_at) * per_second >= capacity:
+                del self._buckets[key]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.RATELIMIT_REDIS_URL:
+                    _backend = RedisBuckets(settings.RATELIMIT_REDIS_URL, settings.RATELIMIT_REDIS_TIMEOUT)
+                else:
+                    _backend = LocalBuckets()
+    return _backend
+
+
+def client_ip(request):
+    """
+    Address of the client: REMOTE_ADDR, or with RATELIMIT_PROXY_COUNT
+    trusted proxies in front of the app, the X-Forwarded-For entry the
+    outermost of them added
+    """
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def user_key(request):
+    """
+    Key of the authenticated user, None for anonymous requests
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'id:{user.pk}'
+    return None
+
+
+def buckets_for(scope, request):
+    """
+    [(key, rate, reserve)] of the configured buckets of ``scope`` that apply
+    to ``request``. Keys share the ``{scope}`` hash tag so a Redis Cluster
+    keeps them in one slot, as a multi-key script requires.
+    """
+    idents = {'user': lambda: user_key(request), 'ip': lambda: client_ip(request), 'endpoint': lambda: 'all'}
+    buckets = []
+    for dimension, value in settings.RATELIMITS.get(scope, {}).items():
+        rate = parse_rate(value)
+        ident = idents[dimension]() if rate else None
+        if ident:
+            buckets.append((f'{KEY_PREFIX}:{{{scope}}}:{dimension}:{ident}', rate, 0))
+    return buckets
+
+
+def check(scope, request):
+    """
+    Decision for ``request`` against the limits of ``scope``; None when
+    nothing limits it or the backend failed open
+    """
+    buckets = buckets_for(scope, request)
+    if not buckets:
+        return None
+    try:
+        return backend().hit(buckets)
+    except Exception:
+        web_metrics.RATELIMIT_ERRORS.labels(scope).inc()
+        if not settings.RATELIMIT_FAIL_OPEN:
+            raise
+        logger.warning('Rate limit check for %s failed, letting the request through', scope, exc_info=True)
+        return None
+
+
+def too_many_requests(retry_after):
+    seconds = max(1, math.ceil(retry_after))
+    response = JsonResponse({
+        'success': False,
+        'message': f'Too many requests, retry in {seconds} seconds',
+    }, status=429)
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+def rate_limit(scope):
+    """
+    Reject requests to the wrapped view beyond the limits in
+    RATELIMITS[scope] with 429 Too Many Requests
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED:
+                decision = check(scope, request)
+                if decision is not None and not decision.allowed:
+                    dimension = decision.limited_by.split(':')[2]
+                    web_metrics.RATELIMIT_REJECTIONS.labels(scope, dimension).inc()
+                    return too_many_requests(decision.retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,167 @@
+"""
+Per-request timing.
+
+RequestTimingMiddleware measures, for every request:
+
+* total time spent in Django (middleware and view),
+* database time and query count (all aliases, through execute wrappers),
+* time spent calling Chapa (listings.chapa records each call),
+* time spent publishing Celery messages (before/after_task_publish signals).
+
+The numbers are returned in a ``Server-Timing`` header, logged on the
+``alx_travel_app.request_timing`` logger with one field per measurement and
+recorded in the Prometheus metrics (alx_travel_app.web_metrics).
+Requests slower than REQUEST_SLOW_THRESHOLD_MS are logged as warnings
+together with the queries they ran.
+"""
+import contextlib
+import contextvars
+import logging
+import time
+from collections import defaultdict
+
+from celery import signals
+from django.conf import settings
+from django.db import connections
+
+from alx_travel_app import web_metrics
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+_publish_started = contextvars.ContextVar('publish_started', default=None)
+
+
+class RequestTimings:
+    """
+    Durations (seconds) and counts collected while handling one request
+    """
+
+    def __init__(self, max_queries):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.queries = []
+        self.max_queries = max_queries
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+    def add_query(self, alias, sql, seconds):
+        self.add('db', seconds)
+        if len(self.queries) < self.max_queries:
+            self.queries.append((alias, seconds, sql))
+
+
+def current():
+    """
+    Timings of the request being handled, or None outside a request
+    """
+    return _current.get()
+
+
+def record(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@signals.before_task_publish.connect(dispatch_uid='request_timing_before_publish')
+def _before_publish(**kwargs):
+    if _current.get() is not None:
+        _publish_started.set(time.perf_counter())
+
+
+@signals.after_task_publish.connect(dispatch_uid='request_timing_after_publish')
+def _after_publish(**kwargs):
+    began = _publish_started.get()
+    if began is not None:
+        _publish_started.set(None)
+        record('broker', time.perf_counter() - began)
+
+
+def _query_recorder(timings, alias):
+    def execute_wrapper(execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add_query(alias, sql, time.perf_counter() - began)
+    return execute_wrapper
+
+
+def server_timing(timings, total):
+    """
+    Server-Timing header value; durations in milliseconds
+    """
+    entries = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={timings.durations["db"] * 1000:.1f};desc="{timings.counts["db"]} queries"',
+    ]
+    for name in ('chapa', 'broker'):
+        if timings.counts[name]:
+            entries.append(f'{name};dur={timings.durations[name] * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class RequestTimingMiddleware:
+    """
+    Time each request and report where the time went
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings(settings.REQUEST_TIMING_MAX_QUERIES)
+        token = _current.set(timings)
+        in_progress = web_metrics.IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        began = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(_query_recorder(timings, alias))
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            in_progress.dec()
+        total = time.perf_counter() - began
+        web_metrics.observe_request(request, response, timings, total)
+
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    def log(self, request, response, timings, total):
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'route': web_metrics.route_of(request),
+            'status_code': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timings.durations['db'] * 1000, 2),
+            'db_queries': timings.counts['db'],
+            'chapa_ms': round(timings.durations['chapa'] * 1000, 2),
+            'chapa_calls': timings.counts['chapa'],
+            'broker_ms': round(timings.durations['broker'] * 1000, 2),
+            'broker_publishes': timings.counts['broker'],
+        }
+        message = (
+            '%(method)s %(path)s %(status_code)s total=%(total_ms)sms db=%(db_ms)sms '
+            'queries=%(db_queries)s chapa=%(chapa_ms)sms broker=%(broker_ms)sms'
+        ) % fields
+
+        if total * 1000 < settings.REQUEST_SLOW_THRESHOLD_MS:
+            logger.info(message, extra=fields)
+            return
+        fields['slow'] = True
+        queries = [
+            f'  {seconds * 1000:8.2f}ms [{alias}] {sql}' for alias, seconds, sql in timings.queries
+        ]
+        if timings.counts['db'] > len(timings.queries):
+            queries.append(f'  ... {timings.counts["db"] - len(timings.queries)} more')
+        logger.warning('Slow request: %s\n%s', message, '\n'.join(queries), extra=fields)
@@ -0,0 +1,23 @@
+"""
+drf_spectacular extensions, registered when this module is imported.
+
+Only api_schema.render_schema imports it, so processes that serve the
+prebuilt schema never load drf_spectacular's generator machinery.
+"""
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class TokenAuthenticationScheme(OpenApiAuthenticationExtension):
+    """
+    alx_travel_app.auth.TokenAuthentication as the ``tokenAuth`` scheme
+    """
+    target_class = 'alx_travel_app.auth.TokenAuthentication'
+    name = 'tokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {
+            'type': 'apiKey',
+            'in': 'header',
+            'name': 'Authorization',
+            'description': 'Signed token from POST /api/auth/token/, sent as "Token <token>"',
+        }
@@ -50,6 +50,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'alx_travel_app.health.HealthCheckMiddleware',
+    'alx_travel_app.logs.RequestIdMiddleware',
+    'alx_travel_app.profiling.ProfilingMiddleware',
+    'alx_travel_app.tracing.TracingMiddleware',
+    'alx_travel_app.request_timing.RequestTimingMiddleware',
+    'alx_travel_app.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -57,6 +63,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'alx_travel_app.auth.TokenAuthenticationMiddleware',
+    'alx_travel_app.db_routers.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,21 +93,175 @@ WSGI_APPLICATION = 'alx_travel_app.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 # Use PostgreSQL in production, SQLite in development
+#
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked before
+# reuse, instead of opening a new connection for every request. Each
+# gunicorn thread and Celery worker process holds its own connection.
+#
+# DB_POOL=True switches PostgreSQL to psycopg 3's connection pool instead
+# (requires psycopg[binary,pool]); every process then keeps between
+# DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE connections shared by its threads.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true'
+DB_POOL = os.getenv('DB_POOL', 'False').lower() == 'true'
+# Seconds to wait for a new PostgreSQL connection (libpq waits forever).
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+
 if os.getenv('DATABASE_URL'):
     # Production database configuration
     import dj_database_url
     DATABASES = {
-        'default': dj_database_url.parse(os.getenv('DATABASE_URL'))
+        'default': dj_database_url.parse(
+            os.getenv('DATABASE_URL'),
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
     }
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and DB_CONNECT_TIMEOUT:
+        DATABASES['default'].setdefault('OPTIONS', {}).setdefault('connect_timeout', DB_CONNECT_TIMEOUT)
+    if DB_POOL:
+        from importlib.util import find_spec
+        from django.core.exceptions import ImproperlyConfigured
+        if DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql':
+            raise ImproperlyConfigured('DB_POOL is only supported with PostgreSQL')
+        # requirements.txt only pins psycopg2, which Django cannot pool.
+        if find_spec('psycopg') is None or find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured('DB_POOL needs psycopg 3 and its pool: pip install "psycopg[binary,pool]"')
+        # Django refuses to combine pooling with persistent connections; the
+        # pool itself keeps the connections open.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
 else:
     # Development database configuration
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 
+# SQLite concurrency
+# Default SQLite uses a rollback journal, so readers block the writer and
+# concurrent web and Celery writers fail with "database is locked". With
+# SQLITE_TUNED (default on) every SQLite connection switches to WAL (readers
+# no longer block the writer), waits up to SQLITE_BUSY_TIMEOUT seconds for
+# the write lock instead of failing, and starts transactions with BEGIN
+# IMMEDIATE so a transaction takes the write lock up front rather than
+# failing when it upgrades from a read lock halfway through.
+SQLITE_TUNED = os.getenv('SQLITE_TUNED', 'True').lower() == 'true'
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))
+
+if SQLITE_TUNED and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+            f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    })
+
+# Read replicas
+# DATABASE_REPLICA_URLS is a comma-separated list of replica URLs, added as
+# replica_0, replica_1, ... Only views decorated with
+# alx_travel_app.db_routers.replica_reads read from them. Clients that wrote
+# in the last DATABASE_REPLICA_STICKY_SECONDS keep reading from the primary,
+# and replicas lagging more than DATABASE_REPLICA_MAX_LAG seconds (checked
+# every DATABASE_REPLICA_LAG_CHECK_INTERVAL seconds) are skipped.
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+]
+if DATABASE_REPLICA_URLS:
+    import dj_database_url
+    for index, url in enumerate(DATABASE_REPLICA_URLS):
+        replica = dj_database_url.parse(
+            url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
+        if replica['ENGINE'] == 'django.db.backends.postgresql':
+            # Fail over to the primary quickly instead of hanging the request.
+            replica.setdefault('OPTIONS', {}).setdefault('connect_timeout', 2)
+        replica['TEST'] = {'MIRROR': 'default'}
+        DATABASES[f'replica_{index}'] = replica
+DATABASE_ROUTERS = ['alx_travel_app.db_routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.getenv('DATABASE_REPLICA_STICKY_SECONDS', '5'))
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '5'))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DATABASE_REPLICA_LAG_CHECK_INTERVAL', '10'))
+
+
+# Cache
+# A shared Redis cache lets web and worker processes see the same task
+# metrics, dedupe locks and rate limits; local memory is per process.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Authentication (alx_travel_app.auth)
+# With a shared cache, sessions are read from the cache (cached_db) and
+# users are cached for AUTH_USER_CACHE_TTL seconds, so login_required views
+# run no session or user query. Without one both stay in the database: a
+# per-process cache would keep serving sessions and users that another
+# process logged out or changed. API clients can use signed tokens from
+# /api/auth/token/ ("Authorization: Token <token>") instead of sessions.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE') or (
+    'django.contrib.sessions.backends.cached_db' if os.getenv('REDIS_URL')
+    else 'django.contrib.sessions.backends.db'
+)
+AUTHENTICATION_BACKENDS = ['alx_travel_app.auth.CachedModelBackend']
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL') or ('300' if os.getenv('REDIS_URL') else '0'))
+AUTH_TOKEN_MAX_AGE = int(os.getenv('AUTH_TOKEN_MAX_AGE', str(24 * 60 * 60)))
+
+# Rate limiting (alx_travel_app.ratelimit): token buckets per authenticated
+# user, client IP and endpoint for the views that call Chapa or write
+# bookings. Rates are "N/period[:burst]" (e.g. "5/m", "100/h:20"); an empty
+# rate disables that bucket. Buckets are shared through Redis when
+# RATELIMIT_REDIS_URL is set, otherwise each process keeps its own. Behind a
+# proxy set RATELIMIT_PROXY_COUNT so the client IP is taken from
+# X-Forwarded-For.
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() == 'true'
+RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL') or os.getenv('REDIS_URL', '')
+RATELIMIT_REDIS_TIMEOUT = float(os.getenv('RATELIMIT_REDIS_TIMEOUT', '0.25'))
+RATELIMIT_FAIL_OPEN = os.getenv('RATELIMIT_FAIL_OPEN', 'True').lower() == 'true'
+RATELIMIT_PROXY_COUNT = int(os.getenv('RATELIMIT_PROXY_COUNT', '0'))
+RATELIMITS = {
+    'initiate_payment': {
+        'user': os.getenv('RATELIMIT_INITIATE_PAYMENT_USER', '5/m'),
+        'ip': os.getenv('RATELIMIT_INITIATE_PAYMENT_IP', '20/m'),
+        'endpoint': os.getenv('RATELIMIT_INITIATE_PAYMENT_ENDPOINT', '300/m'),
+    },
+    'create_booking': {
+        'user': os.getenv('RATELIMIT_CREATE_BOOKING_USER', '10/m'),
+        'ip': os.getenv('RATELIMIT_CREATE_BOOKING_IP', '30/m'),
+        'endpoint': os.getenv('RATELIMIT_CREATE_BOOKING_ENDPOINT', '600/m'),
+    },
+    # Password guessing
+    'obtain_token': {
+        'ip': os.getenv('RATELIMIT_OBTAIN_TOKEN_IP', '10/m'),
+        'endpoint': os.getenv('RATELIMIT_OBTAIN_TOKEN_ENDPOINT', '300/m'),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -151,6 +313,119 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Chapa API Configuration
 CHAPA_SECRET_KEY = os.getenv('CHAPA_SECRET_KEY', 'your_chapa_secret_key_here')
 CHAPA_WEBHOOK_SECRET = os.getenv('CHAPA_WEBHOOK_SECRET', 'your_webhook_secret_here')
+CHAPA_BASE_URL = os.getenv('CHAPA_BASE_URL', 'https://api.chapa.co/v1')
+# (connect, read) timeouts in seconds for every Chapa call, so a stalled
+# connection cannot hold a gunicorn worker indefinitely.
+CHAPA_TIMEOUT = (
+    float(os.getenv('CHAPA_CONNECT_TIMEOUT', '3.05')),
+    float(os.getenv('CHAPA_READ_TIMEOUT', '10')),
+)
+
+# Outbound Chapa governor (listings/chapa.py): all processes share one token
+# bucket of CHAPA_RATE_LIMIT ("N/period[:burst]", empty to disable); set it
+# just under the account's limit. normal and low priority calls leave their
+# CHAPA_PRIORITY_RESERVE share of the bucket to higher priorities. A call
+# waits up to CHAPA_QUEUE_TIMEOUTS seconds for a token, then is dropped.
+CHAPA_RATE_LIMIT = os.getenv('CHAPA_RATE_LIMIT', '600/m:50')
+CHAPA_PRIORITY_RESERVE = {
+    'high': 0.0,
+    'normal': float(os.getenv('CHAPA_RESERVE_NORMAL', '0.2')),
+    'low': float(os.getenv('CHAPA_RESERVE_LOW', '0.5')),
+}
+CHAPA_QUEUE_TIMEOUTS = {
+    'high': float(os.getenv('CHAPA_QUEUE_TIMEOUT_HIGH', '3')),
+    'normal': float(os.getenv('CHAPA_QUEUE_TIMEOUT_NORMAL', '3')),
+    'low': float(os.getenv('CHAPA_QUEUE_TIMEOUT_LOW', '60')),
+}
+
+# Request timing (alx_travel_app.request_timing)
+# Each request's total, database, Chapa and broker time is logged and, with
+# REQUEST_TIMING_HEADER, returned in a Server-Timing header. The header shows
+# internal timings to every client, so it is only on by default with DEBUG.
+# Requests slower than REQUEST_SLOW_THRESHOLD_MS are logged with up to
+# REQUEST_TIMING_MAX_QUERIES of their queries.
+REQUEST_TIMING_HEADER = (os.getenv('REQUEST_TIMING_HEADER') or str(DEBUG)).lower() == 'true'
+REQUEST_SLOW_THRESHOLD_MS = float(os.getenv('REQUEST_SLOW_THRESHOLD_MS', '500'))
+REQUEST_TIMING_MAX_QUERIES = int(os.getenv('REQUEST_TIMING_MAX_QUERIES', '100'))
+
+# Response compression (alx_travel_app.compression)
+# Responses of COMPRESSION_CONTENT_TYPES of at least COMPRESSION_MIN_SIZE
+# bytes, and all such streaming responses, are compressed with the first
+# encoding in COMPRESSION_ENCODINGS the client accepts. br and zstd are
+# skipped unless the brotli / zstandard packages are installed. Entries
+# ending in '/' match a type prefix, entries starting with '+' a suffix.
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_ENCODINGS = [
+    name.strip() for name in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if name.strip()
+]
+COMPRESSION_CONTENT_TYPES = [
+    name.strip().lower() for name in os.getenv(
+        'COMPRESSION_CONTENT_TYPES',
+        'application/json,+json,application/vnd.oai.openapi,application/yaml,text/csv,text/plain',
+    ).split(',') if name.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3'))
+
+# Logging (alx_travel_app.logs)
+# Records from the web and Celery processes are queued and written to
+# stdout by a background thread, as JSON lines (LOG_FORMAT=json) or text,
+# tagged with the request id. LOG_SAMPLE_RATES keeps only a share of the
+# INFO records of busy loggers, e.g.
+# "alx_travel_app.request_timing=0.1"; warnings and errors are always kept.
+# At most LOG_QUEUE_SIZE records wait to be written; more are dropped.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': 'alx_travel_app.logs.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
+        'context': {'()': 'alx_travel_app.logs.ContextFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'alx_travel_app.logs.JSONFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'alx_travel_app.logs.QueueHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'formatter': LOG_FORMAT,
+            'filters': ['sampling', 'context'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Django's defaults print to the console in DEBUG and mail ADMINS;
+        # let its records go to the root handler instead.
+        'django': {'handlers': [], 'level': 'INFO', 'propagate': True},
+    },
+}
+
+# Tracing (alx_travel_app.tracing)
+# TRACING_EXPORTER is none (off), memory or file; the file exporter appends
+# spans as JSON lines to TRACING_FILE. TRACING_SAMPLE_RATE is the share of
+# new traces that are recorded.
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACING_FILE = os.getenv('TRACING_FILE', str(BASE_DIR / 'traces.jsonl'))
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+
+# Probes (alx_travel_app.health): /healthz does no I/O; /readyz checks the
+# READINESS_CHECKS concurrently, each within READINESS_TIMEOUT seconds, and
+# reuses its result for READINESS_CACHE_SECONDS.
+READINESS_CHECKS = [
+    name.strip() for name in os.getenv('READINESS_CHECKS', 'database,cache,broker').split(',') if name.strip()
+]
+READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT', '1'))
+READINESS_CACHE_SECONDS = float(os.getenv('READINESS_CACHE_SECONDS', '2'))
 
 # Email Configuration (for payment confirmations and booking notifications)
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
@@ -173,17 +448,65 @@ CELERY_ENABLE_UTC = True
 # Celery Task Settings
 CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
 CELERY_TASK_EAGER_PROPAGATES = True
+# Keep the LOGGING configuration above in workers instead of Celery's own.
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+
+# Embed a versioned snapshot of the email fields in task payloads so workers
+# can render notifications without a database round trip. Snapshots older
+# than TASK_SNAPSHOT_MAX_AGE seconds (0 disables the check) are re-fetched.
+TASK_PAYLOAD_SNAPSHOTS = os.getenv('TASK_PAYLOAD_SNAPSHOTS', 'False').lower() == 'true'
+TASK_SNAPSHOT_MAX_AGE = int(os.getenv('TASK_SNAPSHOT_MAX_AGE', '3600'))
+
+# Transactional outbox: tasks triggered by views are stored in the database
+# and published by `python manage.py relay_outbox`. Disabled by default when
+# tasks run eagerly, since there is no broker to relay to.
+OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', str(not CELERY_TASK_ALWAYS_EAGER)).lower() == 'true'
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETENTION_HOURS = int(os.getenv('OUTBOX_RETENTION_HOURS', '24'))
+
+# Task metrics (see alx_travel_app/task_metrics.py), served at
+# /api/metrics/tasks/. When METRICS_TOKEN is set the endpoint requires an
+# "Authorization: Bearer <token>" header; staff users are always allowed.
+TASK_METRICS_FLUSH_INTERVAL = float(os.getenv('TASK_METRICS_FLUSH_INTERVAL', '5'))
+TASK_METRICS_QUEUE_DEPTH_TTL = float(os.getenv('TASK_METRICS_QUEUE_DEPTH_TTL', '10'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Request profiling (alx_travel_app.profiling): requests with an
+# "X-Profile: <PROFILING_TOKEN>" header, and PROFILING_SAMPLE_RATE of all
+# requests, are profiled with cProfile or a stack sampler (PROFILING_MODE,
+# or the X-Profile-Mode header). The newest PROFILING_MAX_PROFILES are kept
+# in PROFILING_DIR and listed at /api/profiles/.
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN') or METRICS_TOKEN
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile').lower()
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', '0.005'))
+PROFILING_DIR = os.getenv('PROFILING_DIR') or str(BASE_DIR / 'profiles')
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+
+# Task deduplication (see listings/dedupe.py): a task runs at most once per
+# (task, entity, state) within TASK_DEDUPE_TTL seconds. Point
+# TASK_DEDUPE_CACHE at a shared cache (Redis or database) in production.
+TASK_DEDUPE_CACHE = os.getenv('TASK_DEDUPE_CACHE', 'default')
+TASK_DEDUPE_TTL = int(os.getenv('TASK_DEDUPE_TTL', '86400'))
+TASK_DEDUPE_RUNNING_TTL = int(os.getenv('TASK_DEDUPE_RUNNING_TTL', '300'))
 
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'alx_travel_app.auth.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # drf_spectacular's AutoSchema, imported only when the schema is generated
+    'DEFAULT_SCHEMA_CLASS': 'alx_travel_app.api_schema.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson-based drop-ins for JSONRenderer/JSONParser (alx_travel_app.fastjson)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'alx_travel_app.fastjson.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'alx_travel_app.fastjson.ORJSONParser',
     ],
 }
 
@@ -197,6 +520,13 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/',
 }
 
+# /api/schema/ serves schema.yaml / schema.json from OPENAPI_SCHEMA_DIR,
+# written at build time by `python manage.py build_schema`. Without them the
+# schema is generated on the first request. Either way each worker keeps the
+# document in memory and answers If-None-Match with 304.
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', str(BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', '300'))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
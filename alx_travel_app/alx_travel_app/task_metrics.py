@@ -0,0 +1,227 @@
+"""
+Celery task instrumentation.
+
+Signal handlers record, per task name, how long each task waited in the
+queue (publish to start), how long it ran and how it finished (success,
+retry or failure). Observations are aggregated in-process and flushed to the
+Django cache every TASK_METRICS_FLUSH_INTERVAL seconds, so the web process
+can report numbers from every worker as long as the cache is shared (i.e.
+REDIS_URL is set). A background thread per process does the flushing, so a
+worker that goes idle does not sit on its last counts.
+
+Latencies are kept as fixed-bucket histograms, which add up correctly across
+processes; percentiles are reported as the upper bound of the bucket that
+contains them.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from celery import signals
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'task_metrics'
+QUEUE_DEPTH_KEY = f'{KEY_PREFIX}:queue_depths'
+
+# Upper bounds in seconds; the last bucket catches everything slower.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float('inf'))
+OUTCOMES = ('succeeded', 'retried', 'failed')
+TIMINGS = ('queue_wait', 'runtime')
+
+_pending = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+_started = {}
+_flusher_pid = None
+
+
+def _key(task_name, *parts):
+    return ':'.join((KEY_PREFIX, task_name) + parts)
+
+
+def _bucket_index(seconds):
+    for index, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(BUCKETS) - 1
+
+
+def _add(key, amount=1):
+    _start_flusher()
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0) + amount
+
+
+def _start_flusher():
+    # Started on first use rather than at import, so every forked pool
+    # process gets its own thread.
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _pending_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='task-metrics-flush', daemon=True).start()
+
+
+def _flush_periodically():
+    wakeup = threading.Event()  # never set; waits without time.sleep
+    while True:
+        wakeup.wait(max(getattr(settings, 'TASK_METRICS_FLUSH_INTERVAL', 5), 0.1))
+        flush(force=True)
+
+
+def observe(task_name, timing, seconds):
+    """
+    Record one latency observation for ``task_name``
+    """
+    seconds = max(seconds, 0.0)
+    _add(_key(task_name, timing, 'count'))
+    _add(_key(task_name, timing, 'sum_us'), int(seconds * 1_000_000))
+    _add(_key(task_name, timing, 'bucket', str(_bucket_index(seconds))))
+
+
+def flush(force=False):
+    """
+    Push the counters accumulated by this process to the shared cache
+    """
+    global _last_flush
+    interval = getattr(settings, 'TASK_METRICS_FLUSH_INTERVAL', 5)
+    if not force and time.monotonic() - _last_flush < interval:
+        return
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    for key, amount in pending.items():
+        try:
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                # incr() needs an existing key; add() is a no-op if another
+                # process created it in the meantime.
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, amount)
+        except Exception:
+            logger.exception('Failed to flush task metric %s', key)
+
+
+def _summarize_histogram(values, task_name, timing):
+    count = values.get(_key(task_name, timing, 'count')) or 0
+    buckets = [values.get(_key(task_name, timing, 'bucket', str(i))) or 0 for i in range(len(BUCKETS))]
+    summary = {
+        'count': count,
+        'avg_ms': (values.get(_key(task_name, timing, 'sum_us')) or 0) / count / 1000 if count else 0.0,
+        'buckets': {('+Inf' if b == float('inf') else str(b)): n for b, n in zip(BUCKETS, buckets)},
+    }
+    for pct in (50, 95, 99):
+        rank = count * pct / 100.0
+        seen = 0
+        bound = None
+        for upper, n in zip(BUCKETS, buckets):
+            seen += n
+            if count and seen >= rank:
+                bound = upper
+                break
+        summary[f'p{pct}_ms'] = None if bound in (None, float('inf')) else bound * 1000
+    return summary
+
+
+def snapshot(task_names):
+    """
+    Aggregated metrics for ``task_names`` as stored in the cache
+    """
+    keys = []
+    for name in task_names:
+        keys += [_key(name, outcome) for outcome in OUTCOMES]
+        for timing in TIMINGS:
+            keys += [_key(name, timing, 'count'), _key(name, timing, 'sum_us')]
+            keys += [_key(name, timing, 'bucket', str(i)) for i in range(len(BUCKETS))]
+    values = cache.get_many(keys)
+
+    result = {}
+    for name in task_names:
+        entry = {outcome: values.get(_key(name, outcome)) or 0 for outcome in OUTCOMES}
+        for timing in TIMINGS:
+            entry[timing] = _summarize_histogram(values, name, timing)
+        result[name] = entry
+    return result
+
+
+def queue_depths(app):
+    """
+    Number of ready messages and consumers per task queue.
+
+    Sampling opens a broker connection, so the result is cached for
+    TASK_METRICS_QUEUE_DEPTH_TTL seconds and shared by every caller.
+    """
+    depths = cache.get(QUEUE_DEPTH_KEY)
+    if depths is not None:
+        return depths
+
+    depths = {}
+    try:
+        with app.connection_for_read() as conn:
+            conn.ensure_connection(max_retries=0)
+            channel = conn.default_channel
+            for queue in app.conf.task_queues or ():
+                try:
+                    _, messages, consumers = channel.queue_declare(queue=queue.name, passive=True)
+                    depths[queue.name] = {'messages': messages, 'consumers': consumers}
+                except Exception as e:
+                    depths[queue.name] = {'error': str(e)}
+                    channel = conn.channel()
+    except Exception as e:
+        depths = {'error': str(e)}
+    cache.set(QUEUE_DEPTH_KEY, depths, getattr(settings, 'TASK_METRICS_QUEUE_DEPTH_TTL', 10))
+    return depths
+
+
+@signals.before_task_publish.connect
+def _stamp_publish_time(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('sent_at', time.time())
+
+
+@signals.task_prerun.connect
+def _record_start(task_id=None, task=None, **kwargs):
+    now = time.time()
+    _started[task_id] = time.perf_counter()
+    sent_at = getattr(task.request, 'sent_at', None)
+    if sent_at is None and isinstance(getattr(task.request, 'headers', None), dict):
+        sent_at = task.request.headers.get('sent_at')  # eager apply() keeps headers apart
+    if sent_at:
+        # A countdown/eta task is not waiting in the queue before it is due.
+        eta = task.request.eta
+        if eta:
+            try:
+                sent_at = max(sent_at, datetime.fromisoformat(eta).timestamp())
+            except (TypeError, ValueError):
+                pass
+        observe(task.name, 'queue_wait', now - sent_at)
+
+
+@signals.task_postrun.connect
+def _record_finish(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        observe(task.name, 'runtime', time.perf_counter() - started)
+    if state == 'SUCCESS':
+        _add(_key(task.name, 'succeeded'))
+    elif state == 'RETRY':
+        _add(_key(task.name, 'retried'))
+    elif state == 'FAILURE':
+        _add(_key(task.name, 'failed'))
+    flush()
+
+
+@signals.worker_process_shutdown.connect
+@signals.worker_shutdown.connect
+def _flush_on_shutdown(**kwargs):
+    flush(force=True)
@@ -0,0 +1,360 @@
+"""
+Lightweight distributed tracing.
+
+A trace is a tree of spans sharing a trace id. Spans are created for:
+
+* each HTTP request (TracingMiddleware; continues an incoming
+  ``traceparent`` header),
+* each outbound Chapa call (listings.chapa),
+* each database query run while a sampled span is active (an execute
+  wrapper installed on every connection),
+* publishing a Celery task and running it. The publishing span's context
+  travels to the worker in the ``traceparent`` message header, and through
+  the outbox, which stores the header with the message.
+
+Context uses the W3C trace-context ``traceparent`` format, so the ids can be
+correlated with other tools. Finished spans go to the exporter chosen by
+TRACING_EXPORTER:
+
+* ``none``   - tracing is off (default),
+* ``memory`` - kept in ``exporter().spans`` for tests and the shell,
+* ``file``   - appended as JSON lines to TRACING_FILE; read them with
+  ``python manage.py show_traces``.
+
+TRACING_SAMPLE_RATE is the fraction of new traces that are recorded; the
+decision is made once per trace and propagated with the context.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+
+from celery import signals
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+TRACEPARENT = 'traceparent'
+
+_current = contextvars.ContextVar('current_span', default=None)
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+class Span:
+    """
+    One timed operation within a trace
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=True, kind='internal', attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start_time = time.time()
+        self._began = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = 'error'
+        self.attributes['error.type'] = type(error).__name__
+        self.attributes['error.message'] = str(error)
+
+    def finish(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._began
+        if self.sampled:
+            exporter().export(self)
+
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.span_id}-{"01" if self.sampled else "00"}'
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_time': self.start_time,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class NullExporter:
+    def export(self, span):
+        pass
+
+
+class InMemoryExporter:
+    """
+    Keeps finished spans in a list
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def trace(self, trace_id):
+        with self._lock:
+            return [span for span in self.spans if span.trace_id == trace_id]
+
+
+class FileExporter:
+    """
+    Appends finished spans to a file, one JSON object per line
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+
+def enabled():
+    return getattr(settings, 'TRACING_EXPORTER', 'none') != 'none'
+
+
+def exporter():
+    """
+    Exporter configured by TRACING_EXPORTER, created on first use
+    """
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                kind = getattr(settings, 'TRACING_EXPORTER', 'none')
+                if kind == 'memory':
+                    _exporter = InMemoryExporter()
+                elif kind == 'file':
+                    _exporter = FileExporter(settings.TRACING_FILE)
+                elif kind == 'none':
+                    _exporter = NullExporter()
+                else:
+                    raise ValueError(f'Unknown TRACING_EXPORTER {kind!r}, expected none, memory or file')
+    return _exporter
+
+
+def current_span():
+    return _current.get()
+
+
+def parse_traceparent(value):
+    """
+    (trace_id, parent span id, sampled) from a traceparent header, or None
+    if it is missing or malformed
+    """
+    if not value:
+        return None
+    parts = value.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+
+
+def _new_span(name, kind, attributes, traceparent):
+    parent = _current.get()
+    remote = parse_traceparent(traceparent) if parent is None else None
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, kind, attributes)
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+        return Span(name, trace_id, parent_id, sampled, kind, attributes)
+    sampled = random.random() < getattr(settings, 'TRACING_SAMPLE_RATE', 1.0)
+    return Span(name, os.urandom(16).hex(), None, sampled, kind, attributes)
+
+
+@contextlib.contextmanager
+def start_span(name, kind='internal', attributes=None, traceparent=None):
+    """
+    Run the block inside a new span, a child of the current span or, at the
+    root, of the remote ``traceparent``. Yields None when tracing is off.
+    """
+    if not enabled():
+        yield None
+        return
+    span = _new_span(name, kind, attributes, traceparent)
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        span.finish()
+
+
+def inject(headers):
+    """
+    Add the current span's traceparent to ``headers`` (a dict)
+    """
+    span = _current.get()
+    if span is not None:
+        headers.setdefault(TRACEPARENT, span.traceparent())
+    return headers
+
+
+class TracingMiddleware:
+    """
+    Wrap each request in a server span named after its URL pattern
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+        with start_span(
+            f'HTTP {request.method}', kind='server',
+            attributes={'http.method': request.method, 'http.target': request.path},
+            traceparent=request.headers.get(TRACEPARENT),
+        ) as span:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            if match is not None and match.route:
+                span.name = f'HTTP {request.method} /{match.route}'
+                span.set_attribute('http.route', f'/{match.route}')
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = 'error'
+        response['traceparent'] = span.traceparent()
+        return response
+
+
+# Database queries
+
+def _trace_query(execute, sql, params, many, context):
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with start_span(
+        f'db {sql.split(None, 1)[0].upper() if sql.strip() else "query"}', kind='client',
+        attributes={
+            'db.system': connection.vendor,
+            'db.alias': connection.alias,
+            'db.statement': sql,
+            'db.many': many,
+        },
+    ):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created, dispatch_uid='tracing_connection_created')
+def _install_query_tracing(sender, connection, **kwargs):
+    # The wrapper list belongs to the DatabaseWrapper, which outlives the
+    # underlying connection, so only install it once per wrapper.
+    if enabled() and _trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_trace_query)
+
+
+# Celery
+
+_publish_spans = contextvars.ContextVar('publish_spans', default=None)
+_task_spans = {}
+_task_spans_lock = threading.Lock()
+
+
+@signals.before_task_publish.connect(dispatch_uid='tracing_before_publish')
+def _before_publish(sender=None, headers=None, **kwargs):
+    # Messages published by the outbox relay carry the traceparent stored
+    # with the message; the publish span continues that trace.
+    if headers is None or not enabled():
+        return
+    if _current.get() is None and not headers.get(TRACEPARENT):
+        return
+    span = _new_span(
+        f'celery publish {sender}', 'producer',
+        {'celery.task_name': sender, 'celery.task_id': headers.get('id')},
+        headers.get(TRACEPARENT),
+    )
+    headers[TRACEPARENT] = span.traceparent()
+    _publish_spans.set((_publish_spans.get() or ()) + (span,))
+
+
+@signals.after_task_publish.connect(dispatch_uid='tracing_after_publish')
+def _after_publish(**kwargs):
+    spans = _publish_spans.get()
+    if spans:
+        _publish_spans.set(spans[:-1])
+        spans[-1].finish()
+
+
+def _task_traceparent(task):
+    request = task.request
+    value = getattr(request, TRACEPARENT, None)
+    if value is None and isinstance(getattr(request, 'headers', None), dict):
+        value = request.headers.get(TRACEPARENT)
+    return value
+
+
+@signals.task_prerun.connect(dispatch_uid='tracing_task_prerun')
+def _task_prerun(task_id=None, task=None, **kwargs):
+    if not enabled():
+        return
+    parent = parse_traceparent(_task_traceparent(task))
+    local = _current.get()  # eager tasks run inside the caller's span
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    elif local is not None:
+        trace_id, parent_id, sampled = local.trace_id, local.span_id, local.sampled
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < getattr(settings, 'TRACING_SAMPLE_RATE', 1.0)
+    span = Span(
+        f'celery task {task.name}', trace_id, parent_id, sampled, 'consumer',
+        {'celery.task_name': task.name, 'celery.task_id': task_id,
+         'celery.retries': task.request.retries},
+    )
+    token = _current.set(span)
+    with _task_spans_lock:
+        _task_spans[task_id] = (span, token)
+
+
+@signals.task_postrun.connect(dispatch_uid='tracing_task_postrun')
+def _task_postrun(task_id=None, state=None, retval=None, **kwargs):
+    with _task_spans_lock:
+        entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attribute('celery.state', state)
+    if state == 'FAILURE':
+        span.record_error(retval)
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Reset from a different context than prerun; just clear it.
+        _current.set(None)
+    span.finish()
@@ -18,16 +18,18 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+
+from alx_travel_app import api_schema, auth
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('listings.urls')),
+    path('api/auth/token/', auth.obtain_token, name='obtain_token'),
     
-    # API Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # API Documentation (drf_spectacular is imported on first use)
+    path('api/schema/', api_schema.schema, name='schema'),
+    path('swagger/', api_schema.swagger_ui, name='swagger-ui'),
+    path('redoc/', api_schema.redoc, name='redoc'),
 ]
 
 # Serve media files in development
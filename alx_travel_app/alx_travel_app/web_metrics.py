@@ -0,0 +1,123 @@
+"""
+Prometheus metrics for the web tier.
+
+RequestTimingMiddleware reports every request here, listings.chapa every
+Chapa call and alx_travel_app.ratelimit every rejection; ``render``
+produces the text exposition served at /metrics.
+
+Under gunicorn every worker process has its own counters. Set
+PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) in the environment
+before the server starts: each process then writes its values to files in
+that directory and ``render`` adds them up across processes.
+gunicorn.conf.py clears the directory on start and marks exited workers dead.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status code',
+    ['method', 'route', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request in Django',
+    ['method', 'route'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request',
+    ['route'], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Database time per request',
+    ['route'], buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests currently being handled',
+    ['method'], multiprocess_mode='livesum',
+)
+CHAPA_REQUESTS = Counter(
+    'chapa_requests_total', 'Outbound Chapa API calls by outcome',
+    ['endpoint', 'outcome'],
+)
+CHAPA_LATENCY = Histogram(
+    'chapa_request_duration_seconds', 'Outbound Chapa API call latency',
+    ['endpoint'], buckets=LATENCY_BUCKETS,
+)
+CHAPA_GOVERNOR_WAIT = Histogram(
+    'chapa_governor_wait_seconds', 'Time Chapa calls waited for a rate limit token',
+    ['priority'], buckets=LATENCY_BUCKETS,
+)
+CHAPA_GOVERNOR_DROPS = Counter(
+    'chapa_governor_drops_total', 'Chapa calls dropped for lack of a token before their deadline',
+    ['priority'],
+)
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total', 'Log records not written: sampled out or queue full',
+    ['reason'],
+)
+PROFILES = Counter(
+    'request_profiles_total', 'Requests picked for profiling: stored, busy (another profile running) or error',
+    ['mode', 'outcome'],
+)
+RATELIMIT_REJECTIONS = Counter(
+    'ratelimit_rejections_total', 'Requests rejected with 429 by the bucket that ran out',
+    ['scope', 'dimension'],
+)
+RATELIMIT_ERRORS = Counter(
+    'ratelimit_errors_total', 'Rate limit checks that failed (e.g. Redis unreachable)',
+    ['scope'],
+)
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def route_of(request):
+    """
+    URL pattern of the resolved view, so that ids do not become labels
+    """
+    match = getattr(request, 'resolver_match', None)
+    return f'/{match.route}' if match and match.route else UNMATCHED_ROUTE
+
+
+def observe_request(request, response, timings, total):
+    route = route_of(request)
+    REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(request.method, route).observe(total)
+    REQUEST_DB_QUERIES.labels(route).observe(timings.counts['db'])
+    REQUEST_DB_TIME.labels(route).observe(timings.durations['db'])
+
+
+def chapa_outcome(response=None, error=None):
+    """
+    ``ok``, ``client_error``, ``server_error`` or ``exception``
+    """
+    if error is not None or response is None:
+        return 'exception'
+    if response.status_code >= 500:
+        return 'server_error'
+    if response.status_code >= 400:
+        return 'client_error'
+    return 'ok'
+
+
+def observe_chapa(endpoint, seconds, response=None, error=None):
+    CHAPA_REQUESTS.labels(endpoint, chapa_outcome(response, error)).inc()
+    CHAPA_LATENCY.labels(endpoint).observe(seconds)
+
+
+def render():
+    """
+    Current metrics in the Prometheus text format, and its content type
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,89 @@
+"""
+End-to-end latency per task class under mixed load.
+
+A burst of bulk notification probes is published together with a trickle of
+payment probes, and every probe reports how long it took from publish to
+completion. With dedicated queues the payment latency should stay flat
+regardless of the notification backlog; with --single-queue everything goes
+through the notifications queue, which reproduces the old behaviour.
+
+Start the workers with the probe task loaded and a result backend configured
+(e.g. CELERY_RESULT_BACKEND=redis://localhost:6379/1), one per profile:
+
+    CELERY_WORKER_PROFILE=payments celery -A alx_travel_app worker --include benchmarks.celery_queues
+    CELERY_WORKER_PROFILE=notifications celery -A alx_travel_app worker --include benchmarks.celery_queues
+
+then run from the project directory:
+
+    python -m benchmarks.celery_queues --bulk 2000 --payments 100 --io-delay 0.05
+"""
+import argparse
+import time
+
+from benchmarks.common import format_summary, setup_django, summarize, write_report
+
+if __name__ == '__main__':
+    setup_django()
+
+from alx_travel_app.celery import app, QUEUE_NOTIFICATIONS, QUEUE_PAYMENTS
+
+
+@app.task(name='benchmarks.probe')
+def probe(sent_at, io_delay):
+    """
+    Simulate an IO-bound email send and return publish-to-completion latency
+    """
+    time.sleep(io_delay)
+    return time.time() - sent_at
+
+
+def run(bulk, payments, io_delay, single_queue=False, timeout=600):
+    payment_queue = QUEUE_NOTIFICATIONS if single_queue else QUEUE_PAYMENTS
+    pending = {'notifications': [], 'payments': []}
+
+    # Interleave the payment probes evenly through the notification burst,
+    # the way payment confirmations arrive while a bulk send is running.
+    every = max(1, bulk // max(1, payments))
+    started = time.time()
+    sent_payments = 0
+    for i in range(bulk):
+        pending['notifications'].append(
+            probe.apply_async((time.time(), io_delay), queue=QUEUE_NOTIFICATIONS)
+        )
+        if i % every == 0 and sent_payments < payments:
+            pending['payments'].append(
+                probe.apply_async((time.time(), io_delay), queue=payment_queue)
+            )
+            sent_payments += 1
+    while sent_payments < payments:
+        pending['payments'].append(
+            probe.apply_async((time.time(), io_delay), queue=payment_queue)
+        )
+        sent_payments += 1
+
+    results = {}
+    for name, async_results in pending.items():
+        samples = [r.get(timeout=timeout) for r in async_results]
+        results[name] = summarize(samples, elapsed=time.time() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bulk', type=int, default=2000, help='notification probes to publish')
+    parser.add_argument('--payments', type=int, default=100, help='payment probes to publish')
+    parser.add_argument('--io-delay', type=float, default=0.05, help='simulated SMTP time per task (s)')
+    parser.add_argument('--single-queue', action='store_true',
+                        help='route payment probes through the notifications queue')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(args.bulk, args.payments, args.io_delay, args.single_queue)
+    for name, summary in results.items():
+        print(format_summary(name, summary))
+    if args.output:
+        write_report(args.output, 'celery_queues', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
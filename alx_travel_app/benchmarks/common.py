@@ -0,0 +1,102 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """
+    Make the project importable and configure Django for a standalone script
+    """
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+    import django
+    django.setup()
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(pct / 100.0 * len(samples))) - 1))
+    return samples[rank]
+
+
+def summarize(samples, elapsed=None):
+    """
+    Count, throughput and latency percentiles (milliseconds) for a list of
+    durations in seconds
+    """
+    ordered = sorted(samples)
+    summary = {
+        'count': len(ordered),
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': (ordered[-1] * 1000) if ordered else 0.0,
+        'mean_ms': (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+    }
+    if elapsed:
+        summary['throughput_per_s'] = len(ordered) / elapsed
+    return summary
+
+
+def format_summary(name, summary):
+    """
+    One-line human readable rendering of summarize() output
+    """
+    line = (
+        f"{name:<24} n={summary['count']:<6} "
+        f"p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms "
+        f"p99={summary['p99_ms']:8.2f}ms max={summary['max_ms']:8.2f}ms"
+    )
+    if 'throughput_per_s' in summary:
+        line += f" {summary['throughput_per_s']:9.1f}/s"
+    return line
+
+
+def git_revision():
+    """
+    Short hash of the checked out commit, or None outside a git checkout
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, name, results, params=None):
+    """
+    Store benchmark results as JSON together with enough context (commit,
+    host, parameters) to compare runs across commits
+    """
+    report = {
+        'benchmark': name,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': git_revision(),
+        'host': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'params': params or {},
+        'results': results,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
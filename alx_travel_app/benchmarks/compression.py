@@ -0,0 +1,92 @@
+"""
+CPU cost versus bytes saved for each response compression codec and level.
+
+Payloads are booking list responses as the API renders them (fastjson),
+at several list sizes. For every codec/level the script reports the
+compressed size, the compression ratio, the time to compress and
+decompress, compression throughput, and the CPU time spent per KiB saved,
+which is the number to weigh against the clients' bandwidth.
+
+    python -m benchmarks.compression --rows 20,200,2000 --output results/compression.json
+
+brotli and zstd are skipped when their packages are not installed.
+"""
+import argparse
+import zlib
+
+from benchmarks.common import setup_django, write_report
+from benchmarks.json_codec import best_of, booking_rows
+
+LEVELS = {
+    'gzip': (1, 4, 6, 9),
+    'br': (1, 4, 6, 9, 11),
+    'zstd': (1, 3, 6, 9, 19),
+}
+
+
+def codecs(names):
+    from alx_travel_app.compression import BrotliCodec, GzipCodec, ZstdCodec, brotli, zstandard
+
+    available = {
+        'gzip': (GzipCodec, lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS)),
+    }
+    if brotli is not None:
+        available['br'] = (BrotliCodec, brotli.decompress)
+    if zstandard is not None:
+        available['zstd'] = (ZstdCodec, lambda data: zstandard.ZstdDecompressor().decompress(data))
+    for name in names:
+        if name not in available:
+            print(f'skipping {name}: package not installed')
+            continue
+        codec_class, decompress = available[name]
+        for level in LEVELS[name]:
+            yield f'{name}-{level}', codec_class(level), decompress
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response compression CPU cost versus bytes saved')
+    parser.add_argument('--rows', default='20,200,2000', help='booking list sizes')
+    parser.add_argument('--codecs', default='gzip,br,zstd')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    setup_django()
+    from alx_travel_app import fastjson
+
+    results = {}
+    for rows in (int(n) for n in args.rows.split(',')):
+        payload = fastjson.dumps(booking_rows(rows, typed=False))
+        print(f'\nbookings_{rows}: {len(payload):,} bytes')
+        print(f"{'codec':<9} {'bytes':>10} {'ratio':>6} {'compress':>11} {'decompress':>11} "
+              f"{'MB/s':>8} {'us/KiB saved':>13}")
+        for name, codec, decompress in codecs(args.codecs.split(',')):
+            compressed = codec.compress(payload)
+            assert decompress(compressed) == payload
+            compress_us = best_of(lambda: codec.compress(payload), args.repeat)
+            decompress_us = best_of(lambda: decompress(compressed), args.repeat)
+            saved_kib = (len(payload) - len(compressed)) / 1024
+            result = {
+                'input_bytes': len(payload),
+                'output_bytes': len(compressed),
+                'ratio': len(payload) / len(compressed),
+                'compress_us': compress_us,
+                'decompress_us': decompress_us,
+                'compress_mb_s': len(payload) / compress_us,
+                'us_per_kib_saved': compress_us / saved_kib if saved_kib > 0 else None,
+            }
+            results[f'bookings_{rows} {name}'] = result
+            per_kib = f"{result['us_per_kib_saved']:13.2f}" if saved_kib > 0 else f"{'-':>13}"
+            print(
+                f"{name:<9} {len(compressed):>10,} {result['ratio']:6.1f} "
+                f"{compress_us:9.1f}us {decompress_us:9.1f}us "
+                f"{result['compress_mb_s']:8.1f} {per_kib}",
+                flush=True,
+            )
+
+    if args.output:
+        write_report(args.output, 'compression', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Per-request database connection overhead and connections held per node.
+
+Each connection mode runs in its own process (settings are read at start):
+
+* ``per_request`` - DB_CONN_MAX_AGE=0, a new connection for every request
+* ``persistent``  - DB_CONN_MAX_AGE=60 with health checks
+* ``pool``        - DB_POOL=True, psycopg 3 pool (PostgreSQL only)
+
+and serves the same booking-list request repeatedly through Django's test
+client. The test client skips the connection cleanup a real server does at
+the start and end of each request, so the benchmark calls it explicitly.
+The report shows mean request latency, connections opened per request, the
+raw connect cost, and the number of connections one node would hold for
+the given gunicorn/Celery sizing.
+
+Results are only meaningful against the database you deploy on:
+
+    python -m benchmarks.db_connections --database-url postgresql://... \\
+        --workers 5 --threads 8 --celery-concurrency 8
+
+The database must be migrated and contain at least one user. Without
+--database-url a throwaway SQLite database is used (pool mode is skipped).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import PROJECT_DIR, summarize, write_report
+
+MODES = {
+    'per_request': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': 'False'},
+    'persistent': {'DB_CONN_MAX_AGE': '60', 'DB_POOL': 'False'},
+    'pool': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': 'True'},
+}
+
+
+def child(requests_count):
+    """
+    Runs inside the per-mode subprocess; prints a JSON result line
+    """
+    from benchmarks.common import setup_django
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.db import close_old_connections, connection
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+
+    opened = []
+    connection_created.connect(lambda **kwargs: opened.append(1), weak=False)
+
+    user_id = User.objects.values_list('id', flat=True).first()
+    connection.close()
+    client = Client()
+    url = f'/api/booking/?user_id={user_id}'
+
+    client.get(url)  # warm up imports and URL resolution
+    opened.clear()
+    latencies = []
+    for _ in range(requests_count):
+        began = time.perf_counter()
+        close_old_connections()  # request_started
+        client.get(url)
+        close_old_connections()  # request_finished
+        latencies.append(time.perf_counter() - began)
+    connections_per_request = len(opened) / requests_count
+
+    connect_times = []
+    if not connection.settings_dict['OPTIONS'].get('pool'):
+        for _ in range(20):
+            connection.close()
+            began = time.perf_counter()
+            connection.ensure_connection()
+            connect_times.append(time.perf_counter() - began)
+
+    print(json.dumps({
+        'requests': summarize(latencies),
+        'connections_per_request': connections_per_request,
+        'connect': summarize(connect_times) if connect_times else None,
+    }))
+
+
+def connections_per_node(mode, workers, threads, celery_concurrency, pool_max):
+    """
+    Upper bound of database connections one node holds open
+    """
+    celery = celery_concurrency  # one connection per worker process/thread
+    if mode == 'pool':
+        return workers * min(threads, pool_max) + celery
+    return workers * threads + celery
+
+
+def main():
+    if '--child' in sys.argv:
+        child(int(sys.argv[sys.argv.index('--child') + 1]))
+        return
+
+    parser = argparse.ArgumentParser(description='Database connection overhead')
+    parser.add_argument('--database-url', help='database to test (default: throwaway SQLite)')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=5, help='gunicorn workers per node')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--celery-concurrency', type=int, default=8)
+    parser.add_argument('--pool-max-size', type=int, default=10)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url
+        if not database_url:
+            from benchmarks.server import prepare_database
+            database_url, _, _ = prepare_database(os.path.join(tmp, 'bench.sqlite3'))
+
+        results = {}
+        for mode, mode_env in MODES.items():
+            if mode == 'pool' and not database_url.startswith('postgres'):
+                continue
+            env = dict(os.environ, DATABASE_URL=database_url, DEBUG='False',
+                       DB_POOL_MAX_SIZE=str(args.pool_max_size), **mode_env)
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.db_connections', '--child', str(args.requests)],
+                cwd=PROJECT_DIR, env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['max_connections_per_node'] = connections_per_node(
+                mode, args.workers, args.threads, args.celery_concurrency, args.pool_max_size,
+            )
+            results[mode] = result
+
+    baseline = results['per_request']['requests']['mean_ms']
+    for mode, result in results.items():
+        connect = result['connect']
+        print(
+            f"{mode:<12} mean {result['requests']['mean_ms']:7.3f}ms "
+            f"(overhead vs per_request {result['requests']['mean_ms'] - baseline:+7.3f}ms)  "
+            f"p99 {result['requests']['p99_ms']:7.3f}ms  "
+            f"connects/request {result['connections_per_request']:.2f}  "
+            f"connect {connect['mean_ms'] if connect else float('nan'):6.3f}ms  "
+            f"max connections/node {result['max_connections_per_node']}"
+        )
+    if args.output:
+        write_report(args.output, 'db_connections', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Local stand-in for the Chapa API.
+
+Implements the two endpoints the app calls, transaction/initialize and
+transaction/verify/<tx_ref>, with a configurable response delay (plus
+uniform jitter) and error rate, so benchmarks can exercise the Chapa-bound
+code paths without network access. Failed calls answer 500 after the same
+delay. Point the app at it with CHAPA_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.fake_chapa --port 8900 --latency 0.2 --jitter 0.05 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeChapaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay_or_fail(self):
+        """
+        Wait for the simulated latency; True if this call should fail
+        """
+        server = self.server
+        with server.random_lock:
+            delay = server.latency + server.random.uniform(0, server.jitter)
+            failed = server.random.random() < server.error_rate
+        time.sleep(delay)
+        if failed:
+            with server.random_lock:
+                server.errors += 1
+            self._send(500, {'status': 'failed', 'message': 'Simulated Chapa error'})
+        return failed
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if self._delay_or_fail():
+            return
+        if self.path.rstrip('/') == '/v1/transaction/initialize':
+            reference = uuid.uuid4().hex[:12]
+            self._send(200, {
+                'status': 'success',
+                'message': 'Hosted Link',
+                'data': {
+                    'checkout_url': f'https://checkout.chapa.co/checkout/payment/{reference}',
+                    'reference': reference,
+                    'tx_ref': data.get('tx_ref'),
+                },
+            })
+        else:
+            self._send(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        if self._delay_or_fail():
+            return
+        prefix = '/v1/transaction/verify/'
+        if self.path.startswith(prefix):
+            self._send(200, {
+                'status': 'success',
+                'data': {'status': self.server.verify_status, 'tx_ref': self.path[len(prefix):]},
+            })
+        else:
+            self._send(404, {'message': 'Not found'})
+
+
+def start(host='127.0.0.1', port=0, latency=0.0, verify_status='pending',
+          jitter=0.0, error_rate=0.0, seed=None):
+    """
+    Run the fake API in a background thread and return the server; its
+    base URL for CHAPA_BASE_URL is ``base_url(server)``. ``server.errors``
+    counts the simulated failures.
+    """
+    server = ThreadingHTTPServer((host, port), FakeChapaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.verify_status = verify_status
+    server.random = random.Random(seed)
+    server.random_lock = threading.Lock()
+    server.errors = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Chapa API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.2, help='response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='extra uniformly distributed delay of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of calls answered with HTTP 500')
+    parser.add_argument('--seed', type=int, help='random seed for jitter and errors')
+    parser.add_argument('--verify-status', default='pending',
+                        help='status reported by transaction/verify (success, failed, pending)')
+    args = parser.parse_args()
+
+    server = start(args.host, args.port, args.latency, args.verify_status,
+                   args.jitter, args.error_rate, args.seed)
+    print(f'Fake Chapa listening on {base_url(server)}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Throughput and tail latency of each gunicorn worker profile.
+
+Every profile is started on the same machine against the same seeded
+database and the same local Chapa stand-in, then driven with a mixed
+workload: half the requests verify a payment (one Chapa round trip plus a
+write), half list a user's bookings (database only).
+
+    python -m benchmarks.gunicorn_profiles --profiles sync,gthread,uvicorn \\
+        --concurrency 64 --duration 20 --chapa-latency 0.2 --output results/gunicorn.json
+
+Use --workers to pin the same process count for every profile; otherwise
+each profile runs with its own defaults from gunicorn.conf.py.
+"""
+import argparse
+import itertools
+import os
+import tempfile
+
+from benchmarks import fake_chapa
+from benchmarks.common import format_summary, summarize, write_report
+from benchmarks.load import run_load
+from benchmarks.server import prepare_database, start_gunicorn, stop
+
+
+def mixed_workload(base_url, user_id, transaction_id):
+    counter = itertools.count()
+
+    def workload(session):
+        if next(counter) % 2:
+            return 'list_bookings', session.get(
+                f'{base_url}/api/booking/', params={'user_id': user_id}, timeout=30
+            )
+        return 'verify_payment', session.post(
+            f'{base_url}/api/payment/verify/', json={'transaction_id': transaction_id}, timeout=30
+        )
+    return workload
+
+
+def run(profiles, concurrency, duration, warmup, chapa_latency, workers=None,
+        port=8765, database_url=None):
+    chapa = fake_chapa.start(latency=chapa_latency)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url, user_id, transaction_id = prepare_database(os.path.join(tmp, 'bench.sqlite3'))
+        env = {
+            'DATABASE_URL': database_url or db_url,
+            'CHAPA_BASE_URL': fake_chapa.base_url(chapa),
+            'OUTBOX_ENABLED': 'True',
+            'DEBUG': 'False',
+            # All load comes from one address, and the fake Chapa has no quota.
+            'RATELIMIT_ENABLED': 'False',
+            'CHAPA_RATE_LIMIT': '',
+        }
+        if workers:
+            env['GUNICORN_WORKERS'] = str(workers)
+
+        for profile in profiles:
+            server = start_gunicorn(port, dict(env, GUNICORN_PROFILE=profile))
+            try:
+                outcome = run_load(
+                    mixed_workload(f'http://127.0.0.1:{port}', user_id, transaction_id),
+                    concurrency, duration, warmup,
+                )
+            finally:
+                stop(server)
+
+            all_samples = [s for samples in outcome['latencies'].values() for s in samples]
+            results[profile] = {
+                'overall': summarize(all_samples, outcome['elapsed']),
+                'errors': outcome['errors'],
+            }
+            for name, samples in outcome['latencies'].items():
+                results[profile][name] = summarize(samples, outcome['elapsed'])
+    chapa.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare gunicorn worker profiles')
+    parser.add_argument('--profiles', default='sync,gthread,uvicorn')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--chapa-latency', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, help='same worker count for every profile')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--database-url', help='use this database instead of a throwaway SQLite file')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(
+        args.profiles.split(','), args.concurrency, args.duration, args.warmup,
+        args.chapa_latency, args.workers, args.port, args.database_url,
+    )
+    for profile, result in results.items():
+        print(f'[{profile}] errors={result["errors"]}')
+        for name, summary in result.items():
+            if name != 'errors':
+                print('  ' + format_summary(name, summary))
+    if args.output:
+        write_report(args.output, 'gunicorn_profiles', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Startup time and copy-on-write memory sharing with and without preload_app.
+
+For each mode gunicorn is started against a seeded throwaway database and
+the script records:
+
+* time from launching gunicorn to the first successfully served request,
+* latency of the first requests (cold workers) versus later ones,
+* per-process RSS, PSS and USS from /proc/<pid>/smaps_rollup, so the share
+  of each worker's memory that is shared with the master can be compared.
+
+Linux only (smaps_rollup).
+
+    python -m benchmarks.gunicorn_startup --workers 4 --output results/startup.json
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.common import summarize, write_report
+from benchmarks.server import prepare_database, start_gunicorn, stop
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps(pid):
+    """
+    Memory counters for ``pid`` in KiB
+    """
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in SMAPS_FIELDS:
+                values[name] = int(rest.split()[0])
+    values['Uss'] = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def wait_for_workers(master_pid, count, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pids = worker_pids(master_pid)
+        if len(pids) >= count:
+            return pids
+        time.sleep(0.05)
+    raise RuntimeError('workers did not start')
+
+
+def measure(preload, workers, profile, env, port, requests_after_start):
+    url = f'http://127.0.0.1:{port}/api/booking/'
+    started = time.perf_counter()
+    server = start_gunicorn(port, dict(
+        env, GUNICORN_PRELOAD=str(preload), GUNICORN_WORKERS=str(workers), GUNICORN_PROFILE=profile,
+    ))
+    try:
+        time_to_first = time.perf_counter() - started
+        pids = wait_for_workers(server.pid, workers)
+
+        # New connection per request so they spread over the workers.
+        latencies = []
+        for _ in range(requests_after_start):
+            began = time.perf_counter()
+            requests.get(url, params={'user_id': env['BENCH_USER_ID']}, timeout=30)
+            latencies.append(time.perf_counter() - began)
+
+        master = read_smaps(server.pid)
+        per_worker = [read_smaps(pid) for pid in pids]
+    finally:
+        stop(server)
+
+    def total(field):
+        return sum(w[field] for w in per_worker)
+
+    return {
+        'time_to_first_request_ms': time_to_first * 1000,
+        'first_requests': summarize(latencies[:workers]),
+        'later_requests': summarize(latencies[workers:]),
+        'master_kib': master,
+        'workers_rss_kib': total('Rss'),
+        'workers_pss_kib': total('Pss'),
+        'workers_uss_kib': total('Uss'),
+        'shared_fraction': 1 - total('Uss') / total('Rss') if total('Rss') else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn startup and memory sharing')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--profile', default='gthread')
+    parser.add_argument('--requests', type=int, default=40, help='requests sent after startup')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url, user_id, _ = prepare_database(os.path.join(tmp, 'bench.sqlite3'))
+        env = {'DATABASE_URL': database_url, 'DEBUG': 'False', 'BENCH_USER_ID': str(user_id)}
+        for preload in (False, True):
+            name = 'preload' if preload else 'no_preload'
+            results[name] = measure(preload, args.workers, args.profile, env, args.port, args.requests)
+
+    for name, result in results.items():
+        print(
+            f"{name:<11} first request {result['time_to_first_request_ms']:8.1f}ms  "
+            f"cold p50 {result['first_requests']['p50_ms']:7.2f}ms  "
+            f"warm p50 {result['later_requests']['p50_ms']:7.2f}ms  "
+            f"workers RSS {result['workers_rss_kib'] / 1024:7.1f}MiB  "
+            f"PSS {result['workers_pss_kib'] / 1024:7.1f}MiB  "
+            f"USS {result['workers_uss_kib'] / 1024:7.1f}MiB  "
+            f"shared {result['shared_fraction']:.0%}"
+        )
+    if args.output:
+        write_report(args.output, 'gunicorn_startup', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Worker import time with and without the documentation tooling.
+
+Each sample is a fresh interpreter that does what a gunicorn worker does
+before it can answer its first request: import the WSGI application
+(``django.setup()``) and load the URLconf. Two modes are measured:
+
+* ``lazy``  - the tree as it is; drf_spectacular's AutoSchema, views and
+  generator are only imported when the schema is generated or /swagger/ or
+  /redoc/ is hit,
+* ``eager`` - the same, plus importing ``drf_spectacular.openapi`` and
+  ``drf_spectacular.views`` as DEFAULT_SCHEMA_CLASS, the view annotations
+  and the URLconf used to do, for comparison.
+
+Samples of the two modes alternate, so that drift in machine load affects
+both alike. A whole start varies by tens of milliseconds between runs, so
+``lazy`` samples also time importing the deferred modules once the URLconf
+is loaded (``deferred``): that is the cost taken off each worker's start,
+measured without the noise of the rest of it.
+
+    python -m benchmarks.import_time --runs 20 --output results/import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import PROJECT_DIR, format_summary, summarize, write_report
+
+DOC_MODULES = ('drf_spectacular.views', 'drf_spectacular.generators', 'drf_spectacular.openapi')
+
+
+def import_doc_modules():
+    import drf_spectacular.openapi  # noqa: F401
+    import drf_spectacular.views  # noqa: F401
+
+
+def child(mode):
+    import time
+    began = time.perf_counter()
+    from alx_travel_app.wsgi import application  # noqa: F401  (django.setup)
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    if mode == 'eager':
+        import_doc_modules()
+    elapsed = time.perf_counter() - began
+    result = {
+        'seconds': elapsed,
+        'modules': len(sys.modules),
+        'doc_modules': [name for name in DOC_MODULES if name in sys.modules],
+    }
+    if mode == 'lazy':
+        began = time.perf_counter()
+        import_doc_modules()
+        result['deferred_seconds'] = time.perf_counter() - began
+    print(json.dumps(result))
+
+
+def sample(mode):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.import_time', '--child', mode],
+        cwd=PROJECT_DIR, env=dict(os.environ, DJANGO_SETTINGS_MODULE='alx_travel_app.settings'),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    if '--child' in sys.argv:
+        child(sys.argv[sys.argv.index('--child') + 1])
+        return
+
+    parser = argparse.ArgumentParser(description='Worker import time with lazy and eager doc tooling')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    sample('lazy')  # warm the bytecode cache
+    samples = {'eager': [], 'lazy': []}
+    for _ in range(args.runs):
+        for mode in samples:
+            samples[mode].append(sample(mode))
+    results = {}
+    for mode in samples:
+        results[mode] = summarize([s['seconds'] for s in samples[mode]])
+        results[mode]['modules'] = samples[mode][-1]['modules']
+        results[mode]['doc_modules'] = samples[mode][-1]['doc_modules']
+        print(format_summary(mode, results[mode])
+              + f"  modules={results[mode]['modules']}", flush=True)
+    results['deferred'] = summarize([s['deferred_seconds'] for s in samples['lazy']])
+    print(format_summary('deferred', results['deferred']))
+
+    deferred = results['deferred']['p50_ms']
+    print(f"\nlazy doc tooling keeps {results['eager']['modules'] - results['lazy']['modules']} modules "
+          f'and {deferred:.1f}ms of imports (median) off each worker start, '
+          f"{deferred / results['lazy']['p50_ms'] * 100:.0f}% of the lazy start")
+    if args.output:
+        write_report(args.output, 'import_time', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
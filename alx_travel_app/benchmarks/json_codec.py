@@ -0,0 +1,136 @@
+"""
+Encode/decode microbenchmarks: stdlib json versus alx_travel_app.fastjson.
+
+Encoding is measured for what the views send:
+
+* ``bookings_N``     - a booking list response as the views build it
+  (values already converted to strings),
+* ``typed_N``        - the same rows with raw Decimal, UUID, date and
+  datetime values, which go through the encoders' ``default``,
+
+each through the stdlib encoder (DjangoJSONEncoder) versus
+``fastjson.dumps`` and through DRF's JSONRenderer versus ORJSONRenderer.
+Decoding is measured for a booking request body and a payment webhook body
+(json.loads versus fastjson.loads).
+
+    python -m benchmarks.json_codec --rows 1,20,500 --output results/json.json
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks.common import setup_django, write_report
+
+
+def best_of(func, repeat, target=0.2):
+    """
+    Fastest time per call in microseconds over ``repeat`` rounds of about
+    ``target`` seconds each
+    """
+    loops = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - began >= target / 10:
+            break
+        loops *= 2
+    loops = max(1, int(loops * target / max(time.perf_counter() - began, 1e-9) / 10))
+    best = float('inf')
+    for _ in range(repeat):
+        began = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - began) / loops)
+    return best * 1e6
+
+
+def booking_rows(count, typed):
+    from django.utils import timezone
+
+    now = timezone.now()
+    rows = []
+    for i in range(count):
+        row = {
+            'booking_id': uuid.uuid4(),
+            'booking_reference': f'BK{i:08X}',
+            'destination': 'Lalibela',
+            'travel_date': date(2026, 12, 1) + timedelta(days=i % 30),
+            'return_date': None if i % 5 == 0 else date(2026, 12, 8),
+            'number_of_travelers': 1 + i % 4,
+            'total_amount': Decimal('450.00') + i,
+            'booking_status': 'confirmed',
+            'created_at': now - timedelta(minutes=i),
+        }
+        if not typed:
+            row = {
+                key: value.isoformat() if hasattr(value, 'isoformat')
+                else str(value) if isinstance(value, (uuid.UUID, Decimal)) else value
+                for key, value in row.items()
+            }
+        rows.append(row)
+    return {'success': True, 'data': rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='stdlib json versus orjson encode/decode')
+    parser.add_argument('--rows', default='1,20,500', help='booking list sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.serializers.json import DjangoJSONEncoder
+    from rest_framework.renderers import JSONRenderer
+
+    from alx_travel_app import fastjson
+
+    drf, fast_drf = JSONRenderer(), fastjson.ORJSONRenderer()
+    cases = {}
+    for count in (int(n) for n in args.rows.split(',')):
+        for typed in (False, True):
+            payload = booking_rows(count, typed)
+            name = f"{'typed' if typed else 'bookings'}_{count}"
+            assert json.loads(json.dumps(payload, cls=DjangoJSONEncoder)) == fastjson.loads(fastjson.dumps(payload))
+            cases[f'encode {name} dumps'] = (
+                lambda p=payload: json.dumps(p, cls=DjangoJSONEncoder).encode(),
+                lambda p=payload: fastjson.dumps(p),
+            )
+            cases[f'encode {name} DRF renderer'] = (
+                lambda p=payload: drf.render(p),
+                lambda p=payload: fast_drf.render(p),
+            )
+
+    bodies = {
+        'booking request': {
+            'user_id': 42, 'destination': 'Lalibela', 'travel_date': '2026-12-01',
+            'return_date': '2026-12-08', 'number_of_travelers': 2, 'total_amount': '450.00',
+        },
+        'webhook': {
+            'tx_ref': 'TX_BK1A2B3C4D_1767225600', 'status': 'success', 'amount': '450.00',
+            'currency': 'ETB', 'reference': 'APf3kD0s9LJ2', 'first_name': 'Abebe',
+            'last_name': 'Bekele', 'email': 'abebe@example.com', 'mode': 'live',
+            'created_at': '2026-01-01T00:00:00.000000Z', 'updated_at': '2026-01-01T00:00:01.000000Z',
+        },
+        'bookings_500 response': json.loads(json.dumps(booking_rows(500, False))),
+    }
+    for name, body in bodies.items():
+        raw = json.dumps(body).encode()
+        cases[f'decode {name}'] = (lambda r=raw: json.loads(r), lambda r=raw: fastjson.loads(r))
+
+    results = {}
+    print(f"{'case':<44} {'stdlib us':>11} {'orjson us':>11} {'speedup':>8}")
+    for name, (stdlib, fast) in cases.items():
+        slow_us, fast_us = best_of(stdlib, args.repeat), best_of(fast, args.repeat)
+        results[name] = {'stdlib_us': slow_us, 'orjson_us': fast_us, 'speedup': slow_us / fast_us}
+        print(f'{name:<44} {slow_us:11.2f} {fast_us:11.2f} {slow_us / fast_us:7.1f}x', flush=True)
+
+    if args.output:
+        write_report(args.output, 'json_codec', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Closed-loop HTTP load generator used by the benchmark scripts.
+
+Each of ``concurrency`` threads owns a keep-alive ``requests.Session`` and
+calls the workload in a loop until the duration is up, recording the
+latency of every request per operation name.
+"""
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+
+def run_load(workload, concurrency, duration, warmup=0.0):
+    """
+    Drive ``workload(session)`` from ``concurrency`` threads for ``duration``
+    seconds (after ``warmup`` seconds that are not recorded).
+
+    The workload returns ``(operation_name, response)``; responses with a
+    5xx status or exceptions count as errors.
+
+    Returns ``{'latencies': {op: [seconds]}, 'errors': {op: n},
+    'elapsed': seconds}``.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker():
+        session = requests.Session()
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while True:
+            began = time.perf_counter()
+            if began >= stop_at:
+                break
+            try:
+                name, response = workload(session)
+                failed = response.status_code >= 500
+            except requests.RequestException:
+                name, failed = 'error', True
+            finished = time.perf_counter()
+            if began < start_at:
+                continue
+            local_latencies[name].append(finished - began)
+            if failed:
+                local_errors[name] += 1
+        with lock:
+            for name, samples in local_latencies.items():
+                latencies[name].extend(samples)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'latencies': dict(latencies), 'errors': dict(errors), 'elapsed': duration}
+
+
+def run_burst(workload, concurrency, total):
+    """
+    Send ``total`` requests as fast as ``concurrency`` threads can, e.g. a
+    burst of webhook deliveries, and time how long the burst takes.
+
+    Returns the same shape as ``run_load`` with ``elapsed`` measured.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    remaining = iter(range(total))
+    start = threading.Event()
+
+    def worker():
+        session = requests.Session()
+        start.wait()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            began = time.perf_counter()
+            try:
+                name, response = workload(session)
+                failed = response.status_code >= 500
+            except requests.RequestException:
+                name, failed = 'error', True
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies[name].append(elapsed)
+                if failed:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return {'latencies': dict(latencies), 'errors': dict(errors),
+            'elapsed': time.perf_counter() - began}
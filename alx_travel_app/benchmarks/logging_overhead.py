@@ -0,0 +1,91 @@
+"""
+What a log call costs the thread that makes it, writing straight to the
+stream versus through the queue handler (alx_travel_app.logs).
+
+The stream is a pipe drained by a reader that sleeps ``--sink-delay``
+seconds per line, standing in for a slow or back-pressured stdout (a full
+container log buffer, a remote log shipper). A direct StreamHandler blocks
+the caller on every such write; the queue handler only pays for building
+the record and putting it on the queue, until the queue fills up and
+records start being dropped.
+
+    python -m benchmarks.logging_overhead --records 5000 --sink-delay 0.0002 --output results/logging.json
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from benchmarks.common import format_summary, setup_django, summarize, write_report
+
+
+def slow_sink(delay):
+    """
+    A writable stream whose reader takes ``delay`` seconds per line
+    """
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, 'rb') as reader:
+            for _ in reader:
+                if delay:
+                    time.sleep(delay)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return os.fdopen(write_fd, 'w', buffering=1), thread
+
+
+def run(name, handler, records):
+    logger = logging.getLogger(f'benchmarks.logging.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    samples = []
+    began = time.perf_counter()
+    for i in range(records):
+        start = time.perf_counter()
+        logger.info('Booking created', extra={'booking_id': i, 'booking_reference': f'BK{i:08d}'})
+        samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - began
+    logger.removeHandler(handler)
+    return summarize(samples, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Caller-side cost of direct versus queued logging')
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--sink-delay', type=float, default=0.0002, help='seconds the reader spends per line')
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    setup_django()
+    from alx_travel_app import logs, web_metrics
+
+    results = {}
+    stream, _ = slow_sink(args.sink_delay)
+    direct = logging.StreamHandler(stream)
+    direct.setFormatter(logs.JSONFormatter())
+    direct.addFilter(logs.ContextFilter())
+    results['direct'] = run('direct', direct, args.records)
+    print(format_summary('direct', results['direct']), flush=True)
+
+    dropped = web_metrics.LOG_RECORDS_DROPPED.labels('queue_full')
+    dropped_before = dropped._value.get()
+    stream, _ = slow_sink(args.sink_delay)
+    queued = logs.QueueHandler(stream, queue_size=args.queue_size)
+    queued.setFormatter(logs.JSONFormatter())
+    queued.addFilter(logs.ContextFilter())
+    results['queue'] = run('queue', queued, args.records)
+    results['queue']['dropped'] = int(dropped._value.get() - dropped_before)
+    print(format_summary('queue', results['queue']), f"dropped={results['queue']['dropped']}", flush=True)
+    queued.close()
+
+    if args.output:
+        write_report(args.output, 'logging_overhead', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Start and stop throwaway app servers for benchmarks.
+
+Each benchmark run gets its own SQLite database (unless a DATABASE_URL is
+given), migrated and seeded with the ``create_test_data`` fixtures.
+"""
+import os
+import signal
+import sqlite3
+from contextlib import closing
+import subprocess
+import sys
+import time
+
+import requests
+
+from benchmarks.common import PROJECT_DIR
+
+
+def prepare_database(path):
+    """
+    Create a migrated, seeded SQLite database at ``path`` and return the
+    DATABASE_URL for it together with the seeded user id and payment
+    transaction id
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    database_url = f'sqlite:///{os.path.abspath(path)}'
+    env = dict(os.environ, DATABASE_URL=database_url)
+    for command in (['migrate', '--noinput'], ['create_test_data']):
+        subprocess.run(
+            [sys.executable, 'manage.py', *command],
+            cwd=PROJECT_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+    with closing(sqlite3.connect(path)) as db:
+        user_id = db.execute('SELECT id FROM auth_user ORDER BY id LIMIT 1').fetchone()[0]
+        transaction_id = db.execute(
+            'SELECT transaction_id FROM listings_payment ORDER BY created_at LIMIT 1'
+        ).fetchone()[0]
+    return database_url, user_id, transaction_id
+
+
+def start_gunicorn(port, env=None, args=()):
+    """
+    Launch gunicorn with gunicorn.conf.py on ``port`` and wait until it
+    answers requests
+    """
+    process_env = dict(os.environ, PORT=str(port), **(env or {}))
+    log_path = f'/tmp/gunicorn-bench-{port}.log'
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+             '--pid', f'/tmp/gunicorn-bench-{port}.pid', '--access-logfile', '/dev/null', *args],
+            cwd=PROJECT_DIR, env=process_env,
+            stdout=subprocess.DEVNULL, stderr=log,
+        )
+    process.log_path = log_path
+    wait_ready(f'http://127.0.0.1:{port}/api/booking/?user_id=0', process)
+    return process
+
+
+def wait_ready(url, process=None, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            with open(process.log_path) as log:
+                raise RuntimeError(f'server exited: {log.read()[-2000:]}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.02)
+    raise RuntimeError(f'server did not become ready at {url}')
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
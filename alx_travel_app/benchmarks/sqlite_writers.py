@@ -0,0 +1,168 @@
+"""
+Booking creation under concurrent writers on SQLite, default vs tuned.
+
+Every writer is a separate process with its own connection, as gunicorn
+workers and Celery workers are. Each one repeatedly runs the booking
+creation transaction of BookingViewSet.post (insert the booking and its
+outbox row atomically) while a few reader processes list bookings, for
+both connection modes:
+
+* ``default`` - SQLITE_TUNED=False, rollback journal and Django defaults
+* ``tuned``   - SQLITE_TUNED=True, WAL, busy timeout, BEGIN IMMEDIATE
+
+The report shows committed bookings per second, write and read latency
+percentiles, and how many transactions failed with "database is locked".
+
+    python -m benchmarks.sqlite_writers --writers 8,16,32 --duration 10 \\
+        --output results/sqlite_writers.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+from benchmarks.common import PROJECT_DIR, summarize, write_report
+
+MODES = {
+    'default': {'SQLITE_TUNED': 'False'},
+    'tuned': {'SQLITE_TUNED': 'True'},
+}
+
+
+def child(role, duration, user_id):
+    """
+    Runs inside each writer/reader subprocess; prints a JSON result line
+    """
+    from benchmarks.common import setup_django
+    setup_django()
+
+    from decimal import Decimal
+
+    from django.db import OperationalError, transaction
+
+    from listings import outbox
+    from listings.models import Booking
+    from listings.tasks import booking_confirmation_payload, send_booking_confirmation_email
+
+    def write():
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                user_id=user_id, destination='Benchmark', travel_date='2026-01-01',
+                number_of_travelers=2, total_amount=Decimal('300.00'), booking_status='pending',
+            )
+            outbox.enqueue(
+                send_booking_confirmation_email,
+                kwargs=booking_confirmation_payload(booking, booking.user),
+                dedupe_key=f'booking-confirmation:{booking.id}',
+            )
+
+    def read():
+        list(Booking.objects.filter(user_id=user_id).order_by('-created_at')[:20])
+
+    operation = write if role == 'writer' else read
+    Booking.objects.exists()  # connect before the clock starts
+
+    # Start together: report ready, then wait for the parent's go.
+    print('ready', flush=True)
+    sys.stdin.readline()
+    deadline = time.time() + duration
+    latencies, locked, failed = [], 0, 0
+    while time.time() < deadline:
+        began = time.perf_counter()
+        try:
+            operation()
+        except OperationalError as e:
+            if 'locked' in str(e):
+                locked += 1
+            else:
+                failed += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    print(json.dumps({'latencies': latencies, 'locked': locked, 'failed': failed}))
+
+
+def run(mode, writers, readers, duration, database_path, user_id):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}', DEBUG='False',
+               OUTBOX_ENABLED='True', **MODES[mode])
+    processes = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.sqlite_writers', '--child', role,
+             str(duration), str(user_id)],
+            cwd=PROJECT_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for role in ['writer'] * writers + ['reader'] * readers
+    ]
+    for process in processes:
+        if process.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f'{mode} child failed to start')
+    for process in processes:
+        process.stdin.write('go\n')
+        process.stdin.flush()
+    outcomes = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode:
+            raise RuntimeError(f'{mode} child exited with {process.returncode}')
+        outcomes.append(json.loads(output.strip().splitlines()[-1]))
+
+    write_outcomes, read_outcomes = outcomes[:writers], outcomes[writers:]
+    return {
+        'writes': summarize([s for o in write_outcomes for s in o['latencies']], duration),
+        'reads': summarize([s for o in read_outcomes for s in o['latencies']], duration),
+        'locked_errors': sum(o['locked'] for o in outcomes),
+        'other_errors': sum(o['failed'] for o in outcomes),
+    }
+
+
+def prepare(path, mode):
+    from benchmarks.server import prepare_database
+
+    _, user_id, _ = prepare_database(path)
+    if mode == 'default':
+        # WAL is stored in the database file; undo it for the baseline.
+        with closing(sqlite3.connect(path)) as db:
+            db.execute('PRAGMA journal_mode=DELETE')
+    return user_id
+
+
+def main():
+    if '--child' in sys.argv:
+        role, duration, user_id = sys.argv[sys.argv.index('--child') + 1:][:3]
+        child(role, float(duration), int(user_id))
+        return
+
+    parser = argparse.ArgumentParser(description='SQLite booking creation under concurrent writers')
+    parser.add_argument('--writers', default='8,16,32', help='comma-separated writer process counts')
+    parser.add_argument('--readers', type=int, default=4, help='reader processes running alongside')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--modes', default='default,tuned')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            for writers in (int(w) for w in args.writers.split(',')):
+                path = os.path.join(tmp, f'{mode}-{writers}.sqlite3')
+                user_id = prepare(path, mode)
+                result = run(mode, writers, args.readers, args.duration, path, user_id)
+                results[f'{mode}/{writers}'] = result
+                print(
+                    f"{mode:<8} writers={writers:<3} "
+                    f"{result['writes'].get('throughput_per_s', 0.0):8.1f} bookings/s  "
+                    f"write p50 {result['writes']['p50_ms']:8.2f}ms p99 {result['writes']['p99_ms']:8.2f}ms  "
+                    f"read p99 {result['reads']['p99_ms']:8.2f}ms  "
+                    f"locked {result['locked_errors']:<5} other errors {result['other_errors']}",
+                    flush=True,
+                )
+    if args.output:
+        write_report(args.output, 'sqlite_writers', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+Reproducible load-test suite for the booking and payment API.
+
+Starts the fake Chapa API and gunicorn against a freshly seeded throwaway
+database, then runs each workload in turn:
+
+* ``browse_bookings``  - list a user's bookings and fetch booking details
+* ``create_booking``   - POST /api/booking/ (booking + outbox row)
+* ``initiate_payment`` - POST /api/payment/initiate/ (Chapa initialize)
+* ``verify_payment``   - POST /api/payment/verify/ (Chapa verify + update)
+* ``webhook_burst``    - a burst of Chapa webhook deliveries, several per
+  payment, as Chapa sends them when it retries
+
+The first four are closed-loop for --duration seconds at --concurrency;
+the burst sends --burst-size deliveries as fast as possible. Every
+workload reports throughput, p50/p95/p99 latency and error counts (5xx
+responses, including those caused by simulated Chapa failures).
+
+    python -m benchmarks.suite --output results/suite.json
+    python -m benchmarks.suite --workloads browse_bookings,verify_payment \\
+        --chapa-latency 0.2 --chapa-error-rate 0.05 --compare results/suite.json
+
+The JSON report records the commit, host and parameters; --compare prints
+the change against an earlier report.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import uuid
+
+from benchmarks import fake_chapa
+from benchmarks.common import PROJECT_DIR, format_summary, summarize, write_report
+from benchmarks.load import run_burst, run_load
+from benchmarks.server import prepare_database, start_gunicorn, stop
+
+WORKLOADS = ('browse_bookings', 'create_booking', 'initiate_payment', 'verify_payment', 'webhook_burst')
+
+
+def seed_child(users, bookings_per_user, payments):
+    """
+    Runs in a subprocess against DATABASE_URL; prints the ids the
+    workloads need as JSON
+    """
+    from benchmarks.common import setup_django
+    setup_django()
+
+    from datetime import date, timedelta
+    from decimal import Decimal
+
+    from django.contrib.auth.models import User
+
+    from listings.models import Booking, Payment
+
+    run = uuid.uuid4().hex[:6]
+    User.objects.bulk_create([
+        User(username=f'bench_{run}_{i}', email=f'bench_{run}_{i}@example.com')
+        for i in range(users)
+    ])
+    user_ids = list(User.objects.filter(username__startswith=f'bench_{run}_').values_list('id', flat=True))
+    rng = random.Random(0)
+    bookings = [
+        Booking(
+            user_id=user_id,
+            booking_reference=f'BK{run}{index:07d}',
+            destination=rng.choice(['Addis Ababa', 'Lalibela', 'Gondar', 'Bahir Dar', 'Harar']),
+            travel_date=date(2026, 1, 1) + timedelta(days=rng.randrange(365)),
+            number_of_travelers=rng.randint(1, 6),
+            total_amount=Decimal(rng.randrange(5000, 500000)) / 100,
+        )
+        for index, user_id in enumerate(user_ids * bookings_per_user)
+    ]
+    Booking.objects.bulk_create(bookings, batch_size=500)
+    payment_rows = [
+        Payment(
+            user_id=user_ids[i % len(user_ids)],
+            booking_reference=f'PAY{run}{i:07d}',
+            amount=Decimal('150.00'),
+            currency='ETB',
+            payment_status='pending',
+            transaction_id=f'TX_{run}_{i}',
+        )
+        for i in range(payments)
+    ]
+    Payment.objects.bulk_create(payment_rows, batch_size=500)
+    print(json.dumps({
+        'user_ids': user_ids,
+        'booking_ids': [str(b.id) for b in bookings],
+        'transaction_ids': [p.transaction_id for p in payment_rows],
+    }))
+
+
+def seed(database_url, users, bookings_per_user, payments):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.suite', '--seed-child',
+         str(users), str(bookings_per_user), str(payments)],
+        cwd=PROJECT_DIR, env=dict(os.environ, DATABASE_URL=database_url),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def make_workload(name, base_url, data, rng):
+    user_ids = data['user_ids']
+    booking_ids = data['booking_ids']
+    # Verify and webhooks work on separate halves so the burst starts from
+    # pending payments.
+    half = len(data['transaction_ids']) // 2
+    verify_ids = data['transaction_ids'][:half]
+    webhook_ids = data['transaction_ids'][half:]
+
+    def browse_bookings(session):
+        if rng.random() < 0.5:
+            return 'list_bookings', session.get(
+                f'{base_url}/api/booking/', params={'user_id': rng.choice(user_ids)}, timeout=30
+            )
+        return 'booking_detail', session.get(
+            f'{base_url}/api/booking/{rng.choice(booking_ids)}/', timeout=30
+        )
+
+    def create_booking(session):
+        return 'create_booking', session.post(f'{base_url}/api/booking/', json={
+            'user_id': rng.choice(user_ids),
+            'destination': 'Lalibela',
+            'travel_date': '2026-12-01',
+            'return_date': '2026-12-08',
+            'number_of_travelers': 2,
+            'total_amount': '450.00',
+        }, timeout=30)
+
+    def initiate_payment(session):
+        return 'initiate_payment', session.post(f'{base_url}/api/payment/initiate/', json={
+            'user_id': rng.choice(user_ids),
+            'booking_reference': f'BKLOAD{uuid.uuid4().hex[:12].upper()}',
+            'amount': '450.00',
+            'currency': 'ETB',
+            'email': 'load@example.com',
+            'first_name': 'Load',
+            'last_name': 'Test',
+        }, timeout=30)
+
+    def verify_payment(session):
+        return 'verify_payment', session.post(
+            f'{base_url}/api/payment/verify/', json={'transaction_id': rng.choice(verify_ids)}, timeout=30
+        )
+
+    def webhook_burst(session):
+        return 'webhook', session.post(
+            f'{base_url}/api/payment/webhook/',
+            json={'tx_ref': rng.choice(webhook_ids), 'status': 'success'}, timeout=30,
+        )
+
+    return {
+        'browse_bookings': browse_bookings,
+        'create_booking': create_booking,
+        'initiate_payment': initiate_payment,
+        'verify_payment': verify_payment,
+        'webhook_burst': webhook_burst,
+    }[name]
+
+
+def run_suite(args):
+    chapa = fake_chapa.start(
+        latency=args.chapa_latency, jitter=args.chapa_jitter, error_rate=args.chapa_error_rate,
+        verify_status=args.verify_status, seed=args.seed,
+    )
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = args.database_url
+            if not database_url:
+                database_url, _, _ = prepare_database(os.path.join(tmp, 'bench.sqlite3'))
+            data = seed(database_url, args.users, args.bookings_per_user, args.payments)
+            env = {
+                'DATABASE_URL': database_url,
+                'CHAPA_BASE_URL': fake_chapa.base_url(chapa),
+                'OUTBOX_ENABLED': 'True',
+                'DEBUG': 'False',
+                'GUNICORN_PROFILE': args.profile,
+                # Recycled workers drop keep-alive connections mid-run.
+                'GUNICORN_MAX_REQUESTS': '0',
+                # All load comes from one address, and the fake Chapa has no quota.
+                'RATELIMIT_ENABLED': 'False',
+                'CHAPA_RATE_LIMIT': '',
+            }
+            if args.workers:
+                env['GUNICORN_WORKERS'] = str(args.workers)
+            server = start_gunicorn(args.port, env)
+            base_url = f'http://127.0.0.1:{args.port}'
+            rng = random.Random(args.seed)
+            try:
+                for name in args.workloads.split(','):
+                    workload = make_workload(name, base_url, data, rng)
+                    chapa_errors = chapa.errors
+                    if name == 'webhook_burst':
+                        outcome = run_burst(workload, args.concurrency, args.burst_size)
+                    else:
+                        outcome = run_load(workload, args.concurrency, args.duration, args.warmup)
+                    samples = [s for op in outcome['latencies'].values() for s in op]
+                    errors = sum(outcome['errors'].values())
+                    results[name] = {
+                        'overall': summarize(samples, outcome['elapsed']),
+                        'errors': errors,
+                        'error_rate': errors / len(samples) if samples else 0.0,
+                        'chapa_errors_injected': chapa.errors - chapa_errors,
+                    }
+                    for op, op_samples in outcome['latencies'].items():
+                        if len(outcome['latencies']) > 1:
+                            results[name][op] = summarize(op_samples, outcome['elapsed'])
+                    print(format_summary(name, results[name]['overall'])
+                          + f"  errors={errors}", flush=True)
+            finally:
+                stop(server)
+    finally:
+        chapa.shutdown()
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nversus {baseline_path} (commit {baseline.get('commit')})")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if not old:
+            continue
+        new_summary, old_summary = result['overall'], old['overall']
+
+        def change(key):
+            before, after = old_summary.get(key) or 0.0, new_summary.get(key) or 0.0
+            return f'{(after - before) / before * 100:+6.1f}%' if before else '   n/a'
+
+        print(
+            f"{name:<18} throughput {change('throughput_per_s')}  "
+            f"p50 {change('p50_ms')}  p95 {change('p95_ms')}  p99 {change('p99_ms')}  "
+            f"errors {old['errors']} -> {result['errors']}"
+        )
+
+
+def main():
+    if '--seed-child' in sys.argv:
+        users, bookings_per_user, payments = sys.argv[sys.argv.index('--seed-child') + 1:][:3]
+        seed_child(int(users), int(bookings_per_user), int(payments))
+        return
+
+    parser = argparse.ArgumentParser(description='Load-test suite with a local Chapa stand-in')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS))
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--burst-size', type=int, default=1000, help='webhook deliveries in the burst')
+    parser.add_argument('--chapa-latency', type=float, default=0.2)
+    parser.add_argument('--chapa-jitter', type=float, default=0.05)
+    parser.add_argument('--chapa-error-rate', type=float, default=0.0)
+    parser.add_argument('--verify-status', default='success')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--bookings-per-user', type=int, default=10)
+    parser.add_argument('--payments', type=int, default=400)
+    parser.add_argument('--profile', default='gthread', help='gunicorn profile')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--port', type=int, default=8770)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help='use this database instead of a throwaway SQLite file')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    unknown = set(args.workloads.split(',')) - set(WORKLOADS)
+    if unknown:
+        parser.error(f'unknown workloads: {", ".join(sorted(unknown))}')
+
+    results = run_suite(args)
+    if args.output:
+        write_report(args.output, 'suite', results, vars(args))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,270 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
+
+# Worker profiles
+#
+# Most of our request time is spent waiting on Chapa or the database, so a
+# sync worker (one request at a time) sits idle for most of its life.
+# GUNICORN_PROFILE selects how each worker process handles concurrency:
+#
+#   gthread  - a pool of threads per process (default). Threads block on
+#              Chapa/DB IO independently, which multiplies concurrency
+#              without multiplying memory.
+#   uvicorn  - ASGI event loop per process (alx_travel_app.asgi). Django
+#              runs our sync views in a thread, so this mainly pays off for
+#              async views and long-lived connections.
+#   sync     - the previous behaviour, one request per process.
+#
+# GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_KEEPALIVE, GUNICORN_BACKLOG
+# and GUNICORN_TIMEOUT override the profile defaults.
+CPU_COUNT = multiprocessing.cpu_count()
+
+PROFILES = {
+    'sync': {
+        'worker_class': 'sync',
+        'wsgi_app': 'alx_travel_app.wsgi:application',
+        'workers': CPU_COUNT * 2 + 1,
+        'threads': 1,
+        'keepalive': 2,
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'wsgi_app': 'alx_travel_app.wsgi:application',
+        'workers': CPU_COUNT + 1,
+        'threads': 8,
+        'keepalive': 5,
+    },
+    'uvicorn': {
+        'worker_class': 'uvicorn_worker.UvicornWorker',
+        'wsgi_app': 'alx_travel_app.asgi:application',
+        'workers': CPU_COUNT + 1,
+        'threads': 1,
+        'keepalive': 5,
+    },
+}
+
+
+def _env_int(name, default, minimum, maximum):
+    """
+    Read an integer setting from the environment and check its range
+    """
+    raw = os.getenv(name)
+    if raw is None or raw == '':
+        value = default
+    else:
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(f'{name} must be an integer, got {raw!r}')
+    if not minimum <= value <= maximum:
+        raise ValueError(f'{name} must be between {minimum} and {maximum}, got {value}')
+    return value
+
+
+profile_name = os.getenv('GUNICORN_PROFILE', 'gthread')
+if profile_name not in PROFILES:
+    raise ValueError(
+        f'Unknown GUNICORN_PROFILE {profile_name!r}, expected one of: {", ".join(PROFILES)}'
+    )
+profile = PROFILES[profile_name]
+
+if profile_name == 'uvicorn':
+    try:
+        import uvicorn_worker  # noqa: F401
+    except ImportError:
+        raise ValueError('GUNICORN_PROFILE=uvicorn requires the uvicorn-worker package')
+
+# Application; only used when no app is given on the command line
+wsgi_app = profile['wsgi_app']
 
 # Server socket
-bind = "0.0.0.0:8000"
-backlog = 2048
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+backlog = _env_int('GUNICORN_BACKLOG', 2048, 64, 65535)
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+workers = _env_int('GUNICORN_WORKERS', profile['workers'], 1, 256)
+worker_class = profile['worker_class']
+threads = _env_int('GUNICORN_THREADS', profile['threads'], 1, 256)
 worker_connections = 1000
-timeout = 30
-keepalive = 2
+timeout = _env_int('GUNICORN_TIMEOUT', 30, 1, 3600)
+keepalive = _env_int('GUNICORN_KEEPALIVE', profile['keepalive'], 1, 300)
+
+if worker_class == 'sync' and threads > 1:
+    # Gunicorn silently switches sync workers to gthread when threads > 1;
+    # be explicit about it instead.
+    raise ValueError('GUNICORN_THREADS > 1 needs GUNICORN_PROFILE=gthread')
 
 # Restart workers after this many requests, to help prevent memory leaks
-max_requests = 1000
+# (GUNICORN_MAX_REQUESTS=0 disables recycling, e.g. for load tests)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000, 0, 10_000_000)
 max_requests_jitter = 50
 
+# Preloading
+#
+# With preload_app the master imports Django, DRF, drf_spectacular and the
+# URLconf once and forks workers from that warm image, so a worker recycled
+# by max_requests starts serving immediately and the imported code is shared
+# copy-on-write between workers. The hooks below keep this fork-safe: the
+# master never hands an open database, cache or broker socket to a child.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+
+def _close_connections():
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    for connection in connections.all(initialized_only=True):
+        # psycopg pools run background threads, which do not survive a fork.
+        if getattr(connection, 'pool', None):
+            connection.close_pool()
+    caches.close_all()
+    try:
+        from alx_travel_app.celery import app as celery_app
+        celery_app.pool.force_close_all()
+    except Exception:
+        pass
+
+
+def _warm_imports():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver.url_patterns  # imports every view module
+    resolver._populate()
+
+
+def _warm_connections():
+    from django.core.cache import cache
+    from django.db import connections
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+    cache.get('gunicorn:warmup')
+
+
+def on_starting(server):
+    """
+    Runs in the master at startup. Prometheus multiprocess metrics are kept
+    in files per process; start from an empty directory so counters from a
+    previous run are not added to this one.
+    """
+    metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.db'):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    """
+    Drop the live gauges (in-progress requests) of a worker that exited;
+    its counters and histograms keep counting towards the totals.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """
+    Runs in the master before the first fork. Import everything a request
+    would otherwise import lazily, then move the preloaded objects out of
+    the garbage collector's reach so collections in the workers do not
+    touch (and un-share) their pages.
+    """
+    if not preload_app:
+        return
+    import gc
+
+    _warm_imports()
+    _close_connections()
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        _close_connections()
+
+
+def post_fork(server, worker):
+    """
+    Runs in the new worker. Drop any connection objects inherited from the
+    master so the worker opens its own sockets.
+    """
+    if preload_app:
+        _close_connections()
+
+
+def post_worker_init(worker):
+    """
+    Runs in the worker once the application is loaded and before it accepts
+    requests. Database connections are per thread, so for gthread workers
+    every pool thread opens its own; a barrier makes sure each warm-up call
+    lands on a different thread.
+    """
+    import threading
+
+    if not preload_app:
+        _warm_imports()
+
+    pool = getattr(worker, 'tpool', None)
+    try:
+        if pool is None:
+            _warm_connections()
+        else:
+            barrier = threading.Barrier(worker.cfg.threads, timeout=10)
+
+            def warm():
+                _warm_connections()
+                barrier.wait()
+
+            for future in [pool.submit(warm) for _ in range(worker.cfg.threads)]:
+                future.result()
+    except Exception as e:
+        worker.log.warning('Worker warm-up failed: %s', e)
+
+
 # Logging
+#
+# Gunicorn's own records (errors and the access log) go through the same
+# queue handler and formatter as the application's (alx_travel_app.logs),
+# so writing them to stdout never blocks a worker. The access log line
+# carries the request id RequestIdMiddleware put in the response.
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
-access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %({x-request-id}o)s'
+
+_log_handler = {
+    '()': 'alx_travel_app.logs.QueueHandler',
+    'queue_size': _env_int('LOG_QUEUE_SIZE', 10000, 1, 10_000_000),
+    'formatter': 'json' if os.getenv('LOG_FORMAT', 'json').lower() == 'json' else 'text',
+    'filters': ['context'],
+}
+logconfig_dict = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {'context': {'()': 'alx_travel_app.logs.ContextFilter'}},
+    'formatters': {
+        'json': {'()': 'alx_travel_app.logs.JSONFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'error': _log_handler,
+        'access': dict(_log_handler),
+    },
+    # Replaces gunicorn's default console handlers; Django's LOGGING sets
+    # up the root logger once the application is loaded.
+    'root': {'handlers': [], 'level': 'INFO'},
+    'loggers': {
+        'gunicorn.error': {'handlers': ['error'], 'level': 'INFO', 'propagate': False},
+        'gunicorn.access': {'handlers': ['access'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 # Process naming
 proc_name = "alx_travel_app"
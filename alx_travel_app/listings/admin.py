@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Payment, Booking
+from .models import Payment, Booking, OutboxMessage
+from .outbox import requeue_failed
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -45,3 +46,17 @@ class BookingAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task_name', 'status', 'attempts', 'created_at', 'published_at')
+    list_filter = ('status', 'task_name')
+    search_fields = ('task_name', 'dedupe_key')
+    readonly_fields = ('id', 'created_at', 'published_at')
+    ordering = ('-id',)
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected failed messages')
+    def requeue(self, request, queryset):
+        count = requeue_failed(queryset)
+        self.message_user(request, f'{count} failed message(s) requeued for the relay.')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ListingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'listings'
+
+    def ready(self):
+        # Connects the signals that drop cached users when they change.
+        from alx_travel_app import auth  # noqa: F401
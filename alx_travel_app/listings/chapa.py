@@ -0,0 +1,130 @@
+"""
+Outbound calls to the Chapa API.
+
+Views go through ``request`` instead of calling ``requests`` directly, so
+every Chapa call is authenticated, instrumented and governed in one place.
+
+The governor keeps every web and worker process together under Chapa's
+account-level rate limit. Each call takes a token from one bucket
+(CHAPA_RATE_LIMIT) shared through the rate limiting backend
+(alx_travel_app.ratelimit, Redis when RATELIMIT_REDIS_URL is set). Calls
+have a priority:
+
+* ``high``   - payment initiation, a customer is waiting on it,
+* ``normal`` - payment verification and anything else by default,
+* ``low``    - background work such as reconciliation sweeps.
+
+A ``normal`` or ``low`` call only takes a token while more than its
+CHAPA_PRIORITY_RESERVE share of the bucket is left, so under load the
+remaining capacity goes to higher priorities first. A call that finds no
+token waits for one, up to its deadline (CHAPA_QUEUE_TIMEOUTS by priority),
+and is dropped with ``Throttled`` as soon as it is clear that no token will
+be available by then.
+"""
+import logging
+import random
+import time
+
+import requests
+from django.conf import settings
+
+from alx_travel_app import ratelimit, request_timing, tracing, web_metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ('high', 'normal', 'low')
+ENDPOINT_PRIORITIES = {'/transaction/initialize': 'high'}
+GOVERNOR_KEY = 'chapa:{governor}:account'
+
+
+class Throttled(Exception):
+    """
+    The call could not get a Chapa rate limit token before its deadline
+    """
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f'No Chapa capacity for a {priority} priority call, retry in {retry_after:.1f}s')
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+def endpoint_of(path):
+    """
+    Path without trailing ids, e.g. /transaction/verify for
+    /transaction/verify/TX_123
+    """
+    return '/'.join(path.split('/')[:3])
+
+
+def acquire(priority, deadline=None):
+    """
+    Wait for a token from the shared Chapa bucket and return the seconds
+    waited. Raises Throttled if none can be had within ``deadline`` seconds
+    (default CHAPA_QUEUE_TIMEOUTS[priority]).
+    """
+    rate = ratelimit.parse_rate(settings.CHAPA_RATE_LIMIT)
+    if rate is None:
+        return 0.0
+    if deadline is None:
+        deadline = settings.CHAPA_QUEUE_TIMEOUTS[priority]
+    reserve = min(settings.CHAPA_PRIORITY_RESERVE[priority] * rate.capacity, rate.capacity - 1)
+    bucket = [(GOVERNOR_KEY, rate, reserve)]
+    began = time.monotonic()
+    while True:
+        try:
+            decision = ratelimit.backend().hit(bucket)
+        except Exception:
+            # Better to risk a 429 from Chapa than to stop calling it.
+            web_metrics.RATELIMIT_ERRORS.labels('chapa').inc()
+            logger.warning('Chapa governor unavailable, calling without a token', exc_info=True)
+            decision = None
+        waited = time.monotonic() - began
+        if decision is None or decision.allowed:
+            web_metrics.CHAPA_GOVERNOR_WAIT.labels(priority).observe(waited)
+            return waited
+        left = deadline - waited
+        if decision.retry_after > left:
+            web_metrics.CHAPA_GOVERNOR_DROPS.labels(priority).inc()
+            raise Throttled(priority, decision.retry_after)
+        # Jitter, so that waiting processes do not all retry at once.
+        time.sleep(min(decision.retry_after * random.uniform(1, 1.2), left))
+
+
+def request(method, path, priority=None, deadline=None, **kwargs):
+    """
+    Send ``method`` to CHAPA_BASE_URL + ``path`` with the secret key and
+    return the ``requests`` response. ``priority`` defaults to the
+    endpoint's (ENDPOINT_PRIORITIES) or ``normal``; see ``acquire`` for
+    ``deadline``. Unless ``timeout`` is passed, CHAPA_TIMEOUT applies.
+    """
+    kwargs.setdefault('timeout', settings.CHAPA_TIMEOUT)
+    headers = {'Authorization': f'Bearer {settings.CHAPA_SECRET_KEY}'}
+    headers.update(kwargs.pop('headers', {}))
+    endpoint = endpoint_of(path)
+    priority = priority or ENDPOINT_PRIORITIES.get(endpoint, 'normal')
+    waited = acquire(priority, deadline)
+    began = time.perf_counter()
+    response = error = None
+    try:
+        with tracing.start_span(
+            f'chapa {method} {endpoint}', kind='client',
+            attributes={
+                'http.method': method, 'chapa.endpoint': endpoint,
+                'chapa.priority': priority, 'chapa.queue_wait_ms': round(waited * 1000, 2),
+            },
+        ) as span:
+            response = requests.request(
+                method, f'{settings.CHAPA_BASE_URL}{path}', headers=headers, **kwargs
+            )
+            if span is not None:
+                span.set_attribute('http.status_code', response.status_code)
+                if response.status_code >= 500:
+                    span.status = 'error'
+        return response
+    except requests.RequestException as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - began
+        request_timing.record('chapa', elapsed)
+        web_metrics.observe_chapa(endpoint, elapsed, response, error)
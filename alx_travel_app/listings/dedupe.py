@@ -0,0 +1,109 @@
+"""
+Duplicate suppression for Celery tasks.
+
+The same state change can trigger a task more than once: a payment can be
+completed by both verify_payment and the Chapa webhook, a late-acked message
+can be redelivered, an outbox row can be published twice. ``deduplicate``
+wraps a task so that only the first execution for a given
+(task, entity, state) runs and the rest are counted and skipped.
+
+Locks live in the Django cache selected by TASK_DEDUPE_CACHE, so they are
+shared by every worker when that cache is Redis (or the database cache).
+``cache.add`` is an atomic set-if-absent on those backends.
+"""
+import functools
+import inspect
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'task_dedupe'
+
+RUNNING = 'running'
+DONE = 'done'
+
+
+def _cache():
+    return caches[getattr(settings, 'TASK_DEDUPE_CACHE', 'default')]
+
+
+def _suppressed_key(task_name):
+    return f'{KEY_PREFIX}:suppressed:{task_name}'
+
+
+def lock_key(task_name, entity, state):
+    return f'{KEY_PREFIX}:lock:{task_name}:{entity}:{state}'
+
+
+def _count_suppressed(cache, task_name):
+    key = _suppressed_key(task_name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def suppressed_counts(task_names):
+    """
+    Number of suppressed duplicate executions per task name
+    """
+    values = _cache().get_many([_suppressed_key(name) for name in task_names])
+    return {name: values.get(_suppressed_key(name)) or 0 for name in task_names}
+
+
+def deduplicate(entity, state, ttl=None, running_ttl=None):
+    """
+    Run the decorated task at most once per (task, entity, state).
+
+    ``entity`` names the task argument that identifies the object the task
+    is about (e.g. ``'payment_id'``). ``state`` is the state being announced,
+    either a string or a callable receiving the task's bound arguments.
+
+    A lock is taken before the task runs and held for ``running_ttl``
+    seconds (TASK_DEDUPE_RUNNING_TTL) so a crashed worker does not block the
+    task forever. Once the task returns, the lock is extended to ``ttl``
+    seconds (TASK_DEDUPE_TTL). If the task raises, the lock is released so a
+    retry can run. A task must therefore raise, not return, when its work
+    failed: a returned value marks the work done.
+
+    Apply it below ``@shared_task`` so the lock wraps the task body::
+
+        @shared_task(ignore_result=True)
+        @deduplicate(entity='payment_id', state='completed')
+        def send_payment_confirmation_email(payment_id):
+            ...
+    """
+    def decorator(func):
+        task_name = f'{func.__module__}.{func.__name__}'
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            entity_value = bound.arguments[entity]
+            state_value = state(bound.arguments) if callable(state) else state
+            key = lock_key(task_name, entity_value, state_value)
+
+            cache = _cache()
+            running_timeout = running_ttl or getattr(settings, 'TASK_DEDUPE_RUNNING_TTL', 300)
+            if not cache.add(key, RUNNING, timeout=running_timeout):
+                _count_suppressed(cache, task_name)
+                logger.info('Suppressed duplicate %s for %s=%s (%s)',
+                            task_name, entity, entity_value, state_value)
+                return f"Duplicate {task_name} for {entity_value} suppressed"
+
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                cache.delete(key)
+                raise
+            cache.set(key, DONE, timeout=ttl or getattr(settings, 'TASK_DEDUPE_TTL', 86400))
+            return result
+
+        return wrapper
+    return decorator
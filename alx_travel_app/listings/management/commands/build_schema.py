@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from alx_travel_app import api_schema
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema served by /api/schema/ as YAML and JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None,
+                            help='Output directory (default: OPENAPI_SCHEMA_DIR)')
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'] or settings.OPENAPI_SCHEMA_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        for fmt, (filename, _) in api_schema.FORMATS.items():
+            body = api_schema.render_schema(fmt)
+            path = directory / filename
+            path.write_bytes(body)
+            self.stdout.write(f'Wrote {path} ({len(body):,} bytes)')
+        self.stdout.write(self.style.SUCCESS('Schema built'))
@@ -0,0 +1,310 @@
+import io
+import itertools
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import AutoField, BigAutoField, SmallAutoField
+from django.utils import timezone
+
+from listings.models import Booking, Payment
+
+DEFAULT_DESTINATIONS = (
+    'Addis Ababa=30,Lalibela=12,Gondar=10,Bahir Dar=10,Axum=8,Harar=6,'
+    'Arba Minch=5,Hawassa=8,Dire Dawa=6,Simien Mountains=5'
+)
+FIRST_NAMES = (
+    'Abebe', 'Almaz', 'Dawit', 'Hana', 'Kebede', 'Meron', 'Samuel', 'Selam',
+    'Tigist', 'Yonas', 'Amina', 'Daniel', 'Ruth', 'Michael', 'Sara', 'Elias',
+)
+LAST_NAMES = (
+    'Bekele', 'Tesfaye', 'Haile', 'Girma', 'Alemu', 'Tadesse', 'Mekonnen',
+    'Wolde', 'Assefa', 'Negash', 'Desta', 'Kassa',
+)
+
+
+def parse_weights(value, allowed=None):
+    """
+    ``name=weight,name=weight`` as (names, cumulative weights)
+    """
+    names, weights = [], []
+    for item in value.split(','):
+        name, sep, weight = item.rpartition('=')
+        if not sep or not name.strip():
+            raise CommandError(f'Expected name=weight, got {item!r}')
+        name = name.strip()
+        if allowed is not None and name not in allowed:
+            raise CommandError(f'{name!r} is not one of {", ".join(allowed)}')
+        try:
+            weight = float(weight)
+        except ValueError:
+            raise CommandError(f'Weight of {name!r} is not a number: {weight!r}')
+        if weight < 0:
+            raise CommandError(f'Weight of {name!r} is negative')
+        names.append(name)
+        weights.append(weight)
+    if not sum(weights):
+        raise CommandError(f'All weights are zero in {value!r}')
+    return names, list(itertools.accumulate(weights))
+
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_line(values):
+    """
+    One row in COPY's text format: tab separated, ``\\N`` for NULL, and
+    backslash, tab and newlines escaped
+    """
+    return '\t'.join(
+        '\\N' if value is None else str(value).translate(COPY_ESCAPES) for value in values
+    ) + '\n'
+
+
+class Command(BaseCommand):
+    help = 'Generate large volumes of synthetic users, bookings and payments for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--bookings', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Same seed and prefix produce the same rows')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Username and reference prefix; use a new one to add more data')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--method', choices=('auto', 'bulk', 'copy'), default='auto',
+                            help='bulk_create, or COPY (PostgreSQL only); auto picks COPY on PostgreSQL')
+        parser.add_argument('--destinations', default=DEFAULT_DESTINATIONS,
+                            help='Weighted destinations, e.g. "Lalibela=3,Gondar=1"')
+        parser.add_argument('--booking-statuses', default='confirmed=60,pending=25,cancelled=15')
+        parser.add_argument('--payment-statuses', default='pending=60,failed=30,cancelled=10',
+                            help='Statuses of payments for unconfirmed bookings; '
+                                 'confirmed bookings always have a completed payment')
+        parser.add_argument('--payment-rate', type=float, default=0.7,
+                            help='Fraction of unconfirmed bookings that have a payment')
+        parser.add_argument('--user-skew', type=float, default=0.5,
+                            help='Zipf exponent for bookings per user (0 = uniform)')
+        parser.add_argument('--start', default='2024-01-01',
+                            help='Earliest booking creation date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Bookings are created over this many days from --start')
+        parser.add_argument('--lead-days', type=float, default=30.0,
+                            help='Mean days between booking and travel')
+        parser.add_argument('--one-way-rate', type=float, default=0.2)
+        parser.add_argument('--currency', default='ETB')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['bookings'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--users and --batch-size must be positive, --bookings not negative')
+        if not 0 <= options['payment_rate'] <= 1 or not 0 <= options['one_way_rate'] <= 1:
+            raise CommandError('--payment-rate and --one-way-rate must be between 0 and 1')
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d')
+        except ValueError:
+            raise CommandError(f"--start is not a YYYY-MM-DD date: {options['start']!r}")
+
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('--method copy needs PostgreSQL')
+
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users with prefix {prefix!r} already exist; pass a different --prefix')
+
+        self.options = options
+        self.prefix = prefix
+        self.start = timezone.make_aware(start, timezone.get_default_timezone())
+        self.destinations = parse_weights(options['destinations'])
+        self.booking_statuses = parse_weights(
+            options['booking_statuses'], [c for c, _ in Booking.BOOKING_STATUS_CHOICES]
+        )
+        self.payment_statuses = parse_weights(
+            options['payment_statuses'], [c for c, _ in Payment.PAYMENT_STATUS_CHOICES]
+        )
+        # A string seed is hashed deterministically, so each prefix gets its
+        # own reproducible stream and its uuids do not collide.
+        self.rng = random.Random(f"{options['seed']}:{prefix}")
+        self.insert = self.copy_rows if method == 'copy' else self.bulk_rows
+
+        self.stdout.write(
+            f"Generating {options['users']:,} users and {options['bookings']:,} bookings "
+            f"with {method} (batch size {options['batch_size']:,}, seed {options['seed']})"
+        )
+        began = time.perf_counter()
+        self.counts = {'users': 0, 'bookings': 0, 'payments': 0}
+        self.elapsed = {'users': 0.0, 'bookings': 0.0, 'payments': 0.0}
+
+        user_ids = self.generate_users()
+        self.generate_bookings(user_ids)
+
+        for table in ('users', 'payments', 'bookings'):
+            self.report(table, self.counts[table], self.elapsed[table])
+        total = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            self.rate_line('total', total, time.perf_counter() - began)
+        ))
+
+    # Rows
+
+    def generate_users(self):
+        rng = self.rng
+        # Hashing a password per user would dominate the run time; every
+        # synthetic user shares one unusable password.
+        password = make_password(None)
+        joined_span = self.options['days'] * 86400
+        batch = []
+        for i in range(self.options['users']):
+            username = f'{self.prefix}_{i:08d}'
+            batch.append(User(
+                username=username,
+                email=f'{username}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=self.start - timedelta(seconds=rng.randrange(joined_span)),
+            ))
+            if len(batch) == self.options['batch_size']:
+                self.flush('users', User, batch)
+        self.flush('users', User, batch)
+        return list(
+            User.objects.filter(username__startswith=f'{self.prefix}_')
+            .order_by('username').values_list('id', flat=True)
+        )
+
+    def generate_bookings(self, user_ids):
+        options = self.options
+        rng = self.rng
+        skew = options['user_skew']
+        user_weights = list(itertools.accumulate(
+            1.0 / (rank ** skew) for rank in range(1, len(user_ids) + 1)
+        ))
+        destinations, destination_weights = self.destinations
+        statuses, status_weights = self.booking_statuses
+        payment_statuses, payment_weights = self.payment_statuses
+        span = options['days'] * 86400
+        now = timezone.now()
+
+        bookings, payments = [], []
+        for i in range(options['bookings']):
+            reference = f'{self.prefix.upper()}{i:010d}'
+            user_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+            created_at = self.start + timedelta(seconds=rng.randrange(span))
+            travel_date = (created_at + timedelta(days=rng.expovariate(1 / options['lead_days']) + 1)).date()
+            return_date = None
+            if rng.random() >= options['one_way_rate']:
+                return_date = travel_date + timedelta(days=rng.randint(1, 21))
+            travelers = min(1 + int(rng.expovariate(0.7)), 12)
+            per_person = math.exp(rng.gauss(math.log(9000), 0.6))
+            amount = Decimal(round(per_person * travelers, 2)).quantize(Decimal('0.01'))
+            status = rng.choices(statuses, cum_weights=status_weights)[0]
+
+            payment = None
+            if status == 'confirmed' or rng.random() < options['payment_rate']:
+                payment_status = (
+                    'completed' if status == 'confirmed'
+                    else rng.choices(payment_statuses, cum_weights=payment_weights)[0]
+                )
+                paid_at = created_at + timedelta(minutes=rng.randint(1, 120))
+                transaction_id = f'TX_{reference}_{int(created_at.timestamp())}'
+                payment = Payment(
+                    id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    user_id=user_id,
+                    booking_reference=reference,
+                    amount=amount,
+                    currency=options['currency'],
+                    payment_status=payment_status,
+                    transaction_id=transaction_id,
+                    chapa_reference=f'CHAPA_{rng.getrandbits(40):010X}',
+                    payment_url=f'https://checkout.chapa.co/checkout/payment/{transaction_id}',
+                    created_at=created_at,
+                    updated_at=min(paid_at, now),
+                    payment_date=paid_at if payment_status == 'completed' else None,
+                )
+                payments.append(payment)
+
+            bookings.append(Booking(
+                id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                user_id=user_id,
+                booking_reference=reference,
+                destination=rng.choices(destinations, cum_weights=destination_weights)[0],
+                travel_date=travel_date,
+                return_date=return_date,
+                number_of_travelers=travelers,
+                total_amount=amount,
+                booking_status=status,
+                payment_id=payment.id if payment else None,
+                created_at=created_at,
+                updated_at=min(created_at + timedelta(hours=2), now),
+            ))
+            if len(bookings) == options['batch_size']:
+                # Payments first: bookings reference them.
+                self.flush('payments', Payment, payments)
+                self.flush('bookings', Booking, bookings)
+        self.flush('payments', Payment, payments)
+        self.flush('bookings', Booking, bookings)
+
+    # Inserts
+
+    def flush(self, table, model, rows):
+        if not rows:
+            return
+        began = time.perf_counter()
+        with transaction.atomic():
+            self.insert(model, rows)
+        self.elapsed[table] += time.perf_counter() - began
+        self.counts[table] += len(rows)
+        if self.options['verbosity'] > 1:
+            self.stdout.write(f'  {table}: {self.counts[table]:,} rows')
+        rows.clear()
+
+    def bulk_rows(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.options['batch_size'])
+
+    def copy_rows(self, model, rows):
+        """
+        Stream ``rows`` to PostgreSQL with COPY ... FROM STDIN (text format)
+        """
+        fields = [
+            f for f in model._meta.concrete_fields
+            if not isinstance(f, (AutoField, BigAutoField, SmallAutoField))
+        ]
+        buffer = io.StringIO()
+        # None is written as \N, COPY's default NULL, so an empty string
+        # stays an empty string.
+        for row in rows:
+            buffer.write(copy_line(
+                # auto_now fields are kept as generated, like the timestamps
+                # the rows were built with
+                f.get_db_prep_save(getattr(row, f.attname), connection) for f in fields
+            ))
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        sql = (
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) '
+            f'FROM STDIN'
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                buffer.seek(0)
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    # Output
+
+    def rate_line(self, label, rows, seconds):
+        rate = rows / seconds if seconds else 0.0
+        return f'{label:<9} {rows:>12,} rows in {seconds:8.2f}s  {rate:>12,.0f} rows/s'
+
+    def report(self, table, rows, seconds):
+        self.stdout.write(self.rate_line(table, rows, seconds))
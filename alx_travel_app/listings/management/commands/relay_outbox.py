@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings.outbox import backlog, relay_batch, requeue_failed
+
+
+class Command(BaseCommand):
+    help = 'Publish pending outbox messages to the Celery broker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of messages published per batch')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox once and exit')
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help='Put messages that ran out of attempts back to pending first')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+
+        if options['requeue_failed']:
+            self.stdout.write(f'Requeued {requeue_failed()} failed messages')
+        pending = backlog()
+        if pending['failed']:
+            self.stderr.write(
+                f"{pending['failed']} outbox messages have failed and will not be published; "
+                f"replay them with --requeue-failed"
+            )
+        self.stdout.write(f'Outbox relay started (batch size {batch_size})')
+        try:
+            while True:
+                stats = relay_batch(batch_size=batch_size)
+                if stats['published'] or stats['failed']:
+                    pending = backlog()
+                    self.stdout.write(
+                        f"published={stats['published']} failed={stats['failed']} "
+                        f"avg_lag={stats['avg_lag']:.3f}s max_lag={stats['max_lag']:.3f}s "
+                        f"pending={pending['pending']} oldest={pending['oldest_age']:.3f}s "
+                        f"failed_total={pending['failed']}"
+                    )
+                # A full batch means there is probably more waiting.
+                if stats['published'] == batch_size:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Outbox relay stopped'))
@@ -0,0 +1,67 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Print traces recorded by the file exporter as span trees'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None,
+                            help='Trace file (default: TRACING_FILE)')
+        parser.add_argument('--trace-id', help='Only print this trace')
+        parser.add_argument('--last', type=int, default=10,
+                            help='Number of most recent traces to print')
+        parser.add_argument('--min-duration', type=float, default=0.0,
+                            help='Only print traces whose root took at least this many ms')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.TRACING_FILE
+        try:
+            with open(path) as f:
+                spans = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(f'No trace file at {path} (is TRACING_EXPORTER=file?)')
+
+        traces = defaultdict(list)
+        for span in spans:
+            traces[span['trace_id']].append(span)
+
+        if options['trace_id']:
+            trace_ids = [options['trace_id']] if options['trace_id'] in traces else []
+        else:
+            # Order by the start of each trace's earliest span.
+            trace_ids = sorted(traces, key=lambda t: min(s['start_time'] for s in traces[t]))
+            trace_ids = trace_ids[-options['last']:] if options['last'] else trace_ids
+
+        for trace_id in trace_ids:
+            trace = traces[trace_id]
+            ids = {span['span_id'] for span in trace}
+            roots = [span for span in trace if span['parent_id'] not in ids]
+            if max((r['duration_ms'] or 0) for r in roots) < options['min_duration']:
+                continue
+            children = defaultdict(list)
+            for span in trace:
+                children[span['parent_id']].append(span)
+            start = min(span['start_time'] for span in trace)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'trace {trace_id} ({len(trace)} spans)'))
+            for root in sorted(roots, key=lambda s: s['start_time']):
+                self._print(root, children, start, 1)
+
+    def _print(self, span, children, start, depth):
+        offset = (span['start_time'] - start) * 1000
+        line = (
+            f"{'  ' * depth}{span['name']}  {span['duration_ms']:.2f}ms "
+            f"(+{offset:.2f}ms)"
+        )
+        if span['status'] == 'error':
+            line = self.style.ERROR(
+                f"{line}  {span['attributes'].get('error.type', 'error')}: "
+                f"{span['attributes'].get('error.message', '')}"
+            )
+        self.stdout.write(line)
+        for child in sorted(children[span['span_id']], key=lambda s: s['start_time']):
+            self._print(child, children, start, depth + 1)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=200)),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('dedupe_key', models.CharField(blank=True, max_length=200, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('published', 'Published'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='outbox_status_id_idx')],
+            },
+        ),
+    ]
@@ -63,3 +63,37 @@ class Booking(models.Model):
         if not self.booking_reference:
             self.booking_reference = f"BK{uuid.uuid4().hex[:8].upper()}"
         super().save(*args, **kwargs)
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task waiting to be published to the broker.
+
+    Rows are written in the same transaction as the booking or payment change
+    that triggers them and published later by the outbox relay, so request
+    handlers never talk to the broker and workers never see uncommitted data.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('published', 'Published'),
+        ('failed', 'Failed'),
+    ]
+    
+    task_name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=200, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    published_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='outbox_status_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Outbox {self.id} {self.task_name} - {self.status}"
@@ -0,0 +1,172 @@
+"""
+Transactional outbox for Celery task dispatch.
+
+Views call ``enqueue()`` inside the transaction that changes a booking or
+payment. The task is stored as an ``OutboxMessage`` row and only reaches the
+broker when the relay (``python manage.py relay_outbox``) publishes it, so a
+worker can never pick up a task for data that was rolled back or is not yet
+committed, and the request path never blocks on the broker.
+"""
+import logging
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from alx_travel_app import logs, tracing
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, args=(), kwargs=None, dedupe_key=None):
+    """
+    Schedule ``task`` to be published once the current transaction commits.
+
+    A second message with the same ``dedupe_key`` is silently dropped, which
+    makes it safe to enqueue from code paths that may run more than once for
+    the same state change. With OUTBOX_ENABLED turned off the task is sent
+    directly from an on_commit hook instead.
+    """
+    kwargs = kwargs or {}
+    if not getattr(settings, 'OUTBOX_ENABLED', True):
+        transaction.on_commit(lambda: task.apply_async(args=list(args), kwargs=kwargs))
+        return
+    # bulk_create with ignore_conflicts issues a single INSERT ... ON CONFLICT
+    # DO NOTHING, so a duplicate key does not abort the caller's transaction.
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            task_name=task.name,
+            args=list(args),
+            kwargs=kwargs,
+            headers=logs.inject(tracing.inject({})),
+            dedupe_key=dedupe_key,
+        )
+    ], ignore_conflicts=True)
+
+
+def _publish(app, message, producer):
+    """
+    Send one outbox row to the broker.
+
+    The Celery task id is derived from the outbox id, so a row that is
+    published twice (e.g. the relay crashed before marking it) keeps the
+    same task id and can be recognised downstream.
+    """
+    task_id = f'outbox-{message.id}'
+    if app.conf.task_always_eager:
+        app.tasks[message.task_name].apply(
+            args=message.args, kwargs=message.kwargs, task_id=task_id,
+            headers=message.headers,
+        )
+        return
+    task = app.tasks.get(message.task_name)
+    app.send_task(
+        message.task_name,
+        args=message.args,
+        kwargs=message.kwargs,
+        task_id=task_id,
+        headers=message.headers,
+        producer=producer,
+        # send_task does not look at the task class, so pass this on to skip
+        # setting up result storage for tasks whose results are never read.
+        ignore_result=task.ignore_result if task else False,
+    )
+
+
+def relay_batch(batch_size=100, max_attempts=None):
+    """
+    Publish up to ``batch_size`` pending messages in id order.
+
+    Rows are locked with SKIP LOCKED so several relays can run side by side
+    without publishing the same message. Publishing stops at the first
+    failure to preserve ordering; the failed row is retried on the next
+    batch until it has been attempted ``max_attempts`` times, after which it
+    is marked failed and skipped. Failed rows are counted by ``backlog()``
+    and published again once ``requeue_failed()`` puts them back.
+
+    Returns a dict with the number of published and failed messages and the
+    commit-to-publish lag of the batch in seconds.
+    """
+    from alx_travel_app.celery import app
+
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+    stats = {'published': 0, 'failed': 0, 'max_lag': 0.0, 'avg_lag': 0.0}
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')[:batch_size]
+        )
+        if not messages:
+            return stats
+
+        published = []
+        total_lag = 0.0
+        # Eager mode runs tasks in-process and has no broker to connect to.
+        if app.conf.task_always_eager:
+            acquire = nullcontext()
+        else:
+            acquire = app.producer_or_acquire()
+        with acquire as producer:
+            for message in messages:
+                try:
+                    _publish(app, message, producer)
+                except Exception as e:
+                    message.attempts += 1
+                    message.last_error = str(e)
+                    if message.attempts >= max_attempts:
+                        message.status = 'failed'
+                        stats['failed'] += 1
+                    message.save(update_fields=['attempts', 'last_error', 'status'])
+                    logger.warning('Outbox message %s failed to publish: %s', message.id, e)
+                    break
+
+                now = timezone.now()
+                lag = (now - message.created_at).total_seconds()
+                total_lag += lag
+                stats['max_lag'] = max(stats['max_lag'], lag)
+                message.status = 'published'
+                message.published_at = now
+                message.attempts += 1
+                published.append(message)
+
+        OutboxMessage.objects.bulk_update(published, ['status', 'published_at', 'attempts'])
+
+    stats['published'] = len(published)
+    if published:
+        stats['avg_lag'] = total_lag / len(published)
+    return stats
+
+
+def backlog():
+    """
+    Number of messages waiting to be published, the age in seconds of the
+    oldest one (0 when there is none) and the number of failed messages.
+    """
+    summary = OutboxMessage.objects.filter(status__in=('pending', 'failed')).aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        failed=Count('id', filter=Q(status='failed')),
+        oldest=Min('created_at', filter=Q(status='pending')),
+    )
+    oldest = summary['oldest']
+    return {
+        'pending': summary['pending'],
+        'oldest_age': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+        'failed': summary['failed'],
+    }
+
+
+def requeue_failed(queryset=None):
+    """
+    Put failed messages (all of them, or those in ``queryset``) back to
+    pending with a fresh attempt count and return how many were requeued.
+    They keep their ids, so they are published ahead of later messages.
+    """
+    queryset = OutboxMessage.objects.all() if queryset is None else queryset
+    return queryset.filter(status='failed').update(status='pending', attempts=0, last_error='')
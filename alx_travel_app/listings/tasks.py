@@ -1,31 +1,96 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Payment, Booking
+from django.utils import timezone
+from .models import Payment, Booking, OutboxMessage
+from .dedupe import deduplicate
 
-@shared_task
-def send_booking_confirmation_email(booking_id):
+# Bump whenever the shape of a task snapshot changes so that workers running
+# newer code ignore payloads produced by older web processes (and vice versa).
+SNAPSHOT_VERSION = 1
+
+BOOKING_SNAPSHOT_FIELDS = (
+    'booking_reference', 'destination', 'travel_date', 'return_date',
+    'number_of_travelers', 'total_amount', 'booking_status_display',
+    'first_name', 'username', 'email',
+)
+
+def build_booking_snapshot(booking, user):
     """
-    Send booking confirmation email to user
+    Capture everything the booking confirmation email needs, so the task
+    can render it without querying the database.
+
+    Values are normalised through the model fields, which makes a snapshot
+    taken from freshly parsed request data render exactly like a booking
+    loaded from the database.
     """
-    try:
-        booking = Booking.objects.get(id=booking_id)
-        user = booking.user
-        
-        subject = f'Booking Confirmation - {booking.destination}'
-        message = f"""
-        Dear {user.first_name or user.username},
+    field = Booking._meta.get_field
+    travel_date = field('travel_date').to_python(booking.travel_date)
+    return_date = field('return_date').to_python(booking.return_date)
+    total_amount = field('total_amount').to_python(booking.total_amount)
+    return {
+        'v': SNAPSHOT_VERSION,
+        'captured_at': time.time(),
+        'booking_reference': booking.booking_reference,
+        'destination': booking.destination,
+        'travel_date': str(travel_date),
+        'return_date': str(return_date) if return_date else None,
+        'number_of_travelers': int(booking.number_of_travelers),
+        'total_amount': str(total_amount.quantize(Decimal('0.01'))),
+        'booking_status_display': booking.get_booking_status_display(),
+        'first_name': user.first_name,
+        'username': user.username,
+        'email': user.email,
+    }
+
+def booking_confirmation_payload(booking, user):
+    """
+    Keyword arguments for send_booking_confirmation_email.
+
+    The snapshot is only attached when TASK_PAYLOAD_SNAPSHOTS is enabled;
+    otherwise the task receives the booking id alone, as before.
+    """
+    payload = {'booking_id': str(booking.id)}
+    if getattr(settings, 'TASK_PAYLOAD_SNAPSHOTS', False):
+        payload['snapshot'] = build_booking_snapshot(booking, user)
+    return payload
+
+def is_snapshot_usable(snapshot, fields):
+    """
+    A snapshot is usable when it was produced by the current code version,
+    carries every field the task renders and is younger than
+    TASK_SNAPSHOT_MAX_AGE seconds.
+    """
+    if not isinstance(snapshot, dict) or snapshot.get('v') != SNAPSHOT_VERSION:
+        return False
+    if any(name not in snapshot for name in fields):
+        return False
+    max_age = getattr(settings, 'TASK_SNAPSHOT_MAX_AGE', 0)
+    if max_age and time.time() - snapshot.get('captured_at', 0) > max_age:
+        return False
+    return True
+
+def _render_booking_confirmation(context):
+    """
+    Build the subject and body of the booking confirmation email
+    """
+    subject = f'Booking Confirmation - {context["destination"]}'
+    message = f"""
+        Dear {context['first_name'] or context['username']},
         
         Your travel booking has been successfully created!
         
         Booking Details:
-        - Booking Reference: {booking.booking_reference}
-        - Destination: {booking.destination}
-        - Travel Date: {booking.travel_date}
-        - Return Date: {booking.return_date or 'One-way trip'}
-        - Number of Travelers: {booking.number_of_travelers}
-        - Total Amount: {booking.total_amount}
-        - Booking Status: {booking.get_booking_status_display()}
+        - Booking Reference: {context['booking_reference']}
+        - Destination: {context['destination']}
+        - Travel Date: {context['travel_date']}
+        - Return Date: {context['return_date'] or 'One-way trip'}
+        - Number of Travelers: {context['number_of_travelers']}
+        - Total Amount: {context['total_amount']}
+        - Booking Status: {context['booking_status_display']}
         
         Please complete your payment to confirm your booking.
         
@@ -34,29 +99,47 @@ def send_booking_confirmation_email(booking_id):
         Best regards,
         Travel App Team
         """
+    return subject, message
+
+@shared_task(ignore_result=True)
+@deduplicate(entity='booking_id', state='created')
+def send_booking_confirmation_email(booking_id, snapshot=None):
+    """
+    Send booking confirmation email to user
+
+    When the caller passes a usable snapshot the email is rendered from it
+    directly; otherwise the booking and its user are fetched in one query.
+    """
+    try:
+        if is_snapshot_usable(snapshot, BOOKING_SNAPSHOT_FIELDS):
+            context = snapshot
+        else:
+            booking = Booking.objects.select_related('user').get(id=booking_id)
+            context = build_booking_snapshot(booking, booking.user)
+        
+        subject, message = _render_booking_confirmation(context)
         
         send_mail(
             subject=subject,
             message=message,
             from_email=settings.EMAIL_DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
+            recipient_list=[context['email']],
             fail_silently=False,
         )
         
-        return f"Booking confirmation email sent to {user.email}"
+        return f"Booking confirmation email sent to {context['email']}"
         
     except Booking.DoesNotExist:
         return f"Booking with ID {booking_id} not found"
-    except Exception as e:
-        return f"Error sending booking confirmation email: {str(e)}"
 
-@shared_task
+@shared_task(ignore_result=True)
+@deduplicate(entity='payment_id', state='completed')
 def send_payment_confirmation_email(payment_id):
     """
     Send payment confirmation email to user
     """
     try:
-        payment = Payment.objects.get(id=payment_id)
+        payment = Payment.objects.select_related('user').get(id=payment_id)
         user = payment.user
         
         subject = f'Payment Confirmation - Booking {payment.booking_reference}'
@@ -89,16 +172,15 @@ def send_payment_confirmation_email(payment_id):
         
     except Payment.DoesNotExist:
         return f"Payment with ID {payment_id} not found"
-    except Exception as e:
-        return f"Error sending email: {str(e)}"
 
-@shared_task
+@shared_task(ignore_result=True)
+@deduplicate(entity='payment_id', state='failed')
 def send_payment_failure_email(payment_id):
     """
     Send payment failure notification email to user
     """
     try:
-        payment = Payment.objects.get(id=payment_id)
+        payment = Payment.objects.select_related('user').get(id=payment_id)
         user = payment.user
         
         subject = f'Payment Failed - Booking {payment.booking_reference}'
@@ -130,5 +212,15 @@ def send_payment_failure_email(payment_id):
         
     except Payment.DoesNotExist:
         return f"Payment with ID {payment_id} not found"
-    except Exception as e:
-        return f"Error sending email: {str(e)}"
+
+@shared_task(ignore_result=True)
+def purge_outbox():
+    """
+    Delete outbox messages that were published more than
+    OUTBOX_RETENTION_HOURS ago
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    deleted, _ = OutboxMessage.objects.filter(
+        status='published', published_at__lt=cutoff
+    ).delete()
+    return f"Purged {deleted} published outbox messages"
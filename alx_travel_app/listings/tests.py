@@ -1,3 +1,1730 @@
-from django.test import TestCase
+"""
+Query-count regression tests, followed by behaviour tests per feature.
 
-# Create your tests here.
+Every endpoint and Celery task is exercised against data sets of 1, 10 and
+100 rows and must issue exactly the number of queries recorded here, at
+every size. A changed count fails with the captured queries; for the larger
+sizes they are shown as a diff against the 1-row run, so an N+1 shows up as
+a block of repeated ``+`` lines.
+
+Savepoint statements are left out of the counts: they come from the test
+transaction wrapping ``transaction.atomic()`` and are not sent in production.
+
+The classes after the query counts check what each feature does (task
+snapshots, the outbox relay, rate limits, tokens, probes, ...), one class
+per feature.
+"""
+import difflib
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import requests
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client.parser import text_string_to_metric_families
+
+from alx_travel_app import auth, db_routers, fastjson, health
+from alx_travel_app.ratelimit import LocalBuckets
+from listings import chapa, outbox
+from listings.models import Booking, OutboxMessage, Payment
+from listings.tasks import (
+    purge_outbox,
+    send_booking_confirmation_email,
+    send_payment_confirmation_email,
+    send_payment_failure_email,
+)
+
+SIZES = (1, 10, 100)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)')
+_SAVEPOINTS = re.compile(r'^(RELEASE |ROLLBACK TO )?SAVEPOINT ')
+
+
+def setUpModule():
+    # Keep the per-request logs (timings, 4xx responses) out of the test
+    # output.
+    logging.disable(logging.WARNING)
+
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def normalize(sql):
+    """
+    SQL with literal values replaced by ``?``, so runs over different rows
+    compare equal
+    """
+    sql = _NUMBERS.sub('?', _STRINGS.sub('?', sql))
+    return _IN_LISTS.sub('IN (...)', sql)
+
+
+def captured_statements(context):
+    return [
+        normalize(query['sql']) for query in context.captured_queries
+        if not _SAVEPOINTS.match(query['sql'])
+    ]
+
+
+class QueryCountTestCase(TestCase):
+    """
+    ``assertQueryCounts`` runs a scenario at every size in SIZES
+    """
+
+    def assertQueryCounts(self, expected, setup, run, sizes=SIZES):
+        """
+        Call ``setup(size)`` to create the data, then ``run(state)`` with its
+        return value and check that ``run`` issued ``expected`` queries
+        """
+        baseline = None
+        for size in sizes:
+            with self.subTest(size=size):
+                state = setup(size)
+                with CaptureQueriesContext(connection) as context:
+                    run(state)
+                statements = captured_statements(context)
+                if baseline is None:
+                    baseline = (size, statements)
+                if len(statements) != expected:
+                    self.fail(self._report(expected, size, statements, baseline))
+
+    def _report(self, expected, size, statements, baseline):
+        lines = [f'{len(statements)} queries at size {size}, expected {expected}']
+        baseline_size, baseline_statements = baseline
+        diff = list(difflib.unified_diff(
+            baseline_statements, statements,
+            fromfile=f'size {baseline_size}', tofile=f'size {size}', lineterm='',
+        ))
+        if diff:
+            lines += diff
+        else:
+            lines += [f'{i:4d}. {sql}' for i, sql in enumerate(statements, 1)]
+        return '\n'.join(lines)
+
+
+def make_user(is_staff=False):
+    name = f'user_{uuid.uuid4().hex[:10]}'
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', first_name='Test', is_staff=is_staff,
+    )
+
+
+def make_bookings(user, count, **fields):
+    bookings = [
+        Booking(**{
+            'user': user,
+            'booking_reference': f'BK{uuid.uuid4().hex[:12].upper()}',
+            'destination': 'Lalibela',
+            'travel_date': date(2026, 12, 1) + timedelta(days=i % 30),
+            'return_date': date(2026, 12, 8) + timedelta(days=i % 30),
+            'number_of_travelers': 2,
+            'total_amount': Decimal('450.00'),
+            **fields,
+        })
+        for i in range(count)
+    ]
+    return Booking.objects.bulk_create(bookings)
+
+
+def make_payments(user, count, **fields):
+    fields.setdefault('payment_status', 'pending')
+    payments = []
+    for i in range(count):
+        reference = f'BK{uuid.uuid4().hex[:12].upper()}'
+        payments.append(Payment(
+            user=user,
+            booking_reference=reference,
+            amount=Decimal('450.00'),
+            currency='ETB',
+            transaction_id=f'TX_{reference}',
+            **fields,
+        ))
+    return Payment.objects.bulk_create(payments)
+
+
+def metric_samples(text):
+    """
+    ``{(sample name, labels): value}`` for a Prometheus text exposition
+    """
+    return _SampleValues(
+        ((sample.name, frozenset(sample.labels.items())), sample.value)
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+    )
+
+
+class _SampleValues(dict):
+    # lets tests look samples up with a plain labels dict
+
+    def __getitem__(self, key):
+        name, labels = key
+        return super().__getitem__((name, frozenset(labels.items())))
+
+    def __contains__(self, key):
+        name, labels = key
+        return super().__contains__((name, frozenset(labels.items())))
+
+
+def chapa_response(data, status_code=200):
+    response = mock.Mock(status_code=status_code, text=json.dumps(data))
+    response.json.return_value = data
+    return response
+
+
+@override_settings(OUTBOX_ENABLED=True, TRACING_EXPORTER='none', METRICS_TOKEN='')
+class BookingQueryCountTests(QueryCountTestCase):
+
+    def test_list_bookings(self):
+        def setup(size):
+            user = make_user()
+            make_bookings(user, size)
+            return user
+
+        def run(user):
+            response = self.client.get('/api/booking/', {'user_id': user.id})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertQueryCounts(1, setup, run)
+
+    def test_booking_detail_with_payment(self):
+        def setup(size):
+            user = make_user()
+            payments = make_payments(user, size)
+            bookings = make_bookings(user, size)
+            for booking, payment in zip(bookings, payments):
+                booking.payment = payment
+            Booking.objects.bulk_update(bookings, ['payment'])
+            return bookings[-1]
+
+        def run(booking):
+            response = self.client.get(f'/api/booking/{booking.id}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data']['payment_id'], str(booking.payment_id))
+
+        self.assertQueryCounts(1, setup, run)
+
+    def test_create_booking(self):
+        def setup(size):
+            user = make_user()
+            make_bookings(user, size)
+            return user
+
+        def run(user):
+            response = self.client.post('/api/booking/', json.dumps({
+                'user_id': user.id,
+                'destination': 'Gondar',
+                'travel_date': '2026-12-01',
+                'return_date': '2026-12-08',
+                'number_of_travelers': 2,
+                'total_amount': '450.00',
+            }), content_type='application/json', HTTP_X_REQUEST_ID='req-create-booking')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Request-ID'], 'req-create-booking')
+
+        # user, booking insert, outbox insert
+        self.assertQueryCounts(3, setup, run)
+        # the email task is logged under the request's id
+        message = OutboxMessage.objects.latest('created_at')
+        self.assertEqual(message.headers['request_id'], 'req-create-booking')
+
+
+@override_settings(OUTBOX_ENABLED=True, TRACING_EXPORTER='none', METRICS_TOKEN='')
+class PaymentQueryCountTests(QueryCountTestCase):
+
+    def test_initiate_payment(self):
+        def setup(size):
+            user = make_user()
+            make_payments(user, size)
+            return user
+
+        def run(user):
+            response = chapa_response({
+                'status': 'success',
+                'data': {'checkout_url': 'https://checkout.example.com/x', 'reference': 'ref'},
+            })
+            with mock.patch('listings.chapa.requests.request', return_value=response):
+                response = self.client.post('/api/payment/initiate/', json.dumps({
+                    'user_id': user.id,
+                    'booking_reference': f'BK{uuid.uuid4().hex[:12].upper()}',
+                    'amount': '450.00',
+                    'currency': 'ETB',
+                    'email': user.email,
+                    'first_name': 'Test',
+                    'last_name': 'User',
+                }), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        # user, duplicate check, payment insert
+        self.assertQueryCounts(3, setup, run)
+
+    def _completed_by(self, path, body):
+        def setup(size):
+            user = make_user()
+            payments = make_payments(user, size)
+            make_bookings(user, size)
+            payment = payments[-1]
+            make_bookings(user, 1, booking_reference=payment.booking_reference)
+            return payment
+
+        def run(payment):
+            response = self.client.post(
+                path, json.dumps(body(payment)), content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200)
+            payment.refresh_from_db()
+            self.assertEqual(payment.payment_status, 'completed')
+
+        return setup, run
+
+    def test_verify_payment(self):
+        setup, run = self._completed_by(
+            '/api/payment/verify/', lambda payment: {'transaction_id': payment.transaction_id},
+        )
+        response = chapa_response({'status': 'success', 'data': {'status': 'success'}})
+
+        def run_with_chapa(payment):
+            with mock.patch('listings.chapa.requests.request', return_value=response):
+                run(payment)
+
+        # payment, booking, booking update, outbox insert, payment update,
+        # plus the refresh_from_db in run
+        self.assertQueryCounts(6, setup, run_with_chapa)
+
+    def test_webhook(self):
+        setup, run = self._completed_by(
+            '/api/payment/webhook/',
+            lambda payment: {'tx_ref': payment.transaction_id, 'status': 'success'},
+        )
+        # payment, booking, booking update, outbox insert, payment update,
+        # plus the refresh_from_db in run
+        self.assertQueryCounts(6, setup, run)
+
+    def test_duplicate_webhook(self):
+        def setup(size):
+            user = make_user()
+            return make_payments(user, size, payment_status='completed')[-1]
+
+        def run(payment):
+            response = self.client.post('/api/payment/webhook/', json.dumps({
+                'tx_ref': payment.transaction_id, 'status': 'success',
+            }), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertQueryCounts(1, setup, run)
+
+    def test_payment_status(self):
+        def setup(size):
+            user = make_user()
+            payment = make_payments(user, size)[-1]
+            self.client.force_login(user)
+            return payment
+
+        def run(payment):
+            response = self.client.get(f'/api/payment/status/{payment.id}/')
+            self.assertEqual(response.status_code, 200)
+
+        # session, user, payment
+        self.assertQueryCounts(3, setup, run)
+
+    def test_user_payments(self):
+        def setup(size):
+            user = make_user()
+            make_payments(user, size)
+            self.client.force_login(user)
+            return size
+
+        def run(size):
+            response = self.client.get('/api/payment/user/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['data']), size)
+
+        # session, user, payments
+        self.assertQueryCounts(3, setup, run)
+
+    # The same two views with the session and user served from the cache,
+    # and with a signed token instead of a session (alx_travel_app.auth).
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TTL=300)
+    def test_payment_status_cached_session(self):
+        def setup(size):
+            user = make_user()
+            payment = make_payments(user, size)[-1]
+            self.client.force_login(user)
+            self.client.get(f'/api/payment/status/{payment.id}/')  # warm the caches
+            return payment
+
+        def run(payment):
+            response = self.client.get(f'/api/payment/status/{payment.id}/')
+            self.assertEqual(response.status_code, 200)
+
+        # payment
+        self.assertQueryCounts(1, setup, run)
+
+    @override_settings(AUTH_USER_CACHE_TTL=300)
+    def test_user_payments_token(self):
+        def setup(size):
+            user = make_user()
+            make_payments(user, size)
+            token = auth.issue_token(user)
+            self.client.get('/api/payment/user/', HTTP_AUTHORIZATION=f'Token {token}')  # warm the cache
+            return size, token
+
+        def run(state):
+            size, token = state
+            response = self.client.get('/api/payment/user/', HTTP_AUTHORIZATION=f'Token {token}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['data']), size)
+
+        # payments
+        self.assertQueryCounts(1, setup, run)
+
+
+@override_settings(OUTBOX_ENABLED=True, TRACING_EXPORTER='none', METRICS_TOKEN='')
+class MonitoringQueryCountTests(QueryCountTestCase):
+
+    def setUp(self):
+        self.client.force_login(make_user(is_staff=True))
+
+    def test_task_metrics(self):
+        def setup(size):
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(task_name='listings.tasks.purge_outbox') for _ in range(size)
+            ])
+
+        def run(state):
+            with mock.patch('alx_travel_app.task_metrics.queue_depths', return_value={}):
+                response = self.client.get('/api/metrics/tasks/')
+            self.assertEqual(response.status_code, 200)
+
+        # session, user, outbox backlog (pending, failed, oldest)
+        self.assertQueryCounts(3, setup, run)
+
+    def test_prometheus_metrics(self):
+        def run(state):
+            response = self.client.get('/metrics')
+            self.assertEqual(response.status_code, 200)
+
+        # session, user
+        self.assertQueryCounts(2, lambda size: make_bookings(make_user(), size), run)
+
+
+@override_settings(OUTBOX_ENABLED=True, TRACING_EXPORTER='none')
+class TaskQueryCountTests(QueryCountTestCase):
+
+    def test_booking_confirmation_email(self):
+        def setup(size):
+            return make_bookings(make_user(), size)[-1]
+
+        self.assertQueryCounts(1, setup, lambda booking: send_booking_confirmation_email(str(booking.id)))
+
+    def test_booking_confirmation_email_from_snapshot(self):
+        from listings.tasks import booking_confirmation_payload
+
+        def setup(size):
+            user = make_user()
+            booking = make_bookings(user, size)[-1]
+            return booking_confirmation_payload(booking, user)
+
+        with self.settings(TASK_PAYLOAD_SNAPSHOTS=True):
+            self.assertQueryCounts(0, setup, lambda payload: send_booking_confirmation_email(**payload))
+
+    def test_payment_confirmation_email(self):
+        def setup(size):
+            return make_payments(make_user(), size, payment_status='completed')[-1]
+
+        self.assertQueryCounts(1, setup, lambda payment: send_payment_confirmation_email(str(payment.id)))
+
+    def test_payment_failure_email(self):
+        def setup(size):
+            return make_payments(make_user(), size, payment_status='failed')[-1]
+
+        self.assertQueryCounts(1, setup, lambda payment: send_payment_failure_email(str(payment.id)))
+
+    def test_purge_outbox(self):
+        def setup(size):
+            published_at = timezone.now() - timedelta(days=30)
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(task_name='listings.tasks.purge_outbox', status='published',
+                              published_at=published_at)
+                for _ in range(size)
+            ])
+
+        self.assertQueryCounts(1, setup, lambda state: purge_outbox())
+
+    def test_relay_batch(self):
+        def setup(size):
+            OutboxMessage.objects.filter(status='pending').delete()
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(task_name='listings.tasks.purge_outbox') for _ in range(size)
+            ])
+            return size
+
+        def run(size):
+            with mock.patch('listings.outbox._publish'):
+                stats = outbox.relay_batch(batch_size=100)
+            self.assertEqual(stats['published'], size)
+
+        # pending batch, bulk status update
+        self.assertQueryCounts(2, setup, run)
+
+
+# Behaviour
+
+
+@override_settings(TASK_PAYLOAD_SNAPSHOTS=True, TASK_SNAPSHOT_MAX_AGE=3600)
+class TaskPayloadSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def send(self, **changes):
+        from listings.tasks import booking_confirmation_payload
+
+        user = make_user()
+        booking = make_bookings(user, 1, destination='Axum')[0]
+        payload = booking_confirmation_payload(booking, user)
+        payload['snapshot'].update(destination='Harar', **changes)
+        with CaptureQueriesContext(connection) as context:
+            send_booking_confirmation_email(**payload)
+        self.assertEqual(len(mail.outbox), 1)
+        return mail.outbox[0].subject, len(context.captured_queries)
+
+    def test_current_snapshot_is_rendered_without_queries(self):
+        self.assertEqual(self.send(), ('Booking Confirmation - Harar', 0))
+
+    def test_stale_snapshot_falls_back_to_the_database(self):
+        self.assertEqual(self.send(captured_at=time.time() - 3601), ('Booking Confirmation - Axum', 1))
+
+    def test_snapshot_from_another_version_falls_back_to_the_database(self):
+        self.assertEqual(self.send(v=0), ('Booking Confirmation - Axum', 1))
+
+    def test_incomplete_snapshot_falls_back_to_the_database(self):
+        from listings.tasks import booking_confirmation_payload
+
+        user = make_user()
+        booking = make_bookings(user, 1, destination='Axum')[0]
+        payload = booking_confirmation_payload(booking, user)
+        del payload['snapshot']['email']
+        send_booking_confirmation_email(**payload)
+        self.assertEqual(mail.outbox[0].subject, 'Booking Confirmation - Axum')
+        self.assertEqual(mail.outbox[0].to, [user.email])
+
+
+@override_settings(OUTBOX_ENABLED=True, TRACING_EXPORTER='none')
+class OutboxRelayTests(TestCase):
+
+    def setUp(self):
+        self.messages = OutboxMessage.objects.bulk_create([
+            OutboxMessage(task_name='listings.tasks.purge_outbox', kwargs={'n': i}) for i in range(3)
+        ])
+        self.sent = []
+
+    def relay(self, fail_on=(), **kwargs):
+        def publish(app, message, producer):
+            if message.kwargs['n'] in fail_on:
+                raise ConnectionError('broker down')
+            self.sent.append(message.kwargs['n'])
+
+        with mock.patch('listings.outbox._publish', side_effect=publish):
+            return outbox.relay_batch(**kwargs)
+
+    def states(self):
+        return [
+            (m.status, m.attempts)
+            for m in OutboxMessage.objects.filter(id__in=[m.id for m in self.messages]).order_by('id')
+        ]
+
+    def test_publishes_in_id_order(self):
+        stats = self.relay()
+        self.assertEqual(self.sent, [0, 1, 2])
+        self.assertEqual(stats['published'], 3)
+        self.assertEqual(self.states(), [('published', 1)] * 3)
+
+    def test_stops_at_the_first_failure_and_keeps_the_row(self):
+        stats = self.relay(fail_on={1})
+        self.assertEqual(self.sent, [0])
+        self.assertEqual(stats['published'], 1)
+        self.assertEqual(self.states(), [('published', 1), ('pending', 1), ('pending', 0)])
+        self.assertEqual(OutboxMessage.objects.get(id=self.messages[1].id).last_error, 'broker down')
+
+        # the failed row goes first on the next batch
+        self.relay()
+        self.assertEqual(self.sent, [0, 1, 2])
+        self.assertEqual(self.states(), [('published', 1), ('published', 2), ('published', 1)])
+
+    def test_gives_up_after_max_attempts(self):
+        self.relay(fail_on={0}, max_attempts=2)
+        stats = self.relay(fail_on={0}, max_attempts=2)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(self.states()[0], ('failed', 2))
+
+        # the failed row no longer blocks the rest
+        self.relay(max_attempts=2)
+        self.assertEqual(self.sent, [1, 2])
+        self.assertEqual(outbox.backlog()['failed'], 1)
+
+        # until it is requeued and replayed
+        self.assertEqual(outbox.requeue_failed(), 1)
+        self.assertEqual(outbox.backlog(), {'pending': 1, 'oldest_age': mock.ANY, 'failed': 0})
+        self.relay(max_attempts=2)
+        self.assertEqual(self.sent, [1, 2, 0])
+        self.assertEqual(self.states()[0], ('published', 1))
+
+
+class WorkerProfileTests(TestCase):
+
+    def test_empty_overrides_keep_the_profile_defaults(self):
+        from alx_travel_app.celery import worker_profile_settings
+
+        with mock.patch.dict(os.environ, {'CELERY_WORKER_POOL': '', 'CELERY_WORKER_CONCURRENCY': ''}):
+            conf = worker_profile_settings('payments')
+        self.assertEqual(conf['worker_pool'], 'threads')
+        self.assertEqual(conf['worker_concurrency'], 8)
+        self.assertEqual([q.name for q in conf['task_queues']], ['payments'])
+        self.assertTrue(conf['task_acks_late'])
+
+    def test_overrides(self):
+        from alx_travel_app.celery import worker_profile_settings
+
+        with mock.patch.dict(os.environ, {'CELERY_WORKER_POOL': 'solo', 'CELERY_WORKER_CONCURRENCY': '2'}):
+            conf = worker_profile_settings('notifications')
+        self.assertEqual((conf['worker_pool'], conf['worker_concurrency']), ('solo', 2))
+
+    def test_unknown_profile(self):
+        from alx_travel_app.celery import worker_profile_settings
+
+        with self.assertRaisesRegex(ValueError, 'Unknown CELERY_WORKER_PROFILE'):
+            worker_profile_settings('emails')
+
+
+@override_settings(TASK_METRICS_FLUSH_INTERVAL=0, TRACING_EXPORTER='none')
+class TaskMetricsTests(TestCase):
+
+    def setUp(self):
+        from alx_travel_app import task_metrics
+
+        task_metrics.flush(force=True)
+        cache.clear()
+
+    def test_signal_handlers_flush_outcomes_and_histograms(self):
+        from alx_travel_app import task_metrics
+        from alx_travel_app.celery import app
+
+        @app.task(name='listings.tests.metrics_probe')
+        def probe(fail=False):
+            if fail:
+                raise RuntimeError('boom')
+
+        probe.apply(headers={'sent_at': time.time() - 2})
+        with self.assertLogs('celery.app.trace', 'ERROR'):
+            probe.apply(kwargs={'fail': True}, throw=False)
+
+        metrics = task_metrics.snapshot(['listings.tests.metrics_probe'])['listings.tests.metrics_probe']
+        self.assertEqual((metrics['succeeded'], metrics['failed']), (1, 1))
+        self.assertEqual(metrics['runtime']['count'], 2)
+        # only the first message carried a publish time; it waited ~2s
+        self.assertEqual(metrics['queue_wait']['count'], 1)
+        self.assertEqual(metrics['queue_wait']['buckets']['2.5'], 1)
+        self.assertEqual(metrics['queue_wait']['p50_ms'], 2500)
+
+    @override_settings(TASK_METRICS_FLUSH_INTERVAL=0.1)
+    def test_idle_process_flushes_on_a_timer(self):
+        from alx_travel_app import task_metrics
+
+        # a fresh flusher thread, so it picks up the short interval
+        with mock.patch.object(task_metrics, '_flusher_pid', None):
+            task_metrics.observe('listings.tests.idle_probe', 'runtime', 0.2)
+            deadline = time.monotonic() + 5
+            # no further task finishes to trigger a flush
+            while time.monotonic() < deadline:
+                metrics = task_metrics.snapshot(['listings.tests.idle_probe'])['listings.tests.idle_probe']
+                if metrics['runtime']['count']:
+                    break
+                time.sleep(0.02)
+        self.assertEqual(metrics['runtime']['count'], 1)
+
+
+@override_settings(TRACING_EXPORTER='none')
+class DeduplicationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_execution_is_suppressed(self):
+        payment = make_payments(make_user(), 1, payment_status='completed')[0]
+        send_payment_confirmation_email(str(payment.id))
+        send_payment_confirmation_email(str(payment.id))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_can_run_again(self):
+        import smtplib
+
+        payment = make_payments(make_user(), 1, payment_status='completed')[0]
+        with mock.patch('listings.tasks.send_mail', side_effect=smtplib.SMTPServerDisconnected('gone')):
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                send_payment_confirmation_email(str(payment.id))
+        self.assertEqual(len(mail.outbox), 0)
+
+        # the retry is not mistaken for a duplicate
+        send_payment_confirmation_email(str(payment.id))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_states_are_deduplicated_separately(self):
+        payment = make_payments(make_user(), 1, payment_status='failed')[0]
+        send_payment_failure_email(str(payment.id))
+        send_payment_confirmation_email(str(payment.id))
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(TRACING_EXPORTER='none')
+class RequestTimingHeaderTests(TestCase):
+
+    def test_header_is_opt_in(self):
+        user = make_user()
+        with self.settings(REQUEST_TIMING_HEADER=False):
+            self.assertNotIn('Server-Timing', self.client.get('/api/booking/', {'user_id': user.id}))
+        with self.settings(REQUEST_TIMING_HEADER=True):
+            header = self.client.get('/api/booking/', {'user_id': user.id})['Server-Timing']
+        self.assertRegex(header, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"')
+
+
+@override_settings(TRACING_EXPORTER='memory', TRACING_SAMPLE_RATE=1.0, OUTBOX_ENABLED=True)
+class TracingTests(TestCase):
+    TRACE_ID = 'a' * 32
+    PARENT_ID = 'b' * 16
+
+    def setUp(self):
+        from alx_travel_app import tracing
+
+        cache.clear()
+        patcher = mock.patch.object(tracing, '_exporter', tracing.InMemoryExporter())
+        self.exporter = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def spans(self, name_prefix):
+        return [span for span in self.exporter.trace(self.TRACE_ID) if span.name.startswith(name_prefix)]
+
+    def test_request_chapa_call_and_task_share_the_trace(self):
+        from alx_travel_app.celery import app
+
+        user = make_user()
+        payment = make_payments(user, 1)[0]
+        make_bookings(user, 1, booking_reference=payment.booking_reference)
+        chapa = chapa_response({'status': 'success', 'data': {'status': 'success'}})
+        with mock.patch('listings.chapa.requests.request', return_value=chapa):
+            response = self.client.post(
+                '/api/payment/verify/', json.dumps({'transaction_id': payment.transaction_id}),
+                content_type='application/json', HTTP_TRACEPARENT=f'00-{self.TRACE_ID}-{self.PARENT_ID}-01',
+            )
+        self.assertEqual(response.status_code, 200)
+
+        [server] = self.spans('HTTP ')
+        self.assertEqual((server.kind, server.parent_id), ('server', self.PARENT_ID))
+        self.assertEqual(server.name, 'HTTP POST /api/payment/verify/')
+        self.assertEqual(response['traceparent'], server.traceparent())
+
+        [call] = self.spans('chapa ')
+        self.assertEqual((call.kind, call.parent_id), ('client', server.span_id))
+        self.assertEqual(call.attributes['chapa.endpoint'], '/transaction/verify')
+
+        message = OutboxMessage.objects.get(task_name='listings.tasks.send_payment_confirmation_email')
+        self.assertEqual(message.headers['traceparent'], f'00-{self.TRACE_ID}-{server.span_id}-01')
+
+        # the relay publishes the task later, outside the request
+        # Relay eagerly; with the CELERY namespace only the prefixed key sticks.
+        eager = app.conf.task_always_eager
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        try:
+            self.assertEqual(outbox.relay_batch()['published'], 1)
+        finally:
+            app.conf.update(CELERY_TASK_ALWAYS_EAGER=eager)
+        [task] = self.spans('celery task ')
+        self.assertEqual((task.kind, task.parent_id), ('consumer', server.span_id))
+        self.assertEqual(task.attributes['celery.state'], 'SUCCESS')
+
+    def test_untraced_request_starts_a_new_trace(self):
+        response = self.client.get('/api/booking/', {'user_id': make_user().id})
+        trace_id = response['traceparent'].split('-')[1]
+        self.assertNotEqual(trace_id, self.TRACE_ID)
+        self.assertEqual([span.kind for span in self.exporter.trace(trace_id)], ['server'])
+
+    @override_settings(TRACING_SAMPLE_RATE=0.0)
+    def test_unsampled_traces_are_not_exported(self):
+        response = self.client.get('/api/booking/', {'user_id': make_user().id})
+        self.assertTrue(response['traceparent'].endswith('-00'))
+        self.assertEqual(self.exporter.spans, [])
+
+
+class GenerateDataCopyTests(TestCase):
+
+    def test_copy_line_escapes_and_nulls(self):
+        from listings.management.commands.generate_data import copy_line
+
+        self.assertEqual(copy_line(['a', None, '', 3]), 'a\t\\N\t\t3\n')
+        self.assertEqual(copy_line(['tab\there', 'line\nbreak\r', 'back\\slash']),
+                         'tab\\there\tline\\nbreak\\r\tback\\\\slash\n')
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_copy_round_trips_null_and_empty_values(self):
+        from listings.management.commands.generate_data import Command
+
+        now = timezone.now()
+        payment = Payment(
+            user=make_user(), booking_reference='BKCOPYNULL', amount=Decimal('450.00'), currency='ETB',
+            transaction_id=None, chapa_reference='', payment_date=None, created_at=now, updated_at=now,
+        )
+        Command().copy_rows(Payment, [payment])
+        stored = Payment.objects.get(booking_reference='BKCOPYNULL')
+        self.assertIsNone(stored.transaction_id)
+        self.assertIsNone(stored.payment_date)
+        self.assertEqual(stored.chapa_reference, '')
+        self.assertEqual(stored.amount, Decimal('450.00'))
+
+
+class SchemaETagTests(TestCase):
+
+    def setUp(self):
+        from alx_travel_app import api_schema
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'schema.yaml'), 'w') as f:
+            f.write('openapi: 3.0.3\npaths:\n' + ''.join(f'  /api/route{i}/: {{}}\n' for i in range(200)))
+        override = self.settings(OPENAPI_SCHEMA_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        api_schema.clear()
+        self.addCleanup(api_schema.clear)
+
+    def test_if_none_match_gives_304(self):
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_compressed_response_has_weak_etag_that_revalidates(self):
+        strong = self.client.get('/api/schema/')['ETag']
+
+        response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/' + strong)
+
+        # If-None-Match compares weakly, so the weakened tag still matches
+        response = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH='W/' + strong)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_generated_schema_keeps_view_annotations(self):
+        from alx_travel_app import api_schema
+
+        schema = json.loads(api_schema.render_schema('json'))
+        operation = schema['paths']['/api/payment/initiate/']['post']
+        self.assertEqual(operation['operationId'], 'initiate_payment')
+        self.assertEqual(operation['summary'], 'Initiate Payment')
+        self.assertEqual(operation['tags'], ['Payments'])
+        self.assertIn('503', operation['responses'])
+
+    def test_workers_do_not_import_schema_machinery(self):
+        # a fresh interpreter, as in benchmarks/import_time.py
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.import_time', '--child', 'lazy'],
+            cwd=settings.BASE_DIR, env=dict(os.environ, DJANGO_SETTINGS_MODULE='alx_travel_app.settings'),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1])['doc_modules'], [])
+
+
+class FastJSONTests(TestCase):
+    DATA = {
+        'amount': Decimal('450.10'),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'created_at': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        'local': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=3))),
+        'travel_date': date(2026, 12, 1),
+        'items': [Decimal('1.5'), None, True, 'Addis Ababa \u2028 café'],
+    }
+
+    def test_renderer_matches_drf(self):
+        from rest_framework.renderers import JSONRenderer
+
+        from alx_travel_app.fastjson import ORJSONRenderer
+
+        self.assertEqual(ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    def test_dumps_matches_django_values(self):
+        from django.core.serializers.json import DjangoJSONEncoder
+
+        self.assertEqual(fastjson.loads(fastjson.dumps(self.DATA)), json.loads(json.dumps(self.DATA, cls=DjangoJSONEncoder)))
+
+    def test_plain_views_keep_django_json_bytes(self):
+        from django.http import JsonResponse
+
+        from listings import views
+
+        response = self.client.post('/api/auth/token/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'{"success": false, "message": "Invalid JSON data"}')
+        self.assertIs(views.JsonResponse, JsonResponse)
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=1024)
+class CompressionTests(TestCase):
+    BODY = json.dumps([{'destination': 'Lalibela', 'amount': '450.00'}] * 100).encode()
+
+    def respond(self, response, accept_encoding=None):
+        from alx_travel_app.compression import CompressionMiddleware
+
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding is not None else {}
+        response = CompressionMiddleware(lambda request: response)(RequestFactory().get('/api/booking/', **headers))
+        if response.streaming:
+            body = b''.join(response.streaming_content)
+        else:
+            body = response.content
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response, body
+
+    def test_negotiation(self):
+        from alx_travel_app.compression import BrotliCodec, GzipCodec, ZstdCodec, negotiate
+
+        codecs = [ZstdCodec(3), BrotliCodec(4), GzipCodec(6)]
+
+        def encoding(header):
+            return getattr(negotiate(header, codecs), 'encoding', None)
+
+        self.assertEqual(encoding('gzip, br'), 'br')  # ties go to the server's order
+        self.assertEqual(encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(encoding('zstd;q=0, *;q=0.1'), 'br')
+        self.assertEqual(encoding('identity'), None)
+        self.assertEqual(encoding('gzip;q=0'), None)
+        self.assertEqual(encoding(''), None)
+
+    def test_large_response_is_compressed(self):
+        response, body = self.respond(HttpResponse(self.BODY, content_type='application/json'), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(body, self.BODY)
+
+    def test_small_response_is_left_alone(self):
+        response, body = self.respond(HttpResponse(b'{"ok": true}', content_type='application/json'), 'gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('Vary', response)
+        self.assertEqual(body, b'{"ok": true}')
+
+    def test_vary_is_set_when_the_client_accepts_no_encoding(self):
+        response, body = self.respond(HttpResponse(self.BODY, content_type='application/json'))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(body, self.BODY)
+
+    def test_html_is_not_compressed(self):
+        response, _ = self.respond(HttpResponse(self.BODY, content_type='text/html'), 'gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_response_is_compressed_whatever_its_size(self):
+        chunks = [b'{"rows": [', b'1, 2', b']}']
+        streaming = StreamingHttpResponse(iter(chunks), content_type='application/json')
+        streaming['Content-Length'] = str(sum(map(len, chunks)))
+        response, body = self.respond(streaming, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(body, b''.join(chunks))
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMIT_FAIL_OPEN=True, OUTBOX_ENABLED=True, TRACING_EXPORTER='none')
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('alx_travel_app.ratelimit._backend', LocalBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_booking(self, user_id):
+        return self.client.post('/api/booking/', json.dumps({
+            'user_id': user_id,
+            'destination': 'Gondar',
+            'travel_date': '2026-12-01',
+            'total_amount': '450.00',
+        }), content_type='application/json')
+
+    def test_parse_rate(self):
+        from alx_travel_app.ratelimit import Rate, parse_rate
+
+        self.assertEqual(parse_rate('5/m'), Rate(5, 5 / 60))
+        self.assertEqual(parse_rate('100/h:20'), Rate(20, 100 / 3600))
+        self.assertEqual(parse_rate(' 10 / 5min '), Rate(10, 10 / 300))
+        self.assertIsNone(parse_rate(''))
+        for value in ('5', 'five/m', '5/w', '0/m', '5/m:0', '5/m:x'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_rate(value)
+
+    def test_local_buckets_refill_and_retry_after(self):
+        from alx_travel_app.ratelimit import Rate
+
+        buckets = LocalBuckets()
+        limits = [('fast', Rate(2, 1.0), 0), ('slow', Rate(3, 0.1), 0)]
+        with mock.patch('alx_travel_app.ratelimit.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual(buckets.hit(limits)[:3], (True, 0.0, 1))
+            self.assertEqual(buckets.hit(limits)[:3], (True, 0.0, 0))
+            self.assertEqual(buckets.hit(limits), (False, 1.0, 0, 'fast'))
+
+            # fast refills a token a second, slow one every ten
+            clock.return_value = 101.0
+            self.assertTrue(buckets.hit(limits).allowed)
+            clock.return_value = 102.0
+            decision = buckets.hit(limits)
+            self.assertEqual((decision.allowed, decision.limited_by), (False, 'slow'))
+            self.assertAlmostEqual(decision.retry_after, 8.0)
+
+            # remaining is that of the emptiest bucket
+            clock.return_value = 110.0
+            decision = buckets.hit(limits)
+            self.assertTrue(decision.allowed)
+            self.assertEqual(decision.limited_by, 'slow')
+
+    def test_redis_script(self):
+        from alx_travel_app.ratelimit import Rate, RedisBuckets
+
+        url = os.getenv('RATELIMIT_REDIS_URL') or os.getenv('REDIS_URL')
+        if url:
+            buckets = RedisBuckets(url, 1)
+            try:
+                buckets.client.ping()
+            except Exception:
+                self.skipTest(f'Redis at {url} is not reachable')
+        else:
+            try:
+                import fakeredis
+            except ImportError:
+                self.skipTest('needs REDIS_URL or fakeredis')
+            with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+                buckets = RedisBuckets('redis://fake', 1)
+
+        prefix = f'ratelimit:{{test-{uuid.uuid4().hex}}}'
+        self.addCleanup(buckets.client.delete, f'{prefix}:a', f'{prefix}:b')
+        # rates slow enough that Redis' clock cannot refill a token meanwhile
+        limits = [(f'{prefix}:a', Rate(2, 0.001), 0), (f'{prefix}:b', Rate(5, 0.001), 0)]
+        self.assertEqual(buckets.hit(limits)[:3], (True, 0.0, 1))
+        self.assertEqual(buckets.hit(limits)[:3], (True, 0.0, 0))
+        decision = buckets.hit(limits)
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.limited_by, f'{prefix}:a')
+        self.assertAlmostEqual(decision.retry_after, 1000, delta=1)
+        # the rejected request took nothing from b
+        tokens = float(buckets.client.hget(f'{prefix}:b', 'tokens'))
+        self.assertAlmostEqual(tokens, 3, delta=0.1)
+
+    @override_settings(RATELIMITS={'create_booking': {'ip': '1/m', 'user': '1/m'}})
+    def test_rejection_body_and_retry_after(self):
+        from alx_travel_app import web_metrics
+
+        rejections = web_metrics.RATELIMIT_REJECTIONS.labels('create_booking', 'ip')
+        before = rejections._value.get()
+        user = make_user()
+        self.assertEqual(self.create_booking(user.id).status_code, 200)
+
+        response = self.create_booking(user.id)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(response.json(), {'success': False, 'message': 'Too many requests, retry in 60 seconds'})
+        self.assertEqual(rejections._value.get() - before, 1)
+        # rejected before the view ran
+        self.assertEqual(Booking.objects.filter(user=user).count(), 1)
+
+    @override_settings(RATELIMITS={'create_booking': {'user': '1/m'}})
+    def test_claimed_user_id_is_not_a_bucket(self):
+        victim = make_user()
+        for _ in range(3):
+            self.assertEqual(self.create_booking(victim.id).status_code, 200)
+
+        # a logged-in user has their own bucket
+        self.client.force_login(victim)
+        self.assertEqual(self.create_booking(victim.id).status_code, 200)
+        self.assertEqual(self.create_booking(victim.id).status_code, 429)
+
+    @override_settings(RATELIMITS={'create_booking': {'ip': '1/m'}})
+    def test_backend_errors_fail_open(self):
+        from alx_travel_app import web_metrics
+
+        errors = web_metrics.RATELIMIT_ERRORS.labels('create_booking')
+        before = errors._value.get()
+        with mock.patch.object(LocalBuckets, 'hit', side_effect=ConnectionError('redis down')):
+            self.assertEqual(self.create_booking(make_user().id).status_code, 200)
+            self.assertEqual(self.create_booking(make_user().id).status_code, 200)
+            with self.settings(RATELIMIT_FAIL_OPEN=False), self.assertLogs('django.request', 'ERROR'):
+                with self.assertRaises(ConnectionError):
+                    self.create_booking(make_user().id)
+        self.assertEqual(errors._value.get() - before, 3)
+
+
+class FakeClock:
+    """
+    time.monotonic and time.sleep for code that waits: sleeping moves the
+    clock instead of blocking
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@override_settings(
+    RATELIMIT_ENABLED=False, TRACING_EXPORTER='none', CHAPA_RATE_LIMIT='10/s:10',
+    CHAPA_PRIORITY_RESERVE={'high': 0.0, 'normal': 0.2, 'low': 0.5},
+    CHAPA_QUEUE_TIMEOUTS={'high': 3.0, 'normal': 3.0, 'low': 60.0},
+)
+class ChapaGovernorTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in (
+            mock.patch('alx_travel_app.ratelimit._backend', LocalBuckets()),
+            mock.patch('time.monotonic', self.clock.monotonic),
+            mock.patch('time.sleep', self.clock.sleep),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reserve_keeps_tokens_for_higher_priorities(self):
+        from listings import chapa
+
+        for _ in range(5):
+            chapa.acquire('high')
+        # 5 of 10 tokens left: low priority keeps half the bucket in reserve
+        with self.assertRaises(chapa.Throttled) as caught:
+            chapa.acquire('low', deadline=0)
+        self.assertAlmostEqual(caught.exception.retry_after, 0.1)
+        for _ in range(3):
+            chapa.acquire('normal')
+        # normal keeps 2 in reserve, high can still have them
+        with self.assertRaises(chapa.Throttled):
+            chapa.acquire('normal', deadline=0)
+        self.assertEqual([chapa.acquire('high') for _ in range(2)], [0.0, 0.0])
+        self.assertEqual(self.clock.slept, [])
+
+    @override_settings(CHAPA_RATE_LIMIT='1/s:1')
+    def test_waits_for_a_token_within_the_deadline(self):
+        from alx_travel_app import web_metrics
+        from listings import chapa
+
+        wait = web_metrics.CHAPA_GOVERNOR_WAIT.labels('normal')
+        before = wait._sum.get()
+        chapa.acquire('normal')
+        waited = chapa.acquire('normal')
+        # the next token comes in a second, plus up to 20% jitter
+        self.assertTrue(1.0 <= waited <= 1.2, waited)
+        self.assertAlmostEqual(sum(self.clock.slept), waited)
+        self.assertAlmostEqual(wait._sum.get() - before, waited)
+
+    @override_settings(CHAPA_RATE_LIMIT='1/m:1')
+    def test_dropped_when_no_token_comes_before_the_deadline(self):
+        from alx_travel_app import web_metrics
+        from listings import chapa
+
+        drops = web_metrics.CHAPA_GOVERNOR_DROPS.labels('high')
+        before = drops._value.get()
+        chapa.acquire('high')
+        with self.assertRaises(chapa.Throttled) as caught:
+            chapa.acquire('high')
+        self.assertAlmostEqual(caught.exception.retry_after, 60)
+        # dropped at once, without waiting for a token that cannot come in time
+        self.assertEqual(self.clock.slept, [])
+        self.assertEqual(drops._value.get() - before, 1)
+
+    def test_fails_open_when_the_backend_is_down(self):
+        from alx_travel_app import web_metrics
+        from listings import chapa
+
+        errors = web_metrics.RATELIMIT_ERRORS.labels('chapa')
+        before = errors._value.get()
+        with mock.patch.object(LocalBuckets, 'hit', side_effect=ConnectionError('redis down')):
+            self.assertEqual(chapa.acquire('low'), 0.0)
+        self.assertEqual(errors._value.get() - before, 1)
+
+    @override_settings(CHAPA_RATE_LIMIT='1/m:1')
+    def test_view_returns_503_with_retry_after(self):
+        from listings import chapa
+
+        user = make_user()
+        chapa.acquire('high')
+        with mock.patch('listings.chapa.requests.request') as send, self.assertLogs('django.request', 'ERROR'):
+            response = self.client.post('/api/payment/initiate/', json.dumps({
+                'user_id': user.id,
+                'booking_reference': 'BKGOVERNOR',
+                'amount': '450.00',
+                'email': user.email,
+                'first_name': 'Test',
+                'last_name': 'User',
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertFalse(response.json()['success'])
+        send.assert_not_called()
+        self.assertFalse(Payment.objects.filter(booking_reference='BKGOVERNOR').exists())
+
+    @override_settings(CHAPA_TIMEOUT=(1.5, 4))
+    def test_calls_have_a_timeout(self):
+        with mock.patch('listings.chapa.requests.request', return_value=chapa_response({})) as send:
+            chapa.request('GET', '/transaction/verify/TX_TIMEOUT')
+            chapa.request('GET', '/transaction/verify/TX_TIMEOUT', timeout=30)
+        self.assertEqual([call.kwargs['timeout'] for call in send.call_args_list], [(1.5, 4), 30])
+
+
+@override_settings(
+    AUTH_USER_CACHE_TTL=300, AUTH_TOKEN_MAX_AGE=3600, TRACING_EXPORTER='none',
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class TokenAuthTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='abebe', password='correct horse')
+
+    def obtain(self, body):
+        return self.client.post('/api/auth/token/', body if isinstance(body, str) else json.dumps(body),
+                                content_type='application/json')
+
+    def test_valid_token(self):
+        self.assertEqual(auth.user_from_token(auth.issue_token(self.user)), self.user)
+
+    def test_expired_token(self):
+        token = auth.issue_token(self.user)
+        with mock.patch('time.time', return_value=time.time() + 3601):
+            self.assertIsNone(auth.user_from_token(token))
+
+    def test_tampered_token(self):
+        token = auth.issue_token(self.user)
+        value, _, signature = token.rpartition(':')
+        self.assertIsNone(auth.user_from_token(f'{value}:{signature[::-1]}'))
+        self.assertIsNone(auth.user_from_token('not-a-token'))
+
+    def test_password_change_revokes_tokens(self):
+        token = auth.issue_token(self.user)
+        self.assertIsNotNone(auth.user_from_token(token))  # cached now
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertIsNone(auth.user_from_token(token))
+
+    def test_inactive_user(self):
+        token = auth.issue_token(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(auth.user_from_token(token))
+
+    def test_user_is_forgotten_again_on_commit(self):
+        key = auth._user_key(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Abebe'
+            self.user.save()
+            # another request caching the row before the save commits
+            cache.set(key, User(pk=self.user.pk, username='abebe'))
+        self.assertIsNone(cache.get(key))
+
+    def test_obtain_token(self):
+        response = self.obtain({'username': 'abebe', 'password': 'correct horse'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data['expires_in'], 3600)
+        self.assertEqual(auth.user_from_token(data['token']), self.user)
+
+        response = self.client.get('/api/payment/user/', HTTP_AUTHORIZATION=f"Token {data['token']}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_obtain_token_errors(self):
+        self.assertEqual(self.obtain({'username': 'abebe', 'password': 'wrong'}).status_code, 401)
+        self.assertEqual(self.obtain({'username': 'nobody', 'password': 'x'}).status_code, 401)
+        self.assertEqual(self.obtain('{not json').status_code, 400)
+        self.assertEqual(self.obtain('["abebe"]').status_code, 400)
+
+    @override_settings(RATELIMIT_ENABLED=True, RATELIMITS={'obtain_token': {'ip': '2/m'}})
+    def test_obtain_token_rate_limited(self):
+        with mock.patch('alx_travel_app.ratelimit._backend', LocalBuckets()):
+            for _ in range(2):
+                self.assertEqual(self.obtain({'username': 'abebe', 'password': 'wrong'}).status_code, 401)
+            response = self.obtain({'username': 'abebe', 'password': 'correct horse'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_schema_documents_the_token_scheme(self):
+        from alx_travel_app import api_schema
+
+        schema = fastjson.loads(api_schema.render_schema('json'))
+        self.assertEqual(schema['components']['securitySchemes']['tokenAuth'], {
+            'type': 'apiKey', 'in': 'header', 'name': 'Authorization',
+            'description': 'Signed token from POST /api/auth/token/, sent as "Token <token>"',
+        })
+
+
+@override_settings(READINESS_CHECKS=['database', 'cache'], READINESS_TIMEOUT=5, READINESS_CACHE_SECONDS=60)
+class HealthCheckTests(TestCase):
+
+    def setUp(self):
+        health.clear()
+        self.addCleanup(health.clear)
+
+    def test_healthz(self):
+        # answered before the session is loaded
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+    def test_readyz_cached(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['checks']), {'database', 'cache'})
+
+        # the first probe's result is reused
+        with mock.patch('alx_travel_app.health.run_checks') as run_checks:
+            self.assertEqual(self.client.get('/readyz').json(), response.json())
+        run_checks.assert_not_called()
+
+    def test_failing_check_gives_503(self):
+        failing = mock.patch.dict(health.CHECKS, cache=mock.Mock(side_effect=ConnectionError('refused')))
+        with failing, self.assertLogs('django.request', 'ERROR'):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'unavailable')
+        self.assertEqual(response.json()['checks']['cache'], {'status': 'error', 'error': 'ConnectionError'})
+        self.assertEqual(response.json()['checks']['database']['status'], 'ok')
+
+    @override_settings(READINESS_TIMEOUT=0.05)
+    def test_slow_check_times_out_with_503(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch.dict(health.CHECKS, cache=release.wait), self.assertLogs('django.request', 'ERROR'):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['cache'], {'status': 'timeout'})
+
+    def test_stale_result_is_served_while_one_probe_refreshes(self):
+        self.assertEqual(self.client.get('/readyz').status_code, 200)
+        started, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_cache_check():
+            started.set()
+            release.wait()
+            raise ConnectionError('refused')
+
+        with self.settings(READINESS_CACHE_SECONDS=0), mock.patch.dict(health.CHECKS, cache=slow_cache_check):
+            refresher = threading.Thread(target=health.readiness)
+            refresher.start()
+            self.assertTrue(started.wait(5))
+            # the refresh is still running; other probes get the last result
+            ready, checks = health.readiness()
+            self.assertTrue(ready)
+            self.assertEqual(checks['cache']['status'], 'ok')
+            release.set()
+            refresher.join(5)
+        # and then the refreshed one
+        with self.assertLogs('django.request', 'ERROR'):
+            self.assertEqual(self.client.get('/readyz').status_code, 503)
+
+
+class RecordingHandler(logging.Handler):
+    """
+    Keeps the records it is given, after its filters ran
+    """
+
+    def __init__(self, *filters):
+        super().__init__()
+        self.records = []
+        for log_filter in filters:
+            self.addFilter(log_filter)
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def log_record(name='listings.views', level=logging.INFO, **attributes):
+    return logging.makeLogRecord({
+        'name': name, 'levelno': level, 'levelname': logging.getLevelName(level), **attributes,
+    })
+
+
+class StructuredLoggingTests(TestCase):
+
+    def in_request(self, request_id, function):
+        from alx_travel_app.logs import RequestIdMiddleware
+
+        def view(request):
+            function()
+            return HttpResponse()
+
+        return RequestIdMiddleware(view)(RequestFactory().get('/', HTTP_X_REQUEST_ID=request_id))
+
+    def test_full_queue_drops_and_counts(self):
+        from alx_travel_app import logs, web_metrics
+
+        writing, release = threading.Event(), threading.Event()
+        lines = []
+
+        class SlowStream:
+            def write(self, text):
+                writing.set()
+                release.wait(5)
+                lines.append(text)
+
+            def flush(self):
+                pass
+
+        dropped = web_metrics.LOG_RECORDS_DROPPED.labels('queue_full')
+        before = dropped._value.get()
+        handler = logs.QueueHandler(SlowStream(), queue_size=1)
+        handler.handle(log_record(msg='first'))
+        self.assertTrue(writing.wait(5))  # the listener is stuck writing it
+        for message in ('second', 'third', 'fourth'):
+            handler.handle(log_record(msg=message))  # returns at once
+        self.assertEqual(dropped._value.get() - before, 2)
+        release.set()
+        handler.close()
+        self.assertEqual([line.strip() for line in lines if line.strip()], ['first', 'second'])
+
+    def test_sampling_keeps_or_drops_whole_requests(self):
+        from alx_travel_app.logs import SamplingFilter
+
+        handler = RecordingHandler(SamplingFilter('listings.views=0.5'))
+        kept = {}
+        for i in range(100):
+            request_id = f'req-{i}'
+
+            def log_request():
+                for level in (logging.DEBUG, logging.INFO, logging.INFO):
+                    handler.handle(log_record(level=level))
+
+            count = len(handler.records)
+            self.in_request(request_id, log_request)
+            kept[request_id] = len(handler.records) - count
+        self.assertEqual(set(kept.values()), {0, 3})
+        self.assertTrue(30 < list(kept.values()).count(3) < 70)
+
+    def test_sampling_never_drops_warnings_or_other_loggers(self):
+        from alx_travel_app.logs import SamplingFilter
+
+        sampling = SamplingFilter('listings=0')
+        self.assertFalse(sampling.filter(log_record('listings.views', logging.INFO)))
+        self.assertTrue(sampling.filter(log_record('listings.views', logging.WARNING)))
+        self.assertTrue(sampling.filter(log_record('listings.views', logging.ERROR)))
+        self.assertTrue(sampling.filter(log_record('listingsx', logging.INFO)))
+        self.assertTrue(sampling.filter(log_record('django.request', logging.INFO)))
+
+    def test_json_formatter_emits_extra_and_request_id(self):
+        from alx_travel_app.logs import ContextFilter, JSONFormatter
+
+        handler = RecordingHandler(ContextFilter())
+        # booking_id and amount as extra= adds them
+        self.in_request('req-json', lambda: handler.handle(log_record(
+            msg='Booking %s created', args=('BK1',), booking_id=7, amount=Decimal('450.00'),
+        )))
+        [record] = handler.records
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['message'], 'Booking BK1 created')
+        self.assertEqual((entry['level'], entry['logger']), ('INFO', 'listings.views'))
+        self.assertEqual(entry['request_id'], 'req-json')
+        self.assertEqual((entry['booking_id'], entry['amount']), (7, '450.00'))
+        self.assertNotIn('args', entry)
+
+    def test_task_runs_under_the_publishing_request_id(self):
+        from alx_travel_app import logs
+        from alx_travel_app.celery import app
+
+        seen = []
+
+        @app.task(name='listings.tests.log_probe')
+        def probe():
+            seen.append(logs.current_request_id())
+
+        # published while handling the request, with the id in a header
+        headers = {}
+        self.in_request('req-publish', lambda: logs.inject(headers))
+        self.assertEqual(headers, {'request_id': 'req-publish'})
+
+        # run later by a worker, outside any request
+        self.assertIsNone(logs.current_request_id())
+        probe.apply(headers=headers)
+        self.assertEqual(seen, ['req-publish'])
+        self.assertIsNone(logs.current_request_id())
+
+
+@override_settings(
+    PROFILING_TOKEN='secret', PROFILING_SAMPLE_RATE=0, PROFILING_MODE='cprofile',
+    PROFILING_SAMPLE_INTERVAL=0.001, PROFILING_MAX_PROFILES=2, METRICS_TOKEN='', TRACING_EXPORTER='none',
+)
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = self.settings(PROFILING_DIR=self.profile_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = make_user()
+        make_bookings(self.user, 3)
+
+    def profile(self, **headers):
+        response = self.client.get('/api/booking/', {'user_id': self.user.id}, HTTP_X_PROFILE='secret', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Profile-Id']
+
+    def test_profiled_request(self):
+        ids = [self.profile() for _ in range(3)]
+        # only the newest PROFILING_MAX_PROFILES are kept
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), sorted(
+            f'{profile_id}{suffix}' for profile_id in ids[1:] for suffix in ('.json', '.prof')
+        ))
+
+        self.client.force_login(make_user(is_staff=True))
+        listed = self.client.get('/api/profiles/').json()['data']
+        self.assertEqual([meta['id'] for meta in listed], ids[:0:-1])
+        self.assertEqual(listed[0]['route'], '/api/booking/')
+        self.assertEqual((listed[0]['mode'], listed[0]['status']), ('cprofile', 200))
+
+    def test_unauthorized_header_writes_no_profile(self):
+        response = self.client.get('/api/booking/', {'user_id': self.user.id}, HTTP_X_PROFILE='guess')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_sample_mode(self):
+        from alx_travel_app.profiling import StackSampler
+
+        profile_id = self.profile(HTTP_X_PROFILE_MODE='sample')
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, f'{profile_id}.folded')))
+
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        path = os.path.join(self.profile_dir, 'direct.folded')
+        sampler.dump(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        # collapsed stacks: frames joined by ';', then the sample count
+        stack, _, count = lines[0].rpartition(' ')
+        self.assertGreater(int(count), 0)
+        self.assertIn('test_sample_mode', stack)
+
+    def test_profile_detail(self):
+        profile_id = self.profile()
+        self.client.force_login(make_user(is_staff=True))
+        url = f'/api/profiles/{profile_id}/'
+
+        response = self.client.get(url, {'sort': 'time', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'function calls', response.content)
+
+        response = self.client.get(url, {'format': 'raw'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'{profile_id}.prof', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content))
+
+        self.assertEqual(self.client.get(url, {'sort': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'all'}).status_code, 400)
+        for bad_id in ('latest', '..', '1-a b', '-x', f'{profile_id}.json', '9999999999999-missing'):
+            with self.subTest(profile_id=bad_id):
+                self.assertEqual(self.client.get(f'/api/profiles/{bad_id}/').status_code, 404)
+
+    def test_profiles_need_staff_or_token(self):
+        profile_id = self.profile()
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/profiles/{profile_id}/').status_code, 403)
+
+
+@override_settings(DATABASE_REPLICA_LAG_CHECK_INTERVAL=0, DATABASE_REPLICA_MAX_LAG=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    # Not a TestCase: its per-test transaction would keep every read on
+    # the primary.
+    databases = {'default'}
+
+    def setUp(self):
+        # A fake replica; its lag is reported by self.lag, so it is never
+        # connected to.
+        replica = dict(settings.DATABASES['default'], TEST={'MIRROR': 'default'})
+        self.lag = 0.0
+        for patcher in (
+            mock.patch.dict(settings.DATABASES, replica_0=replica),
+            mock.patch.dict(db_routers._lag_checks, clear=True),
+            mock.patch('alx_travel_app.db_routers._measure_lag', side_effect=self.measure_lag),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.router = db_routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def measure_lag(self, alias):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+        return self.lag
+
+    def read_alias(self, **meta):
+        """
+        Database a ``replica_reads`` view reads payments from
+        """
+        view = db_routers.replica_reads(lambda request: self.router.db_for_read(Payment))
+        return view(self.factory.get('/', **meta))
+
+    def write(self, **meta):
+        """
+        A request through the stickiness middleware that writes a payment
+        """
+        def view(request):
+            self.router.db_for_write(Payment)
+            return HttpResponse()
+        db_routers.ReplicaStickinessMiddleware(view)(self.factory.post('/', **meta))
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.read_alias(), 'replica_0')
+        # only inside replica_reads views
+        self.assertEqual(self.router.db_for_read(Payment), 'default')
+        self.assertEqual(self.router.db_for_write(Payment), 'default')
+
+    def test_client_sticks_to_primary_after_write(self):
+        self.write(REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(self.read_alias(REMOTE_ADDR='10.0.0.1'), 'default')
+        self.assertEqual(self.read_alias(REMOTE_ADDR='10.0.0.2'), 'replica_0')
+
+        # requests that only read do not stick
+        db_routers.ReplicaStickinessMiddleware(lambda request: HttpResponse())(
+            self.factory.get('/', REMOTE_ADDR='10.0.0.3')
+        )
+        self.assertEqual(self.read_alias(REMOTE_ADDR='10.0.0.3'), 'replica_0')
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_clients_behind_proxy_stick_separately(self):
+        self.write(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(self.read_alias(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.5'), 'default')
+        self.assertEqual(self.read_alias(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.6'), 'replica_0')
+
+    def test_lagging_or_unreachable_replica_falls_back_to_primary(self):
+        for lag in (5.0, 5.1, None, ConnectionError('refused')):
+            with self.subTest(lag=lag):
+                self.lag = lag
+                expected = 'replica_0' if lag == 5.0 else 'default'
+                self.assertEqual(self.read_alias(), expected)
+                self.assertEqual(db_routers.replica_status()['replica_0']['healthy'], expected == 'replica_0')
+
+    def test_reads_in_atomic_block_use_primary(self):
+        with transaction.atomic():
+            self.assertEqual(self.read_alias(), 'default')
+        self.assertEqual(self.read_alias(), 'replica_0')
+
+
+@skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_TUNED, 'SQLite tuning is off')
+class SQLiteTuningTests(SimpleTestCase):
+
+    def test_connection_pragmas(self):
+        # The test database lives in memory, where WAL does not apply, so
+        # open a file database with the same OPTIONS.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(directory, 'tuned.sqlite3'))
+        tuned = type(connections['default'])(settings_dict, alias='sqlite_tuning')
+        self.addCleanup(tuned.close)
+
+        with tuned.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'busy_timeout', 'synchronous', 'cache_size', 'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'busy_timeout': int(settings.SQLITE_BUSY_TIMEOUT * 1000),
+            'synchronous': 1,  # NORMAL
+            'cache_size': -settings.SQLITE_CACHE_SIZE_KB,
+            'temp_store': 2,  # MEMORY
+        })
+        self.assertEqual(tuned.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(METRICS_TOKEN='', TRACING_EXPORTER='none')
+class PrometheusMetricsTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(make_user(is_staff=True))
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return metric_samples(response.content.decode())
+
+    def test_request_and_chapa_series(self):
+        self.assertEqual(self.client.get('/api/payment/user/').status_code, 200)
+        with mock.patch('listings.chapa.requests.request', return_value=chapa_response({}, 502)):
+            chapa.request('GET', '/transaction/verify/TX_METRICS')
+        with mock.patch('listings.chapa.requests.request', side_effect=requests.ConnectionError('refused')):
+            with self.assertRaises(requests.ConnectionError):
+                chapa.request('GET', '/transaction/verify/TX_METRICS')
+
+        samples = self.scrape()
+        route = {'method': 'GET', 'route': '/api/payment/user/'}
+        self.assertGreaterEqual(samples[('http_requests_total', dict(route, status='200'))], 1)
+        self.assertGreaterEqual(samples[('http_request_duration_seconds_count', route)], 1)
+        self.assertIn(('http_request_duration_seconds_bucket', dict(route, le='0.005')), samples)
+        verify = {'endpoint': '/transaction/verify'}
+        self.assertGreaterEqual(samples[('chapa_request_duration_seconds_count', verify)], 2)
+        self.assertGreaterEqual(samples[('chapa_requests_total', dict(verify, outcome='server_error'))], 1)
+        self.assertGreaterEqual(samples[('chapa_requests_total', dict(verify, outcome='exception'))], 1)
+        # the scrape itself is in flight while it renders
+        self.assertGreaterEqual(samples[('http_requests_in_progress', {'method': 'GET'})], 1)
+
+    def test_multiprocess_values_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+        # two worker processes, each counting into its own file
+        for count in (1, 2):
+            subprocess.run([sys.executable, '-c', (
+                'from alx_travel_app import web_metrics\n'
+                f'web_metrics.REQUESTS.labels("GET", "/multiprocess", "200").inc({count})\n'
+                'web_metrics.CHAPA_LATENCY.labels("/multiprocess").observe(0.2)\n'
+            )], env=env, cwd=settings.BASE_DIR, check=True)
+        self.assertEqual(len(os.listdir(directory)), 4)  # counter and histogram per process
+
+        with mock.patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+            samples = self.scrape()
+        self.assertEqual(samples[('http_requests_total', {'method': 'GET', 'route': '/multiprocess', 'status': '200'})], 3)
+        self.assertEqual(samples[('chapa_request_duration_seconds_count', {'endpoint': '/multiprocess'})], 2)
+        self.assertAlmostEqual(samples[('chapa_request_duration_seconds_sum', {'endpoint': '/multiprocess'})], 0.4)
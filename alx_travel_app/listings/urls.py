@@ -14,4 +14,10 @@ urlpatterns = [
     # Booking API endpoints
     path('api/booking/', views.BookingViewSet.as_view(), name='booking_list_create'),
     path('api/booking/<uuid:booking_id>/', views.BookingViewSet.as_view(), name='booking_detail'),
+    
+    # Monitoring endpoints
+    path('api/metrics/tasks/', views.task_metrics, name='task_metrics'),
+    path('metrics', views.prometheus_metrics, name='prometheus_metrics'),
+    path('api/profiles/', views.profiles, name='profiles'),
+    path('api/profiles/<str:profile_id>/', views.profile_detail, name='profile_detail'),
 ]
@@ -1,8 +1,9 @@
 import os
-import requests
-import json
+import hmac
+import logging
+import math
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -15,16 +16,34 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
-from drf_spectacular.types import OpenApiTypes
 from .models import Payment, Booking
+from . import chapa, dedupe, outbox
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from alx_travel_app import fastjson
+from alx_travel_app.api_schema import extend_schema
+from alx_travel_app.db_routers import replica_reads
+from alx_travel_app.ratelimit import rate_limit
 
 # Chapa API configuration
-CHAPA_SECRET_KEY = os.getenv('CHAPA_SECRET_KEY', 'your_chapa_secret_key_here')
-CHAPA_BASE_URL = 'https://api.chapa.co/v1'
 CHAPA_WEBHOOK_SECRET = os.getenv('CHAPA_WEBHOOK_SECRET', 'your_webhook_secret_here')
 
+logger = logging.getLogger(__name__)
+
+
+def _chapa_busy(error):
+    """
+    503 for a Chapa call the governor dropped (see listings/chapa.py)
+    """
+    response = JsonResponse({
+        'success': False,
+        'message': 'Payment provider is busy, please retry shortly'
+    }, status=503)
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+
 @extend_schema(
     operation_id='initiate_payment',
     summary='Initiate Payment',
@@ -64,10 +83,13 @@ CHAPA_WEBHOOK_SECRET = os.getenv('CHAPA_WEBHOOK_SECRET', 'your_webhook_secret_he
         },
         400: {'description': 'Bad request - Missing required fields'},
         404: {'description': 'User not found'},
-        500: {'description': 'Internal server error'}
+        429: {'description': 'Too many requests - retry after the Retry-After header'},
+        500: {'description': 'Internal server error'},
+        503: {'description': 'Chapa rate limit reached - retry after the Retry-After header'}
     },
     tags=['Payments']
 )
+@rate_limit('initiate_payment')
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def initiate_payment(request):
@@ -75,7 +97,7 @@ def initiate_payment(request):
     Initiate payment with Chapa API
     """
     try:
-        data = json.loads(request.body)
+        data = fastjson.loads(request.body)
         
         # Extract required fields
         user_id = data.get('user_id')
@@ -126,16 +148,7 @@ def initiate_payment(request):
         }
         
         # Make request to Chapa API
-        headers = {
-            "Authorization": f"Bearer {CHAPA_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(
-            f"{CHAPA_BASE_URL}/transaction/initialize",
-            json=chapa_data,
-            headers=headers
-        )
+        response = chapa.request('POST', '/transaction/initialize', json=chapa_data)
         
         if response.status_code == 200:
             chapa_response = response.json()
@@ -151,6 +164,11 @@ def initiate_payment(request):
                 payment_url=chapa_response.get('data', {}).get('checkout_url'),
                 transaction_id=chapa_data['tx_ref']
             )
+            logger.info('Payment initiated', extra={
+                'payment_id': str(payment.id),
+                'booking_reference': booking_reference,
+                'transaction_id': payment.transaction_id,
+            })
             
             return JsonResponse({
                 'success': True,
@@ -168,12 +186,15 @@ def initiate_payment(request):
                 'message': f'Chapa API error: {response.text}'
             }, status=response.status_code)
             
-    except json.JSONDecodeError:
+    except chapa.Throttled as e:
+        return _chapa_busy(e)
+    except fastjson.JSONDecodeError:
         return JsonResponse({
             'success': False,
             'message': 'Invalid JSON data'
         }, status=400)
     except Exception as e:
+        logger.exception('Payment initiation failed')
         return JsonResponse({
             'success': False,
             'message': f'Internal server error: {str(e)}'
@@ -186,7 +207,7 @@ def verify_payment(request):
     Verify payment status with Chapa API
     """
     try:
-        data = json.loads(request.body)
+        data = fastjson.loads(request.body)
         transaction_id = data.get('transaction_id')
         
         if not transaction_id:
@@ -205,43 +226,50 @@ def verify_payment(request):
             }, status=404)
         
         # Verify with Chapa API
-        headers = {
-            "Authorization": f"Bearer {CHAPA_SECRET_KEY}"
-        }
-        
-        response = requests.get(
-            f"{CHAPA_BASE_URL}/transaction/verify/{transaction_id}",
-            headers=headers
-        )
+        response = chapa.request('GET', f'/transaction/verify/{transaction_id}')
         
         if response.status_code == 200:
             chapa_response = response.json()
             chapa_data = chapa_response.get('data', {})
             
-            # Update payment status based on Chapa response
-            if chapa_data.get('status') == 'success':
-                payment.payment_status = 'completed'
-                payment.payment_date = timezone.now()
-                
-                # Update booking status if it exists
-                try:
-                    booking = Booking.objects.get(booking_reference=payment.booking_reference)
-                    booking.booking_status = 'confirmed'
-                    booking.payment = payment
-                    booking.save()
-                except Booking.DoesNotExist:
-                    pass  # Booking might not exist yet
-                
-                # Send confirmation email (using Celery for background task)
-                from .tasks import send_payment_confirmation_email
-                send_payment_confirmation_email.delay(payment.id)
-                
-            elif chapa_data.get('status') == 'failed':
-                payment.payment_status = 'failed'
-            else:
-                payment.payment_status = 'pending'
-            
-            payment.save()
+            # Update payment status based on Chapa response. A payment that
+            # is already completed (by an earlier call or the webhook) is
+            # left alone so the confirmation email is not sent again.
+            already_completed = payment.payment_status == 'completed'
+            if not (chapa_data.get('status') == 'success' and already_completed):
+                with transaction.atomic():
+                    if chapa_data.get('status') == 'success':
+                        payment.payment_status = 'completed'
+                        payment.payment_date = timezone.now()
+                        
+                        # Update booking status if it exists
+                        try:
+                            booking = Booking.objects.get(booking_reference=payment.booking_reference)
+                            booking.booking_status = 'confirmed'
+                            booking.payment = payment
+                            booking.save()
+                        except Booking.DoesNotExist:
+                            pass  # Booking might not exist yet
+                        
+                        # Send confirmation email (published by the outbox relay after commit)
+                        from .tasks import send_payment_confirmation_email
+                        outbox.enqueue(
+                            send_payment_confirmation_email,
+                            args=[str(payment.id)],
+                            dedupe_key=f'payment-confirmation:{payment.id}',
+                        )
+                    
+                    elif chapa_data.get('status') == 'failed':
+                        payment.payment_status = 'failed'
+                    else:
+                        payment.payment_status = 'pending'
+                    
+                    payment.save()
+            logger.info('Payment verified', extra={
+                'payment_id': str(payment.id),
+                'payment_status': payment.payment_status,
+                'chapa_status': chapa_data.get('status'),
+            })
             
             return JsonResponse({
                 'success': True,
@@ -260,12 +288,15 @@ def verify_payment(request):
                 'message': f'Chapa API error: {response.text}'
             }, status=response.status_code)
             
-    except json.JSONDecodeError:
+    except chapa.Throttled as e:
+        return _chapa_busy(e)
+    except fastjson.JSONDecodeError:
         return JsonResponse({
             'success': False,
             'message': 'Invalid JSON data'
         }, status=400)
     except Exception as e:
+        logger.exception('Payment verification failed')
         return JsonResponse({
             'success': False,
             'message': f'Internal server error: {str(e)}'
@@ -286,7 +317,7 @@ def chapa_webhook(request):
         # For now, we'll process the webhook without signature verification
         # In production, implement proper signature verification
         
-        data = json.loads(request.body)
+        data = fastjson.loads(request.body)
         tx_ref = data.get('tx_ref')
         
         if not tx_ref:
@@ -300,32 +331,53 @@ def chapa_webhook(request):
         
         # Update payment status
         status = data.get('status')
-        if status == 'success':
-            payment.payment_status = 'completed'
-            payment.payment_date = timezone.now()
-            
-            # Update booking status
-            try:
-                booking = Booking.objects.get(booking_reference=payment.booking_reference)
-                booking.booking_status = 'confirmed'
-                booking.payment = payment
-                booking.save()
-            except Booking.DoesNotExist:
-                pass
-                
-        elif status == 'failed':
-            payment.payment_status = 'failed'
+        if status == 'success' and payment.payment_status == 'completed':
+            # Already confirmed by verify_payment or an earlier delivery
+            return JsonResponse({'message': 'Webhook processed successfully'})
         
-        payment.save()
+        with transaction.atomic():
+            if status == 'success':
+                payment.payment_status = 'completed'
+                payment.payment_date = timezone.now()
+                
+                # Update booking status
+                try:
+                    booking = Booking.objects.get(booking_reference=payment.booking_reference)
+                    booking.booking_status = 'confirmed'
+                    booking.payment = payment
+                    booking.save()
+                except Booking.DoesNotExist:
+                    pass
+                
+                # Same dedupe key as verify_payment, so whichever path
+                # completes the payment first sends the only email.
+                from .tasks import send_payment_confirmation_email
+                outbox.enqueue(
+                    send_payment_confirmation_email,
+                    args=[str(payment.id)],
+                    dedupe_key=f'payment-confirmation:{payment.id}',
+                )
+                    
+            elif status == 'failed':
+                payment.payment_status = 'failed'
+            
+            payment.save()
+        logger.info('Chapa webhook processed', extra={
+            'payment_id': str(payment.id),
+            'payment_status': payment.payment_status,
+            'chapa_status': status,
+        })
         
         return JsonResponse({'message': 'Webhook processed successfully'})
         
-    except json.JSONDecodeError:
+    except fastjson.JSONDecodeError:
         return JsonResponse({'message': 'Invalid JSON'}, status=400)
     except Exception as e:
+        logger.exception('Chapa webhook failed')
         return JsonResponse({'message': f'Error: {str(e)}'}, status=500)
 
 @login_required
+@replica_reads
 def payment_status(request, payment_id):
     """
     Get payment status for a specific payment
@@ -356,6 +408,7 @@ def payment_status(request, payment_id):
         }, status=500)
 
 @login_required
+@replica_reads
 def user_payments(request):
     """
     Get all payments for the authenticated user
@@ -429,6 +482,7 @@ def user_payments(request):
         },
         400: {'description': 'Bad request - Missing required fields'},
         404: {'description': 'User not found'},
+        429: {'description': 'Too many requests - retry after the Retry-After header'},
         500: {'description': 'Internal server error'}
     },
     tags=['Bookings']
@@ -439,12 +493,13 @@ class BookingViewSet(View):
     ViewSet for handling booking operations
     """
     
+    @method_decorator(rate_limit('create_booking'))
     def post(self, request):
         """
         Create a new booking
         """
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             
             # Extract required fields
             user_id = data.get('user_id')
@@ -461,6 +516,17 @@ class BookingViewSet(View):
                     'message': 'Missing required fields: user_id, destination, travel_date, total_amount'
                 }, status=400)
             
+            # Parse dates and amount so the response renders the stored values
+            try:
+                travel_date = Booking._meta.get_field('travel_date').to_python(travel_date)
+                return_date = Booking._meta.get_field('return_date').to_python(return_date)
+                total_amount = Booking._meta.get_field('total_amount').to_python(total_amount)
+            except ValidationError as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Invalid booking data: {" ".join(e.messages)}'
+                }, status=400)
+            
             # Get user
             try:
                 user = User.objects.get(id=user_id)
@@ -470,20 +536,27 @@ class BookingViewSet(View):
                     'message': 'User not found'
                 }, status=404)
             
-            # Create booking
-            booking = Booking.objects.create(
-                user=user,
-                destination=destination,
-                travel_date=travel_date,
-                return_date=return_date,
-                number_of_travelers=number_of_travelers,
-                total_amount=total_amount,
-                booking_status='pending'
-            )
-            
-            # Trigger background task to send booking confirmation email
-            from .tasks import send_booking_confirmation_email
-            send_booking_confirmation_email.delay(str(booking.id))
+            # Create booking and queue the confirmation email atomically
+            from .tasks import send_booking_confirmation_email, booking_confirmation_payload
+            with transaction.atomic():
+                booking = Booking.objects.create(
+                    user=user,
+                    destination=destination,
+                    travel_date=travel_date,
+                    return_date=return_date,
+                    number_of_travelers=number_of_travelers,
+                    total_amount=total_amount,
+                    booking_status='pending'
+                )
+                outbox.enqueue(
+                    send_booking_confirmation_email,
+                    kwargs=booking_confirmation_payload(booking, user),
+                    dedupe_key=f'booking-confirmation:{booking.id}',
+                )
+            logger.info('Booking created', extra={
+                'booking_id': str(booking.id),
+                'booking_reference': booking.booking_reference,
+            })
             
             return JsonResponse({
                 'success': True,
@@ -501,17 +574,19 @@ class BookingViewSet(View):
                 }
             })
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({
                 'success': False,
                 'message': 'Invalid JSON data'
             }, status=400)
         except Exception as e:
+            logger.exception('Booking creation failed')
             return JsonResponse({
                 'success': False,
                 'message': f'Internal server error: {str(e)}'
             }, status=500)
     
+    @method_decorator(replica_reads)
     def get(self, request, booking_id=None):
         """
         Get booking details or list all bookings for a user
@@ -531,7 +606,7 @@ class BookingViewSet(View):
                         'number_of_travelers': booking.number_of_travelers,
                         'total_amount': str(booking.total_amount),
                         'booking_status': booking.booking_status,
-                        'payment_id': str(booking.payment.id) if booking.payment else None,
+                        'payment_id': str(booking.payment_id) if booking.payment_id else None,
                         'created_at': booking.created_at.isoformat(),
                         'updated_at': booking.updated_at.isoformat()
                     }
@@ -577,3 +652,107 @@ class BookingViewSet(View):
                     'success': False,
                     'message': f'Error retrieving bookings: {str(e)}'
                 }, status=500)
+
+def _metrics_authorized(request):
+    """
+    Metrics are readable by staff users or with the METRICS_TOKEN bearer token
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    if not token:
+        return settings.DEBUG
+    header = request.headers.get('Authorization', '')
+    return hmac.compare_digest(header, f'Bearer {token}')
+
+@require_http_methods(["GET"])
+def task_metrics(request):
+    """
+    Queue wait, runtime and outcome counts per Celery task, broker queue
+    depths and the outbox backlog
+    """
+    if not _metrics_authorized(request):
+        return JsonResponse({'success': False, 'message': 'Forbidden'}, status=403)
+    
+    from alx_travel_app.celery import app
+    from alx_travel_app import task_metrics as metrics
+    
+    task_names = sorted(name for name in app.tasks if not name.startswith('celery.'))
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'tasks': metrics.snapshot(task_names),
+            'suppressed_duplicates': dedupe.suppressed_counts(task_names),
+            'queues': metrics.queue_depths(app),
+            'outbox': outbox.backlog(),
+        }
+    })
+
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """
+    Web tier metrics in the Prometheus text format, aggregated over all
+    gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+    """
+    if not _metrics_authorized(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    
+    from alx_travel_app import web_metrics
+    
+    body, content_type = web_metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
+@require_http_methods(["GET"])
+def profiles(request):
+    """
+    Stored request profiles, newest first; ``?route=`` keeps one URL pattern
+    """
+    if not _metrics_authorized(request):
+        return JsonResponse({'success': False, 'message': 'Forbidden'}, status=403)
+    
+    from alx_travel_app import profiling
+    
+    return JsonResponse({
+        'success': True,
+        'data': profiling.listing(request.GET.get('route')),
+    })
+
+@require_http_methods(["GET"])
+def profile_detail(request, profile_id):
+    """
+    One stored profile: a text summary (``?sort=``, ``?limit=``), or the
+    profile file itself with ``?format=raw``
+    """
+    if not _metrics_authorized(request):
+        return JsonResponse({'success': False, 'message': 'Forbidden'}, status=403)
+    
+    import pstats
+    from django.http import FileResponse
+    from alx_travel_app import profiling
+    
+    meta = profiling.load_meta(profile_id)
+    if meta is None:
+        return JsonResponse({'success': False, 'message': 'Profile not found'}, status=404)
+    
+    if request.GET.get('format') == 'raw':
+        try:
+            return FileResponse(
+                open(profiling.data_path(meta), 'rb'),
+                as_attachment=True,
+                filename=os.path.basename(profiling.data_path(meta)),
+            )
+        except FileNotFoundError:
+            return JsonResponse({'success': False, 'message': 'Profile not found'}, status=404)
+    
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in {key.value for key in pstats.SortKey}:
+        return JsonResponse({'success': False, 'message': f'Invalid sort {sort!r}'}, status=400)
+    try:
+        limit = max(1, int(request.GET.get('limit', '50')))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid limit'}, status=400)
+    try:
+        report = profiling.report(meta, sort=sort, limit=limit)
+    except FileNotFoundError:
+        return JsonResponse({'success': False, 'message': 'Profile not found'}, status=404)
+    return HttpResponse(report, content_type='text/plain; charset=utf-8')
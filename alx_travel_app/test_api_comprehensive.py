@@ -31,13 +31,19 @@ def test_health_check():
     print_section("Health Check")
     
     try:
-        response = requests.get(f"{BASE_URL}/admin/")
-        if response.status_code == 200:
-            print_test_result("Server is running", True, f"Status: {response.status_code}")
-            return True
-        else:
+        response = requests.get(f"{BASE_URL}/healthz")
+        if response.status_code != 200:
             print_test_result("Server is running", False, f"Status: {response.status_code}")
             return False
+        print_test_result("Server is running", True, f"Status: {response.status_code}")
+        
+        response = requests.get(f"{BASE_URL}/readyz")
+        checks = response.json().get('checks', {})
+        print_test_result(
+            "Server is ready", response.status_code == 200,
+            ", ".join(f"{name}: {check['status']}" for name, check in checks.items())
+        )
+        return True
     except requests.exceptions.ConnectionError:
         print_test_result("Server is running", False, "Connection refused - server not running")
         return False